@@ -1,8 +1,12 @@
-import yaml
-
-from yatl.render import JsonType, render_from_obj
-
-
-def load(str_or_file, params) -> JsonType:
-    obj = yaml.safe_load(str_or_file)
-    return render_from_obj(obj, params, {})
+from yatl.batch import render_batch, render_tree  # noqa: F401
+from yatl.frozen import freeze, FrozenDict, FrozenList  # noqa: F401
+from yatl.library import DefLibrary, load_defs  # noqa: F401
+from yatl.limits import RenderLimits  # noqa: F401
+from yatl.loaders import FileSystemLoader, Loader, MemoryLoader, ZipLoader  # noqa: F401
+from yatl.loading import load  # noqa: F401
+from yatl.paths import SearchPath  # noqa: F401
+from yatl.profiling import Profiler  # noqa: F401
+from yatl.render import JsonType, render_from_obj  # noqa: F401
+from yatl.results import ResultCache  # noqa: F401
+from yatl.serialize import dump  # noqa: F401
+from yatl.template import compile, Template  # noqa: F401
@@ -0,0 +1,5 @@
+import sys
+
+from yatl.cli import main
+
+sys.exit(main())
@@ -0,0 +1,252 @@
+from typing import Any, Dict, FrozenSet, List, Mapping, NamedTuple, Optional, Set, Tuple
+
+from yaml import YAMLError
+
+from yatl.directives import (
+    is_def,
+    is_elif,
+    is_for,
+    is_if,
+    is_use,
+    parse_for_header,
+    parse_if_condition,
+    parse_use_name,
+)
+from yatl.interpolation import compile_interpolation, render_interpolation
+from yatl.types import JsonType, YATLError
+
+
+class Usage(NamedTuple):
+    """What rendering a node depends on."""
+
+    # The parameters read, not counting ones bound inside the node (by .for).
+    names: FrozenSet[str]
+    # The names of the defs the node uses.
+    defs: FrozenSet[str]
+    # Whether rendering the node makes defs, so it has to be rendered every time for its effect.
+    defines: bool = False
+
+
+_NOTHING = Usage(frozenset(), frozenset())
+_DEFINES = Usage(frozenset(), frozenset(), True)
+
+
+def _union(a: Optional[Usage], b: Optional[Usage]) -> Optional[Usage]:
+    if a is None or b is None:
+        return None
+    return Usage(a.names | b.names, a.defs | b.defs, a.defines or b.defines)
+
+
+class Analyzer:
+    """Finds the parameters each node of a template reads.
+
+    A usage of None means it can't be known without rendering, e.g. because a file to load depends on a loop
+    variable. Files and defs are looked up through the render context, as they would be at that point of the render.
+    After a render, pass the defs it used (see RenderContext.used_defs) as used_defs, since defs may have been
+    redefined between uses: each .use then reads whatever any def of its name that was used reads.
+    """
+
+    def __init__(
+        self,
+        ctx: Any,
+        params: Mapping[str, Any],
+        used_defs: Optional[Mapping[str, Mapping[int, Any]]] = None,
+    ):
+        self.ctx = ctx
+        self.params = params
+        self.used_defs_by_name = used_defs
+        # Whether anything visited may create defs, which would change the result of any .use.
+        self.may_define_defs = False
+        # (node, usage, names bound by enclosing .for loops) for every object or list visited in place.
+        self.visited: List[Tuple[JsonType, Optional[Usage], FrozenSet[str]]] = []
+        # Nodes which are also rendered outside of the template itself (in def bodies).
+        self.shared: Set[int] = set()
+        # Whether any def was looked up, whose body may differ the next time the same nodes are visited.
+        self.used_defs = False
+        # Whether the name of any file loaded reads params, so a different file may be visited next time.
+        self.loads_by_param = False
+        self._loading: Set[str] = set()
+        self._using: Set[str] = set()
+
+    def visit(
+        self, obj: JsonType, bound: FrozenSet[str] = frozenset(), in_place: bool = True
+    ) -> Optional[Usage]:
+        """Return obj's usage.
+
+        bound is the set of loop variables bound by enclosing loops. in_place is false for def bodies, which are
+        rendered with other params wherever they're used.
+        """
+        if isinstance(obj, dict):
+            usage: Optional[Usage] = _NOTHING
+            for key, value in obj.items():
+                usage = _union(usage, self._visit_field(key, value, bound, in_place))
+        elif isinstance(obj, list):
+            usage = _NOTHING
+            for elem in obj:
+                usage = _union(usage, self.visit(elem, bound, in_place))
+        elif isinstance(obj, str):
+            return _string_usage(obj)
+        else:
+            return _NOTHING
+
+        if in_place:
+            self.visited.append((obj, usage, bound))
+        else:
+            self.shared.add(id(obj))
+        return usage
+
+    def _visit_field(  # noqa: C901
+        self, key: Any, value: JsonType, bound: FrozenSet[str], in_place: bool
+    ) -> Optional[Usage]:
+        if not isinstance(key, str):
+            return self.visit(value, bound, in_place)
+
+        try:
+            if is_if(key) or is_elif(key):
+                condition = Usage(parse_if_condition(key).names, frozenset())
+                return _union(condition, self.visit(value, bound, in_place))
+            elif is_for(key):
+                names, iterable = parse_for_header(key)
+                body = self.visit(value, bound.union(names), in_place)
+                if body is None:
+                    return None
+                return Usage(
+                    iterable.names | body.names.difference(names),
+                    body.defs,
+                    body.defines,
+                )
+            elif is_def(key):
+                self.may_define_defs = True
+                return _DEFINES
+            elif is_use(key):
+                return self._visit_use(parse_use_name(key))
+            elif key in (".load", ".load_defaults_from"):
+                return self._visit_load(value, bound, in_place)
+        except YATLError:
+            # Leave it to the render to report.
+            return None
+
+        return _union(_string_usage(key), self.visit(value, bound, in_place))
+
+    def _visit_use(self, name: str) -> Optional[Usage]:
+        self.used_defs = True
+        if self.used_defs_by_name is not None and name in self.used_defs_by_name:
+            dfs = list(self.used_defs_by_name[name].values())
+        else:
+            df = self.ctx.defs.get(name)
+            dfs = [] if df is None else [df]
+        if not dfs or name in self._using:
+            # Either an error, or a recursive def.
+            return None
+
+        usage: Optional[Usage] = _NOTHING
+        self._using.add(name)
+        try:
+            for df in dfs:
+                body = self.visit(df.body, in_place=False)
+                if body is None:
+                    return None
+                # The args are passed unrendered, so only the body reads params.
+                usage = _union(
+                    usage,
+                    Usage(body.names - set(df.args), body.defs | {name}, body.defines),
+                )
+        finally:
+            self._using.remove(name)
+        return usage
+
+    def _visit_load(
+        self, value: JsonType, bound: FrozenSet[str], in_place: bool
+    ) -> Optional[Usage]:
+        usage: Optional[Usage] = _NOTHING
+        for filename in value if isinstance(value, list) else [value]:
+            file_usage = _string_usage(filename) if isinstance(filename, str) else None
+            if (
+                not isinstance(filename, str)
+                or file_usage is None
+                or file_usage.names & bound
+                or (file_usage.names and not in_place)
+            ):
+                # We can't know which file is loaded. (Def bodies may see args in place of params.)
+                self.may_define_defs = True
+                return None
+            if file_usage.names:
+                self.loads_by_param = True
+            usage = _union(usage, file_usage)
+            usage = _union(usage, self._visit_file(filename, bound, in_place))
+        return usage
+
+    def _visit_file(
+        self, filename: str, bound: FrozenSet[str], in_place: bool
+    ) -> Optional[Usage]:
+        try:
+            name = render_interpolation(filename, self.params)  # type: ignore
+            if not isinstance(name, str):
+                return None
+            path = self.ctx.resolve(name)
+            if path in self._loading:
+                return None
+            obj = self.ctx.parse_file(path)
+        except (OSError, YAMLError, ValueError, YATLError):
+            return None
+
+        self._loading.add(path)
+        try:
+            with self.ctx.in_file(path):
+                return self.visit(obj, bound, in_place)
+        finally:
+            self._loading.remove(path)
+
+
+def _string_usage(s: str) -> Optional[Usage]:
+    if ".(" not in s:
+        return _NOTHING
+    try:
+        parts = compile_interpolation(s)
+    except YATLError:
+        return None
+    names: FrozenSet[str] = frozenset().union(
+        *(p.names for p in parts if not isinstance(p, str))
+    )
+    return Usage(names, frozenset())
+
+
+class Invariants(NamedTuple):
+    # The invariant nodes, by id.
+    nodes: Dict[int, JsonType]
+    # Whether the same nodes are invariant whenever the loop is rendered again in the same render. Defs can be
+    # redefined between renders of the loop, and the name of a file it loads may read a param set by an enclosing
+    # loop, so a file that was invariant (or not) may be loaded in place of a different one.
+    reusable: bool
+
+
+def find_invariants(
+    body: JsonType, names: Tuple[str, ...], ctx: Any, params: Mapping[str, Any]
+) -> Invariants:
+    """Find the objects and lists in a for loop's body which render the same in every iteration.
+
+    A node is invariant if it doesn't read the loop variables (or the variables of any loop inside the body that
+    encloses it), doesn't make defs, and if it uses defs, no part of the body may make defs.
+    """
+    analyzer = Analyzer(ctx, params)
+    analyzer.visit(body, frozenset(names))
+
+    invariants: Dict[int, JsonType] = {}
+    variant: Set[int] = set(analyzer.shared)
+    for obj, usage, bound in analyzer.visited:
+        if (
+            usage is None
+            or usage.defines
+            or usage.names & bound
+            or (usage.defs and analyzer.may_define_defs)
+        ):
+            # The same node can be visited more than once (e.g. YAML aliases), so it must be invariant everywhere.
+            variant.add(id(obj))
+        else:
+            invariants[id(obj)] = obj
+
+    for obj_id in variant:
+        invariants.pop(obj_id, None)
+    return Invariants(
+        invariants, not analyzer.used_defs and not analyzer.loads_by_param
+    )
@@ -0,0 +1,198 @@
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import json
+import os
+from pathlib import Path
+import time
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from yatl.cache import FileCache
+from yatl.loading import load
+from yatl.serialize import dump
+from yatl.types import JsonType
+
+
+class BatchResult(NamedTuple):
+    written: List[str]
+    unchanged: List[str]
+    # Seconds spent rendering (and writing, if needed) each template.
+    timings: Dict[str, float]
+
+
+def render_batch(
+    jobs: Iterable[Tuple[str, str]],
+    params: Dict[str, Any],
+    manifest_path: Optional[str] = None,
+    format: str = "yaml",
+    **load_kwargs: Any,
+) -> BatchResult:
+    """Render each (template path, output path) in jobs, and write the outputs.
+
+    If manifest_path is given, it records a hash of each rendered output. On the next run, outputs whose hash is
+    unchanged (and which still exist) are neither serialized nor rewritten, so their modification times don't change.
+
+    Files loaded by the templates are parsed once for the whole batch, unless a different file_cache is passed.
+    """
+    manifest = read_manifest(manifest_path) if manifest_path else {}
+    load_kwargs.setdefault("file_cache", FileCache())
+    result, new_manifest = _render_jobs(
+        list(jobs), params, manifest, format, load_kwargs
+    )
+    if manifest_path:
+        write_manifest(manifest_path, new_manifest)
+    return result
+
+
+def render_tree(
+    src_dir: str,
+    out_dir: str,
+    params: Dict[str, Any],
+    manifest_path: Optional[str] = None,
+    format: str = "yaml",
+    patterns: Sequence[str] = ("*.yaml", "*.yml"),
+    workers: int = 1,
+    **load_kwargs: Any,
+) -> BatchResult:
+    """Render every template under src_dir into the same relative path under out_dir.
+
+    Parsed files are shared between all templates rendered by the same process. With workers > 1, templates are
+    split between that many processes, each with its own cache (params must then be picklable). See render_batch for
+    manifest_path.
+    """
+    src = Path(src_dir)
+    out = Path(out_dir)
+    outputs: Dict[Path, Path] = {}
+    for template in sorted({p for pattern in patterns for p in src.rglob(pattern)}):
+        output = out / template.relative_to(src)
+        if format == "json":
+            output = output.with_suffix(".json")
+        if output in outputs:
+            # E.g. x.yaml and x.yml, which are both written to x.json.
+            raise ValueError(
+                f"{outputs[output]} and {template} would both be written to {output}"
+            )
+        outputs[output] = template
+    jobs = []
+    for output, template in outputs.items():
+        output.parent.mkdir(parents=True, exist_ok=True)
+        jobs.append((str(template), str(output)))
+
+    manifest = read_manifest(manifest_path) if manifest_path else {}
+    if workers <= 1:
+        load_kwargs.setdefault("file_cache", FileCache())
+        result, new_manifest = _render_jobs(jobs, params, manifest, format, load_kwargs)
+    else:
+        # Give each worker one contiguous chunk, so templates from the same directory (which likely load the same
+        # files) share a cache.
+        chunk_size = -(-len(jobs) // workers)
+        chunks = [jobs[i : i + chunk_size] for i in range(0, len(jobs), chunk_size)]
+        result = BatchResult([], [], {})
+        new_manifest = {}
+        with ProcessPoolExecutor(workers) as executor:
+            futures = [
+                executor.submit(
+                    _render_jobs, chunk, params, manifest, format, load_kwargs
+                )
+                for chunk in chunks
+            ]
+            for future in futures:
+                chunk_result, chunk_manifest = future.result()
+                result.written.extend(chunk_result.written)
+                result.unchanged.extend(chunk_result.unchanged)
+                result.timings.update(chunk_result.timings)
+                new_manifest.update(chunk_manifest)
+
+    if manifest_path:
+        write_manifest(manifest_path, new_manifest)
+    return result
+
+
+def _render_jobs(
+    jobs: List[Tuple[str, str]],
+    params: Dict[str, Any],
+    manifest: Dict[str, str],
+    format: str,
+    load_kwargs: Dict[str, Any],
+) -> Tuple[BatchResult, Dict[str, str]]:
+    if "file_cache" not in load_kwargs:
+        # A fresh worker process
+        load_kwargs = {**load_kwargs, "file_cache": FileCache()}
+
+    new_manifest = {}
+    result = BatchResult([], [], {})
+    for template_path, output_path in jobs:
+        start = time.perf_counter()
+        with open(template_path) as f:
+            obj = load(f, params, **load_kwargs)
+
+        digest = tree_hash(obj, format)
+        new_manifest[output_path] = digest
+        if manifest.get(output_path) == digest and os.path.exists(output_path):
+            result.unchanged.append(output_path)
+        else:
+            with open(output_path, "w") as f:
+                dump(obj, f, format=format)
+            result.written.append(output_path)
+        result.timings[template_path] = time.perf_counter() - start
+
+    return result, new_manifest
+
+
+def tree_hash(obj: JsonType, salt: str = "") -> str:
+    """A stable hash of a rendered tree, computed without serializing it.
+
+    Object key order is significant, since it's preserved in the output. The salt is mixed in, so that e.g. the same
+    tree written in two formats hashes differently.
+    """
+    h = hashlib.blake2b(salt.encode(), digest_size=16)
+    _update_hash(h, obj)
+    return h.hexdigest()
+
+
+def _update_hash(h: Any, obj: Any) -> None:  # noqa: C901
+    # Every value is prefixed by a type tag, and strings by their length, so different trees can't produce the same
+    # sequence of updates.
+    if isinstance(obj, dict):
+        h.update(b"{%d:" % len(obj))
+        for key, value in obj.items():
+            _update_hash(h, key)
+            _update_hash(h, value)
+    elif isinstance(obj, (list, tuple)):
+        h.update(b"[%d:" % len(obj))
+        for value in obj:
+            _update_hash(h, value)
+    elif isinstance(obj, str):
+        encoded = obj.encode("utf-8", "surrogatepass")
+        h.update(b"s%d:" % len(encoded))
+        h.update(encoded)
+    elif obj is None:
+        h.update(b"n")
+    elif obj is True:
+        h.update(b"t")
+    elif obj is False:
+        h.update(b"f")
+    elif isinstance(obj, int):
+        h.update(b"i%d;" % obj)
+    elif isinstance(obj, float):
+        h.update(b"d" + repr(obj).encode() + b";")
+    else:
+        # Other types YAML can produce, like dates and binary data.
+        encoded = f"{type(obj).__name__}:{obj!r}".encode()
+        h.update(b"o%d:" % len(encoded))
+        h.update(encoded)
+
+
+def read_manifest(path: str) -> Dict[str, str]:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def write_manifest(path: str, manifest: Dict[str, str]) -> None:
+    # Write to a temporary file first, so an interrupted run can't leave a truncated manifest behind.
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
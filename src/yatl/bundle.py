@@ -0,0 +1,211 @@
+import glob
+import json
+import mmap
+import os
+from typing import Any, Dict, Hashable, Iterable, List, Mapping, Optional, Tuple, Union
+
+from yatl import ir
+from yatl.cache import FileCache
+from yatl.directives import precompile
+from yatl.limits import RenderLimits
+from yatl.loaders import VirtualLoader
+from yatl.parsing import parse_file
+from yatl.paths import SearchPath
+from yatl.render import Def, layer_defs, render_from_obj, RenderContext
+from yatl.types import JsonType
+
+# A bundle is a header line of JSON, followed by each file's IR (see ir.py), one after another:
+#
+#   {"format": "yatl-bundle", "version": 1, "template": <key>, "search_path": [<dir key>, ...],
+#    "files": {<key>: [offset, length], ...}}
+#
+# Keys are paths relative to the base directory the bundle was made from, with "/" separators. Files found on the
+# search path are under ".search/<index>/". Offsets and lengths are in bytes, from the end of the header line.
+FORMAT = "yatl-bundle"
+VERSION = 1
+
+_SEARCH_DIR = ".search"
+
+
+def write_bundle(
+    template_path: str,
+    bundle_path: str,
+    base_dir: Optional[str] = None,
+    search_path: Iterable[str] = (),
+    include: Iterable[str] = (),
+    json_mode: str = "never",
+) -> List[str]:
+    """Pack a template, and every file it loads, into one file that Bundle can render.
+
+    Files loaded with literal names are found the same way as by load (base_dir defaults to the template's
+    directory). Names with interpolations can't be followed, so those files must be added with include, a list of
+    glob patterns relative to base_dir. Every file must be under base_dir or a search path directory.
+
+    Returns the keys of the bundled files.
+    """
+    template_path = os.path.abspath(template_path)
+    base_dir = os.path.abspath(
+        os.path.dirname(template_path) if base_dir is None else base_dir
+    )
+    search = SearchPath(search_path)
+    files = _collect(template_path, base_dir, search, include, json_mode)
+
+    index: Dict[str, Tuple[int, int]] = {}
+    blobs = []
+    offset = 0
+    for path, obj in files.items():
+        blob = ir.dumps(obj, {}, json_mode).encode()
+        # A file in a search path directory under base_dir can be found either way.
+        for key in _keys(path, base_dir, search.dirs):
+            index[key] = (offset, len(blob))
+        blobs.append(blob)
+        offset += len(blob)
+    header = {
+        "format": FORMAT,
+        "version": VERSION,
+        "template": _keys(template_path, base_dir, search.dirs)[0],
+        "search_path": [f"{_SEARCH_DIR}/{i}" for i in range(len(search.dirs))],
+        "files": index,
+    }
+    with open(bundle_path, "wb") as f:
+        f.write(json.dumps(header, separators=(",", ":")).encode() + b"\n")
+        for blob in blobs:
+            f.write(blob)
+    return list(index)
+
+
+def _collect(
+    template_path: str,
+    base_dir: str,
+    search: SearchPath,
+    include: Iterable[str],
+    json_mode: str,
+) -> Dict[str, JsonType]:
+    """Parse the template and the files it loads, by path."""
+    files: Dict[str, JsonType] = {}
+
+    def add(path: str) -> None:
+        if path in files:
+            return
+        obj = files[path] = parse_file(path, json_mode)
+        for name in _literal_loads(obj):
+            found = search.resolve(name, os.path.dirname(path), base_dir)
+            if os.path.isfile(found):
+                add(found)
+
+    add(template_path)
+    for pattern in include:
+        for path in sorted(glob.glob(os.path.join(base_dir, pattern), recursive=True)):
+            if os.path.isfile(path):
+                add(os.path.abspath(path))
+    return files
+
+
+def _keys(path: str, base_dir: str, search_dirs: Tuple[str, ...]) -> List[str]:
+    keys = []
+    for prefix, root in [("", base_dir)] + [
+        (f"{_SEARCH_DIR}/{i}/", d) for i, d in enumerate(search_dirs)
+    ]:
+        rel = os.path.relpath(path, root)
+        if rel != os.pardir and not rel.startswith(os.pardir + os.sep):
+            keys.append(prefix + rel.replace(os.sep, "/"))
+    if not keys:
+        raise ValueError(f"{path} is outside the base directory and search path")
+    return keys
+
+
+def _literal_loads(obj: JsonType) -> Iterable[str]:
+    """Yield the names of files loaded by obj which aren't interpolated."""
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            if key in (".load", ".load_defaults_from"):
+                for name in value if isinstance(value, list) else [value]:
+                    if isinstance(name, str) and ".(" not in name:
+                        yield name
+            yield from _literal_loads(value)
+    elif isinstance(obj, list):
+        for elem in obj:
+            yield from _literal_loads(elem)
+
+
+class Bundle(VirtualLoader):
+    """A bundle made by write_bundle (or yatl bundle), rendered without reading any other files.
+
+    The bundle is memory-mapped, and each file in it is decoded the first time it's loaded. Like a FileCache, a
+    bundle can be shared by renders in any number of threads. It's also a loader, so other templates can load the
+    files in it.
+    """
+
+    def __init__(self, path: str, root: Optional[str] = None):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        header_end = self._mmap.find(b"\n")
+        try:
+            header = json.loads(self._mmap[:header_end].decode())
+        except ValueError:
+            header = None
+        if not isinstance(header, dict) or header.get("format") != FORMAT:
+            self.close()
+            raise ValueError(f"Not a YATL bundle: {path}")
+        if header.get("version") != VERSION:
+            self.close()
+            raise ValueError(
+                f"Unsupported YATL bundle version: {header.get('version')}"
+            )
+
+        super().__init__(
+            os.path.join(os.sep, "yatl-bundle") if root is None else root,
+            header["search_path"],
+        )
+        self._start = header_end + 1
+        self._index: Dict[str, List[int]] = header["files"]
+        self.template_path = self.path(header["template"])
+        # Decoded files are shared by all renders of the bundle.
+        self._file_cache = FileCache()
+
+    def render(
+        self,
+        params: Dict[str, Any],
+        defs: Optional[Mapping[str, Def]] = None,
+        limits: Optional[RenderLimits] = None,
+        select: Optional[Iterable[Union[str, Iterable[str]]]] = None,
+        frozen: bool = False,
+    ) -> JsonType:
+        """Render the bundled template. The arguments are the same as for load."""
+        ctx = RenderContext(
+            layer_defs(defs),
+            file_cache=self._file_cache,
+            limits=limits,
+            loader=self,
+            select=select,
+            frozen=frozen,
+        )
+        ctx.current_dir = os.path.dirname(self.template_path)
+        obj = ctx.parse_file(self.template_path)
+        return render_from_obj(obj, params, ctx.defs, ctx)
+
+    def contains_key(self, key: str) -> bool:
+        return key in self._index
+
+    def validator(self, path: str) -> Hashable:
+        # Bundles don't change, but different bundles may have files with the same names.
+        return self, self._index[self._checked_key(path)][0]
+
+    def fetch(self, path: str, json_mode: str) -> JsonType:
+        offset, length = self._index[self._checked_key(path)]
+        start = self._start + offset
+        obj, _, _ = ir.loads(self._mmap[start : start + length].decode())
+        precompile(obj)
+        return obj
+
+    def keys(self) -> List[str]:
+        return list(self._index)
+
+    def close(self) -> None:
+        self._mmap.close()
+
+    def __enter__(self) -> "Bundle":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
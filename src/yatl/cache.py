@@ -0,0 +1,268 @@
+from collections import OrderedDict
+import marshal
+import os
+import sys
+import threading
+from typing import Any, Dict, Hashable, NamedTuple, Optional, Tuple
+
+from yatl.frozen import freeze
+from yatl.loaders import FileSystemLoader, Loader
+from yatl.types import JsonType
+
+
+class DataInfo(NamedTuple):
+    """What rendering a file without directives or interpolations would use, so the render can be skipped."""
+
+    # Nodes (objects, lists and scalars) in the file.
+    nodes: int
+    # Length of the longest string, key or value.
+    max_string_length: int
+    # The file marshalled, which is the fastest way to copy it, or None if it has values marshal can't handle.
+    snapshot: Optional[bytes]
+
+
+class CachedFile:
+    __slots__ = ("obj", "data", "_frozen")
+
+    def __init__(self, obj: JsonType, data: Optional[DataInfo]):
+        self.obj = obj
+        # None if the file has to be rendered.
+        self.data = data
+        self._frozen: Any = _UNSET
+
+    def frozen(self) -> JsonType:
+        """Return the file frozen (see frozen.freeze), which frozen renders of a data file share."""
+        if self._frozen is _UNSET:
+            # Threads may race to freeze it, but any of the results will do.
+            self._frozen = freeze(self.obj)
+        return self._frozen
+
+
+_UNSET = object()
+
+
+class CacheStats(NamedTuple):
+    hits: int
+    misses: int
+    # Entries dropped to stay within max_bytes.
+    evictions: int
+    entries: int
+    # The estimated size of the cached files, and how much of that is pinned. Only kept when max_bytes is given.
+    bytes: int
+    pinned_bytes: int
+
+
+class _Entry:
+    __slots__ = ("validator", "file", "size", "hits", "pinned")
+
+    def __init__(self, validator: Hashable, file: CachedFile, size: int):
+        self.validator = validator
+        self.file = file
+        self.size = size
+        self.hits = 0
+        self.pinned = False
+
+
+class FileCache:
+    """Caches parsed files so they're only read once, even across many renders.
+
+    Entries are keyed by absolute path and validated against the file's modification time and size (or whatever
+    the loader's validator is), so edited files are re-read. Cached trees are shared, so they must not be mutated.
+
+    If max_bytes is given, the memory each file takes is estimated when it's parsed (see measure), the least recently
+    used files are dropped to stay within it, and files bigger than it aren't kept at all. Files of at most pin_size
+    bytes which have been used pin_hits times are pinned, and never dropped, up to half of max_bytes in all.
+
+    A cache can be shared by renders in any number of threads. Without max_bytes, cached files are read without
+    locking (with it, each use takes a lock briefly to record the order of use). A file that isn't cached yet is
+    parsed by only one thread while any others that need it wait. hits is approximate while threads share the cache.
+    """
+
+    def __init__(
+        self,
+        max_bytes: Optional[int] = None,
+        pin_size: int = 64 * 1024,
+        pin_hits: int = 10,
+    ) -> None:
+        if max_bytes is not None and max_bytes < 0:
+            raise ValueError(f"max_bytes must not be negative: {max_bytes}")
+        self.max_bytes = max_bytes
+        self.pin_size = pin_size
+        self.pin_hits = pin_hits
+        # Least recently used first, when max_bytes is given.
+        self._entries: "OrderedDict[Tuple[str, str], _Entry]" = OrderedDict()
+        # One lock per file being parsed, held while it's parsed.
+        self._parsing: Dict[Tuple[str, str], threading.Lock] = {}
+        # Guards _parsing, changes to _entries, and the counts other than hits.
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes = 0
+        self.pinned_bytes = 0
+
+    def get(
+        self, path: str, json_mode: str = "never", loader: Optional[Loader] = None
+    ) -> JsonType:
+        return self.get_file(path, json_mode, loader).obj
+
+    def get_file(
+        self, path: str, json_mode: str = "never", loader: Optional[Loader] = None
+    ) -> CachedFile:
+        """Like get, but also says whether the file is plain data, which is worked out once when it's parsed."""
+        if loader is None:
+            loader = _FILE_SYSTEM
+        key = (os.path.abspath(path), json_mode)
+        validator = loader.validator(path)
+        entry = self._entries.get(key)
+        if entry is not None and entry.validator == validator:
+            return self._hit(key, entry)
+
+        with self._file_lock(key):
+            try:
+                # Another thread may have parsed it while this one waited.
+                entry = self._entries.get(key)
+                if entry is not None and entry.validator == validator:
+                    return self._hit(key, entry)
+
+                with self._lock:
+                    self.misses += 1
+                obj = loader.fetch(path, json_mode)
+                cached = CachedFile(obj, data_info(obj))
+                size = 0 if self.max_bytes is None else measure(cached)
+                self._add(key, _Entry(validator, cached, size))
+                return cached
+            finally:
+                with self._lock:
+                    self._parsing.pop(key, None)
+
+    def _hit(self, key: Tuple[str, str], entry: _Entry) -> CachedFile:
+        self.hits += 1
+        if self.max_bytes is None:
+            # Nothing is dropped, so the order of use doesn't matter.
+            return entry.file
+        with self._lock:
+            entry.hits += 1
+            # It may have been evicted or replaced since it was read.
+            if self._entries.get(key) is entry:
+                self._entries.move_to_end(key)
+                # Only tried once, so a file that doesn't fit among the pinned ones isn't retried on every hit.
+                if entry.hits == self.pin_hits and entry.size <= self.pin_size:
+                    self._pin(entry, self.max_bytes)
+        return entry.file
+
+    def _pin(self, entry: _Entry, max_bytes: int) -> None:
+        if not entry.pinned and self.pinned_bytes + entry.size <= max_bytes // 2:
+            entry.pinned = True
+            self.pinned_bytes += entry.size
+
+    def _add(self, key: Tuple[str, str], entry: _Entry) -> None:
+        with self._lock:
+            self._remove(key)
+            if self.max_bytes is not None and entry.size > self.max_bytes:
+                # Too big to keep, even on its own.
+                return
+            self._entries[key] = entry
+            self.bytes += entry.size
+            if self.max_bytes is not None and self.bytes > self.max_bytes:
+                self._evict(self.max_bytes)
+
+    def _evict(self, max_bytes: int) -> None:
+        # At most half of max_bytes is pinned, so this stops before running out of unpinned entries.
+        while self.bytes > max_bytes:
+            key, entry = next(iter(self._entries.items()))
+            if entry.pinned:
+                # It's never dropped, so it's moved out of the way rather than skipped every time.
+                self._entries.move_to_end(key)
+            else:
+                self._remove(key)
+                self.evictions += 1
+
+    def _remove(self, key: Tuple[str, str]) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry.size
+            if entry.pinned:
+                self.pinned_bytes -= entry.size
+
+    def _file_lock(self, key: Tuple[str, str]) -> threading.Lock:
+        with self._lock:
+            return self._parsing.setdefault(key, threading.Lock())
+
+    def stats(self) -> CacheStats:
+        return CacheStats(
+            self.hits,
+            self.misses,
+            self.evictions,
+            len(self._entries),
+            self.bytes,
+            self.pinned_bytes,
+        )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+            self.pinned_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def measure(file: CachedFile) -> int:
+    """Estimate the bytes of memory a cached file takes.
+
+    Each object, key and value it holds is counted, and so is its snapshot (see DataInfo), which is kept alongside it.
+    """
+    size = 0
+    stack = [file.obj]
+    while stack:
+        node = stack.pop()
+        size += sys.getsizeof(node)
+        if isinstance(node, dict):
+            size += sum(sys.getsizeof(k) for k in node)
+            stack.extend(node.values())
+        elif isinstance(node, list):
+            stack.extend(node)
+    if file.data is not None and file.data.snapshot is not None:
+        size += len(file.data.snapshot)
+    return size
+
+
+def data_info(obj: JsonType) -> Optional[DataInfo]:
+    """Return the DataInfo of obj if rendering it would just copy it, i.e. it has no directives or interpolations."""
+    stack = [obj]
+    nodes = 0
+    max_string_length = 0
+    while stack:
+        node = stack.pop()
+        nodes += 1
+        if isinstance(node, dict):
+            for key in node:
+                if isinstance(key, str):
+                    # Keys starting with "." may be directives.
+                    if key.startswith(".") or ".(" in key:
+                        return None
+                    max_string_length = max(max_string_length, len(key))
+            stack.extend(node.values())
+        elif isinstance(node, list):
+            if any(isinstance(elem, dict) and not elem for elem in node):
+                # Rendering drops empty objects from lists (see render.add_list_elem), so this isn't a copy.
+                return None
+            stack.extend(node)
+        elif isinstance(node, str):
+            if ".(" in node:
+                return None
+            max_string_length = max(max_string_length, len(node))
+    return DataInfo(nodes, max_string_length, _snapshot(obj))
+
+
+def _snapshot(obj: JsonType) -> Optional[bytes]:
+    try:
+        return marshal.dumps(obj)
+    except ValueError:
+        # E.g. dates.
+        return None
+
+
+_FILE_SYSTEM = FileSystemLoader()
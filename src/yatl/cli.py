@@ -0,0 +1,54 @@
+import argparse
+import sys
+from typing import List, Optional
+
+from yatl.bundle import write_bundle
+from yatl.parsing import JSON_MODES
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="yatl", description="YAML Templating Language"
+    )
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+
+    bundle = commands.add_parser(
+        "bundle",
+        help="pack a template and the files it loads into one file",
+        description="Pack a template and every file it loads into one file, for yatl.bundle.Bundle to render.",
+    )
+    bundle.add_argument("template")
+    bundle.add_argument("-o", "--output", required=True, help="the bundle to write")
+    bundle.add_argument(
+        "--base-dir",
+        help="where loads are resolved from (default: the template's directory)",
+    )
+    bundle.add_argument(
+        "-I",
+        "--search-path",
+        action="append",
+        default=[],
+        metavar="DIR",
+        help="a search path directory",
+    )
+    bundle.add_argument(
+        "--include",
+        action="append",
+        default=[],
+        metavar="GLOB",
+        help="also bundle matching files, e.g. ones loaded with interpolated names",
+    )
+    bundle.add_argument("--json", choices=JSON_MODES, default="never")
+
+    args = parser.parse_args(argv)
+    keys = write_bundle(
+        args.template,
+        args.output,
+        base_dir=args.base_dir,
+        search_path=args.search_path,
+        include=args.include,
+        json_mode=args.json,
+    )
+    print(f"Bundled {len(keys)} files into {args.output}", file=sys.stderr)
+    return 0
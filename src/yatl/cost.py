@@ -0,0 +1,266 @@
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Set,
+    Sized,
+    Union,
+)
+
+from yaml import YAMLError
+
+from yatl.cache import FileCache
+from yatl.directives import (
+    is_def,
+    is_elif,
+    is_for,
+    is_if,
+    is_use,
+    parse_def_parts,
+    parse_for_header,
+    parse_use_name,
+)
+from yatl.expression import Expression
+from yatl.interpolation import compile_interpolation, render_interpolation
+from yatl.limits import RenderLimits
+from yatl.loaders import Loader
+from yatl.paths import SearchPath
+from yatl.render import Def, RenderContext
+from yatl.types import JsonType, YATLError
+
+# The number of elements assumed for an iterable whose size isn't given, and nodes for a file which can't be read.
+DEFAULT_SIZE = 10
+DEFAULT_FILE_NODES = 100
+
+
+class Cost(NamedTuple):
+    """An estimate of the resources one render uses.
+
+    Where it can't be known which branch of an if is taken, the most expensive one is counted, so this is an upper
+    bound as long as the sizes given are.
+    """
+
+    # Nodes rendered, counted the same way as RenderLimits.max_nodes.
+    nodes: int = 0
+    # Total iterations of all for loops.
+    iterations: int = 0
+    # Files read by .load and .load_defaults_from.
+    loads: int = 0
+    # Expansions of .use.
+    uses: int = 0
+    # How deeply loads are nested.
+    load_depth: int = 0
+
+    def within(self, limits: RenderLimits) -> bool:
+        """Whether a render with this cost would stay within limits (other than its time and string length)."""
+        return all(
+            limit is None or used <= limit
+            for used, limit in [
+                (self.nodes, limits.max_nodes),
+                (self.iterations, limits.max_iterations),
+                (self.load_depth, limits.max_load_depth),
+            ]
+        )
+
+
+def _add(a: Cost, b: Cost) -> Cost:
+    return Cost(
+        a.nodes + b.nodes,
+        a.iterations + b.iterations,
+        a.loads + b.loads,
+        a.uses + b.uses,
+        max(a.load_depth, b.load_depth),
+    )
+
+
+def _times(a: Cost, n: int) -> Cost:
+    return Cost(a.nodes * n, a.iterations * n, a.loads * n, a.uses * n, a.load_depth)
+
+
+def _max(a: Cost, b: Cost) -> Cost:
+    return Cost(*(max(x, y) for x, y in zip(a, b)))
+
+
+_NODE = Cost(nodes=1)
+
+
+def estimate_cost(
+    obj: JsonType,
+    sizes: Optional[Mapping[str, int]] = None,
+    params: Optional[Dict[str, Any]] = None,
+    file_sizes: Optional[Mapping[str, int]] = None,
+    defs: Optional[Mapping[str, Def]] = None,
+    json: str = "never",
+    file_cache: Optional[FileCache] = None,
+    default_size: int = DEFAULT_SIZE,
+    base_dir: Optional[str] = None,
+    search_path: Union[SearchPath, Iterable[str], None] = None,
+    loader: Optional[Loader] = None,
+) -> Cost:
+    """Estimate the cost of rendering obj, without rendering it.
+
+    The size of each for loop's iterable is looked up in sizes by the iterable's source (e.g. "hosts" or
+    "service.ports"), or by the only param it reads. Otherwise, it's computed if the iterable only reads params, and
+    is default_size if that fails too.
+
+    Files whose names only read params are read and estimated too (found the same way as by load, with base_dir
+    and search_path, or loader). Otherwise (or if they can't be read) their cost is looked up in file_sizes by the
+    file name as written in the template (e.g. ".(env).yaml"), as a number of nodes.
+    """
+    ctx = RenderContext(
+        dict(defs or {}),
+        json=json,
+        file_cache=file_cache,
+        base_dir=base_dir,
+        search_path=search_path,
+        loader=loader,
+    )
+    estimator = _Estimator(
+        sizes or {}, params or {}, file_sizes or {}, ctx, default_size
+    )
+    return estimator.cost(obj)
+
+
+class _Estimator:
+    def __init__(
+        self,
+        sizes: Mapping[str, int],
+        params: Dict[str, Any],
+        file_sizes: Mapping[str, int],
+        ctx: RenderContext,
+        default_size: int,
+    ):
+        self.sizes = sizes
+        self.params = params
+        self.file_sizes = file_sizes
+        # Only used to keep track of defs and find files.
+        self.ctx = ctx
+        self.default_size = default_size
+        self._loading: Set[str] = set()
+        self._using: Set[str] = set()
+
+    def cost(self, obj: JsonType) -> Cost:
+        cost = _NODE
+        if isinstance(obj, dict):
+            branches = None
+            for key, value in obj.items():
+                if isinstance(key, str) and is_if(key) and branches is not None:
+                    cost, branches = _add(cost, branches), None
+                if isinstance(key, str) and (
+                    is_if(key) or is_elif(key) or key == ".else"
+                ):
+                    # Only one branch of a chain is taken.
+                    branch = self.cost(value)
+                    branches = branch if branches is None else _max(branches, branch)
+                    continue
+                if branches is not None:
+                    cost, branches = _add(cost, branches), None
+                cost = _add(cost, self._field_cost(key, value))
+            if branches is not None:
+                cost = _add(cost, branches)
+        elif isinstance(obj, list):
+            for elem in obj:
+                cost = _add(cost, self.cost(elem))
+        return cost
+
+    def _field_cost(self, key: Any, value: JsonType) -> Cost:
+        if not isinstance(key, str):
+            return self.cost(value)
+
+        try:
+            if is_for(key):
+                _, iterable = parse_for_header(key)
+                n = self._size(iterable)
+                return _add(Cost(iterations=n), _times(self.cost(value), n))
+            elif key in (".load", ".load_defaults_from"):
+                filenames = value if isinstance(value, list) else [value]
+                cost = Cost()
+                for filename in filenames:
+                    cost = _add(cost, self._load_cost(filename))
+                return cost
+            elif is_def(key):
+                name, args = parse_def_parts(key)
+                self.ctx.defs[name] = Def(name, args, value)
+                return Cost()
+            elif is_use(key):
+                return self._use_cost(parse_use_name(key))
+        except YATLError:
+            return Cost()
+        return self.cost(value)
+
+    def _size(self, iterable: Expression) -> int:
+        if iterable.source in self.sizes:
+            return self.sizes[iterable.source]
+        if len(iterable.names) == 1:
+            [name] = iterable.names
+            if name in self.sizes:
+                return self.sizes[name]
+        # Params that are iterators (e.g. generators) would be consumed by evaluating the expression, and then be
+        # empty when the template is rendered.
+        if iterable.names <= self.params.keys() and not any(
+            isinstance(self.params[name], Iterator) for name in iterable.names
+        ):
+            try:
+                value = iterable(self.params)
+            except YATLError:
+                return self.default_size
+            if isinstance(value, Sized) and not isinstance(value, Iterator):
+                return len(value)
+        return self.default_size
+
+    def _load_cost(self, filename: JsonType) -> Cost:
+        load = Cost(loads=1, load_depth=1)
+        # Looked up by the name as it's written in the template, which may be interpolated.
+        unread = _add(
+            load, Cost(nodes=self.file_sizes.get(str(filename), DEFAULT_FILE_NODES))
+        )
+        name = self._filename(filename)
+        path = None if name is None else self.ctx.resolve(name)
+        if path is None or path in self._loading:
+            return unread
+
+        try:
+            obj = self.ctx.parse_file(path)
+        except (OSError, YAMLError, ValueError):
+            return unread
+
+        self._loading.add(path)
+        try:
+            with self.ctx.in_file(path):
+                cost = self.cost(obj)
+        finally:
+            self._loading.remove(path)
+        return _add(Cost(loads=1), cost._replace(load_depth=cost.load_depth + 1))
+
+    def _filename(self, filename: JsonType) -> Optional[str]:
+        if not isinstance(filename, str):
+            return None
+        try:
+            names = set().union(
+                *(
+                    p.names
+                    for p in compile_interpolation(filename)
+                    if not isinstance(p, str)
+                )
+            )
+            if not names <= self.params.keys():
+                return None
+            path = render_interpolation(filename, self.params)
+        except YATLError:
+            return None
+        return path if isinstance(path, str) else None
+
+    def _use_cost(self, name: str) -> Cost:
+        df = self.ctx.defs.get(name)
+        if df is None or name in self._using:
+            return Cost(uses=1)
+
+        self._using.add(name)
+        try:
+            return _add(Cost(uses=1), self.cost(df.body))
+        finally:
+            self._using.remove(name)
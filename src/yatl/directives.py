@@ -0,0 +1,170 @@
+from functools import lru_cache
+import re
+from typing import Any, List, Tuple
+
+from yatl.expression import compile_expression, Expression
+from yatl.interpolation import compile_interpolation
+from yatl.types import JsonType, YATLSyntaxError
+
+
+def is_if(key: str) -> bool:
+    return bool(re.match(r"\.if\b", key))
+
+
+def is_elif(key: str) -> bool:
+    return bool(re.match(r"\.elif\b", key))
+
+
+@lru_cache(maxsize=4096)
+def parse_if_condition(if_key: str) -> Expression:
+    # This regular expression captures both if and elif.
+    if_match = re.match(r"\.(?:el)?if\s*\((.*)\)\s*$", if_key)
+    if not if_match:
+        raise YATLSyntaxError(f"Invalid if statement: {if_key}")
+
+    return compile_expression(if_match[1].strip())
+
+
+def is_for(key: str) -> bool:
+    return bool(re.match(r"\.for\b", key))
+
+
+@lru_cache(maxsize=4096)
+def parse_for_header(key: str) -> Tuple[Tuple[str, ...], Expression]:
+    """Return the loop variables and the expression for the iterable.
+
+    There may be several variables, which unpack each element, like Python: .for (name, port in zip(names, ports))
+    """
+    for_match = re.match(
+        r"""
+            for \s* \( \s* (  # Capture the variables
+                [a-zA-Z_][a-zA-Z0-9_]*
+                (?: \s* , \s* [a-zA-Z_][a-zA-Z0-9_]* )*
+            ) \s+ in \s+ (.+) \) \s* $
+        """,
+        key[1:],
+        re.VERBOSE,
+    )
+    if not for_match:
+        raise YATLSyntaxError(f"Invalid for statement: {key}")
+
+    names = tuple(name.strip() for name in for_match[1].split(","))
+    if len(names) != len({*names}):
+        raise YATLSyntaxError(f"Duplicate name in for variables: {key}")
+    return names, compile_expression(for_match[2].strip())
+
+
+def is_directive(key: Any) -> bool:
+    return isinstance(key, str) and (
+        is_if(key)
+        or is_elif(key)
+        or key == ".else"
+        or is_for(key)
+        or key == ".load"
+        or is_def(key)
+        or is_use(key)
+    )
+
+
+def is_def(key: str) -> bool:
+    return bool(re.match(r"\.def\b", key))
+
+
+@lru_cache(maxsize=4096)
+def parse_def_parts(key: str) -> Tuple[str, List[str]]:
+    name_match = re.match(
+        r"""
+            \.def \s+
+            ([a-zA-Z_][a-zA-Z0-9_]*) \s*  # Capture the name
+        """,
+        key,
+        re.VERBOSE,
+    )
+    if not name_match:
+        raise YATLSyntaxError(f"Malformed def directive: {key}")
+
+    name = name_match[1]
+    if name_match.end() == len(key):
+        # Handle ".def foo:"
+        return name, []
+
+    args = key[name_match.end() :]
+    args_match = re.match(
+        r"""
+            \( \s* (  # Capture the arg list
+                (?:[a-zA-Z_][a-zA-Z0-9_]*)  # First arg
+                (?: \s* , \s*
+                    [a-zA-Z_][a-zA-Z0-9_]*  # Subsequent args
+                )*
+            )? \s* \) \s* $
+        """,
+        args,
+        re.VERBOSE,
+    )
+    if not args_match:
+        raise YATLSyntaxError(f"Malformed def arguments: {key}")
+    if not args_match[1]:
+        # Handle ".def foo():"
+        return name, []
+
+    return name, [a.strip() for a in args_match[1].split(",")]
+
+
+def is_use(key: str) -> bool:
+    return bool(re.match(r"\.use\b", key))
+
+
+@lru_cache(maxsize=4096)
+def parse_use_name(key: str) -> str:
+    name_match = re.match(
+        r"""
+            \.use \s+
+            ([a-zA-Z_][a-zA-Z0-9_]*) \s*  # Capture the name
+        """,
+        key,
+        re.VERBOSE,
+    )
+    if not name_match:
+        raise YATLSyntaxError(f"Malformed use directive: {key}")
+    return name_match[1]
+
+
+def needs_raw_value(key: Any) -> bool:
+    """Whether the value for key must be passed to ObjectRenderer.add unrendered."""
+    return is_directive(key) or key == ".load_defaults_from"
+
+
+def is_directive_obj(obj: JsonType) -> bool:
+    """Whether obj is an object whose keys are all directives."""
+    return isinstance(obj, dict) and all(is_directive(key) for key in obj)
+
+
+def precompile(obj: JsonType) -> None:
+    """Compile every expression and directive in obj.
+
+    This fills the caches used while rendering, and raises any syntax errors up front (except in interpolations, whose
+    text may name a parameter rather than be an expression, see expression.compile_interpolated).
+    """
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            if isinstance(key, str):
+                _precompile_key(key)
+            precompile(value)
+    elif isinstance(obj, list):
+        for elem in obj:
+            precompile(elem)
+    elif isinstance(obj, str) and ".(" in obj:
+        compile_interpolation(obj)
+
+
+def _precompile_key(key: str) -> None:
+    if is_if(key) or is_elif(key):
+        parse_if_condition(key)
+    elif is_for(key):
+        parse_for_header(key)
+    elif is_def(key):
+        parse_def_parts(key)
+    elif is_use(key):
+        parse_use_name(key)
+    elif ".(" in key:
+        compile_interpolation(key)
@@ -0,0 +1,763 @@
+from functools import lru_cache
+import operator
+import re
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    FrozenSet,
+    List,
+    Mapping,
+    Optional,
+    Set,
+    Sized,
+    Tuple,
+)
+
+from yatl.limits import active_budget
+from yatl.types import YATLEnvironmentError, YATLError, YATLSyntaxError
+
+Evaluator = Callable[[Dict[str, Any]], Any]
+
+
+class Expression:
+    """A compiled expression. Call it with the params to evaluate it."""
+
+    __slots__ = ("source", "evaluator", "names")
+
+    def __init__(self, source: str, evaluator: Evaluator, names: FrozenSet[str]):
+        self.source = source
+        self.evaluator = evaluator
+        # The parameter names the expression reads.
+        self.names = names
+
+    def __call__(self, params: Dict[str, Any]) -> Any:
+        try:
+            return self.evaluator(params)
+        except YATLError:
+            raise
+        except (
+            TypeError,
+            ValueError,
+            ArithmeticError,
+            LookupError,
+            AttributeError,
+            StopIteration,
+        ) as e:
+            raise YATLEnvironmentError(f"Cannot evaluate {self.source}: {e}")
+
+    def __repr__(self) -> str:
+        return f"Expression({self.source!r})"
+
+
+def evaluate(s: str, params: Dict[str, Any]) -> Any:
+    return compile_expression(s)(params)
+
+
+@lru_cache(maxsize=8192)
+def compile_expression(s: str) -> Expression:
+    """Parse an expression into a closure. Results are cached per expression string."""
+    path = _parse_path(s)
+    if path:
+        root, keys = path
+        return Expression(s, _path_accessor(root, keys), frozenset([root]))
+
+    parser = _Parser(s)
+    code = parser.parse()
+    return Expression(s, code.fn, frozenset(parser.names))
+
+
+@lru_cache(maxsize=8192)
+def compile_interpolated(s: str) -> Expression:
+    """Compile the expression s of an interpolation, .(s).
+
+    Before interpolations were expressions, s was looked up as a parameter name, so a parameter named exactly s (e.g.
+    my-param or a.b) still takes precedence. Likewise, text that isn't a valid expression is only an error if there's
+    no such parameter.
+    """
+    if s.isidentifier():
+        return compile_expression(s)
+
+    try:
+        expression = compile_expression(s)
+    except YATLSyntaxError as e:
+        error = e
+
+        def lookup_or_fail(params: Dict[str, Any]) -> Any:
+            if s in params:
+                return params[s]
+            raise error
+
+        return Expression(s, lookup_or_fail, frozenset([s]))
+
+    fn = expression.evaluator
+
+    def lookup_or_evaluate(params: Dict[str, Any]) -> Any:
+        if s in params:
+            return params[s]
+        return fn(params)
+
+    return Expression(s, lookup_or_evaluate, expression.names | {s})
+
+
+def _default(value: Any, default: Any = "") -> Any:
+    return default if value is None else value
+
+
+def _join(value: Any, sep: str = "") -> str:
+    return _checked(sep.join(str(v) for v in _budgeted(value)))
+
+
+def _str(value: Any) -> str:
+    return _checked(str(value))
+
+
+def _replace(value: Any, old: Any, new: Any) -> Any:
+    budget = active_budget()
+    if budget is not None and isinstance(value, str):
+        budget.check_string_length(
+            len(value) + value.count(old) * (len(new) - len(old))
+        )
+    return value.replace(old, new)
+
+
+def _first(value: Any) -> Any:
+    for v in value:
+        return v
+    raise ValueError("no first element of an empty sequence")
+
+
+class _Zip:
+    """Like zip, but checks the lengths match (when known), and can be iterated more than once.
+
+    Elements of NumPy arrays are converted to plain Python values as they're read, so the arrays are never copied.
+    """
+
+    __slots__ = ("columns",)
+
+    def __init__(self, *columns: Any):
+        lengths = {len(c) for c in columns if hasattr(c, "__len__")}
+        if len(lengths) > 1:
+            raise ValueError(f"columns have different lengths: {sorted(lengths)}")
+        self.columns = columns
+
+    def __iter__(self) -> Any:
+        return zip(*(map(_item, c) if _is_numpy(c) else c for c in self.columns))
+
+
+class _SizedZip(_Zip):
+    """A _Zip of columns which all have lengths, so it has one too."""
+
+    __slots__ = ()
+
+    def __len__(self) -> int:
+        return min((len(c) for c in self.columns), default=0)
+
+
+def _zip(*columns: Any) -> _Zip:
+    if all(isinstance(c, Sized) for c in columns):
+        return _SizedZip(*columns)
+    return _Zip(*columns)
+
+
+def materialize(value: Any) -> Any:
+    """Convert the lazy sequences returned by range and zip to lists, so they can be output."""
+    if isinstance(value, range):
+        return list(_budgeted(value))
+    if isinstance(value, _Zip):
+        return [list(row) for row in _budgeted(value)]
+    return value
+
+
+def _range(*args: int) -> range:
+    r = range(*args)
+    budget = active_budget()
+    if budget is not None:
+        budget.check_range(r)
+    return r
+
+
+def _budgeted(iterable: Any) -> Any:
+    """Check the render's deadline while iterable is read, if it has one."""
+    budget = active_budget()
+    if budget is None or budget.deadline is None:
+        return iterable
+    return budget.iterate(iterable)
+
+
+def _sum(iterable: Any, start: Any = 0) -> Any:
+    return sum(_budgeted(iterable), start)
+
+
+def _sorted(iterable: Any) -> list:
+    return sorted(_budgeted(iterable))
+
+
+def _min(*args: Any) -> Any:
+    return min(_budgeted(args[0])) if len(args) == 1 else min(args)
+
+
+def _max(*args: Any) -> Any:
+    return max(_budgeted(args[0])) if len(args) == 1 else max(args)
+
+
+def _add(a: Any, b: Any) -> Any:
+    budget = active_budget()
+    if budget is not None and isinstance(a, str) and isinstance(b, str):
+        budget.check_string_length(len(a) + len(b))
+    return a + b
+
+
+def _checked(s: Any) -> Any:
+    """Check a string built by an expression against the render's string length limit, if it has one."""
+    budget = active_budget()
+    if budget is not None:
+        budget.check_string(s)
+    return s
+
+
+def _mul(a: Any, b: Any) -> Any:
+    budget = active_budget()
+    if budget is not None:
+        budget.check_repeat(a, b)
+        budget.check_repeat(b, a)
+    return a * b
+
+
+def _is_numpy(obj: Any) -> bool:
+    return type(obj).__module__.split(".")[0] == "numpy"
+
+
+def _item(value: Any) -> Any:
+    return value.item() if _is_numpy(value) else value
+
+
+def _columns(table: Mapping[str, Any], *names: str) -> _Zip:
+    """Iterate over the rows of a table stored as a mapping of column name to column."""
+    for name in names:
+        if name not in table:
+            raise ValueError(f"no column {name}")
+    return _zip(*(table[name] for name in names or table))
+
+
+FUNCTIONS: Dict[str, Callable[..., Any]] = {
+    "len": len,
+    "str": _str,
+    "int": int,
+    "float": float,
+    "bool": bool,
+    "min": _min,
+    "max": _max,
+    "sum": _sum,
+    "sorted": _sorted,
+    "range": _range,
+    "zip": _zip,
+    "columns": _columns,
+}
+
+FILTERS: Dict[str, Callable[..., Any]] = {
+    "default": _default,
+    "upper": lambda v: _checked(v.upper()),
+    "lower": lambda v: _checked(v.lower()),
+    "title": lambda v: _checked(v.title()),
+    "trim": lambda v: v.strip(),
+    "replace": _replace,
+    "length": len,
+    "join": _join,
+    "first": _first,
+    "last": lambda v: v[-1],
+    "sort": _sorted,
+    "string": _str,
+    "int": int,
+    "float": float,
+    "abs": abs,
+}
+
+_LITERALS = {"true": True, "false": False, "null": None}
+_KEYWORDS = {"and", "or", "not", "in", *_LITERALS}
+
+_COMPARISONS: Dict[str, Callable[[Any, Any], Any]] = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "in": lambda a, b: a in b,
+    "not in": lambda a, b: a not in b,
+}
+
+_ARITH: Dict[str, Callable[[Any, Any], Any]] = {
+    "+": _add,
+    "-": operator.sub,
+    "*": _mul,
+    "/": operator.truediv,
+    "//": operator.floordiv,
+    "%": operator.mod,
+}
+
+_TOKEN_RE = re.compile(
+    r"""
+    \s*(?:
+        (?P<number>\d+(?:\.\d+)?(?:[eE][-+]?\d+)?)
+        | (?P<string>'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")
+        | (?P<name>[a-zA-Z_][a-zA-Z0-9_]*)
+        | (?P<op>==|!=|<=|>=|//|[-+*/%<>()\[\],.|])
+    )\s*
+    """,
+    re.VERBOSE,
+)
+
+_ESCAPES = {"n": "\n", "t": "\t", "r": "\r"}
+
+# A name followed by any number of .attr, [int] or ["key"] accessors.
+_PATH_RE = re.compile(
+    r"""
+    \s*([a-zA-Z_][a-zA-Z0-9_]*)
+    ((?:
+        \s*\.\s*[a-zA-Z_][a-zA-Z0-9_]*
+        | \s*\[\s*(?:-?\d+|'[^'\\]*'|"[^"\\]*")\s*\]
+    )*)\s*$
+    """,
+    re.VERBOSE,
+)
+_PATH_PART_RE = re.compile(
+    r"""\.\s*([a-zA-Z_][a-zA-Z0-9_]*)|\[\s*(-?\d+|'[^'\\]*'|"[^"\\]*")\s*\]"""
+)
+
+
+class _Code:
+    __slots__ = ("fn", "constant", "value")
+
+    def __init__(self, fn: Evaluator, constant: bool = False, value: Any = None):
+        self.fn = fn
+        self.constant = constant
+        # The value of a constant.
+        self.value = value
+
+
+def _const(value: Any) -> _Code:
+    return _Code(lambda params: value, constant=True, value=value)
+
+
+# Constants larger than this aren't passed to calls or repeated at compile time, when there's no render budget.
+_MAX_FOLDED_SIZE = 10000
+
+
+def _fold(
+    fn: Evaluator,
+    *operands: _Code,
+    bounded: bool = False,
+    size: Optional[Callable[..., int]] = None,
+) -> _Code:
+    """Evaluate fn at compile time if all its operands are constant.
+
+    If bounded is true, fn may take time or memory in proportion to its operands (e.g. sum), so it's only evaluated
+    if they're all small. If size is given, it's called with the operands' values to bound the length of the result
+    (e.g. of *), which must be small too. Results that turn out to be large aren't kept either, so they aren't pinned
+    in the expression cache.
+    """
+    if not all(o.constant for o in operands):
+        return _Code(fn)
+    values = [o.value for o in operands]
+    if bounded and not all(_is_small(v) for v in values):
+        return _Code(fn)
+    try:
+        if size is not None and size(*values) > _MAX_FOLDED_SIZE:
+            return _Code(fn)
+        value = fn({})
+    except Exception:  # noqa: S110
+        # Leave the error to be raised (and wrapped) at evaluation time.
+        return _Code(fn)
+    if isinstance(value, Sized) and not _is_small(value):
+        return _Code(fn)
+    return _const(value)
+
+
+def _is_small(value: Any) -> bool:
+    if isinstance(value, int):
+        return abs(value) <= _MAX_FOLDED_SIZE
+    try:
+        return len(value) <= _MAX_FOLDED_SIZE
+    except (TypeError, OverflowError):
+        # Not sized, or too big to say.
+        return not hasattr(value, "__len__")
+
+
+def _repeat_size(a: Any, b: Any) -> int:
+    """The length of a * b, or 0 if it's a number."""
+    if isinstance(b, int) and isinstance(a, Sized):
+        return len(a) * b
+    if isinstance(a, int) and isinstance(b, Sized):
+        return a * len(b)
+    return 0
+
+
+def _replace_size(value: Any, old: Any, new: Any) -> int:
+    return len(value) * max(len(new), 1)
+
+
+# Bounds on the length of the results of filters whose results may be much larger than their arguments.
+_FILTER_SIZES: Dict[str, Callable[..., int]] = {"replace": _replace_size}
+
+
+def _apply(f: Callable[[Any], Any], o: Evaluator) -> Evaluator:
+    return lambda params: f(o(params))
+
+
+def _apply2(f: Callable[[Any, Any], Any], lhs: Evaluator, rhs: Evaluator) -> Evaluator:
+    return lambda params: f(lhs(params), rhs(params))
+
+
+def _either(lhs: Evaluator, rhs: Evaluator) -> Evaluator:
+    return lambda params: lhs(params) or rhs(params)
+
+
+def _both(lhs: Evaluator, rhs: Evaluator) -> Evaluator:
+    return lambda params: lhs(params) and rhs(params)
+
+
+def _attribute(o: Evaluator, name: str) -> Evaluator:
+    return lambda params: _get_attr(o(params), name)
+
+
+def _tokenize(s: str) -> List[Tuple[str, str]]:
+    tokens = []
+    pos = 0
+    while pos < len(s):
+        match = _TOKEN_RE.match(s, pos)
+        if not match or match.end() == pos:
+            raise YATLSyntaxError(f"Invalid expression: {s}")
+        pos = match.end()
+        kind = match.lastgroup
+        if kind is None:
+            # Trailing whitespace
+            continue
+        value = match[kind]
+        if kind == "name" and value in _KEYWORDS:
+            kind = "keyword"
+        tokens.append((kind, value))
+    tokens.append(("end", ""))
+    return tokens
+
+
+class _Parser:
+    """Recursive descent parser which builds closures as it goes.
+
+    From lowest to highest precedence: filters (|), or, and, not, comparisons, +/-, * / // %, unary -, and then
+    attribute/index access.
+    """
+
+    def __init__(self, source: str):
+        self.source = source
+        self.tokens = _tokenize(source)
+        self.pos = 0
+        self.names: Set[str] = set()
+
+    def parse(self) -> _Code:
+        if self._peek() == ("end", ""):
+            raise YATLSyntaxError("Empty expression")
+        code = self._pipe()
+        if self._peek()[0] != "end":
+            self._error()
+        return code
+
+    def _peek(self, offset: int = 0) -> Tuple[str, str]:
+        return self.tokens[min(self.pos + offset, len(self.tokens) - 1)]
+
+    def _next(self) -> Tuple[str, str]:
+        token = self.tokens[self.pos]
+        if token[0] != "end":
+            self.pos += 1
+        return token
+
+    def _accept(self, kind: str, value: str) -> bool:
+        if self._peek() == (kind, value):
+            self.pos += 1
+            return True
+        return False
+
+    def _expect(self, kind: str, value: Optional[str] = None) -> str:
+        tok_kind, tok_value = self._next()
+        if tok_kind != kind or (value is not None and tok_value != value):
+            self._error()
+        return tok_value
+
+    def _error(self) -> None:
+        raise YATLSyntaxError(f"Invalid expression: {self.source}")
+
+    def _pipe(self) -> _Code:
+        code = self._or()
+        while self._accept("op", "|"):
+            name = self._expect("name")
+            args = self._call_args() if self._peek() == ("op", "(") else []
+            code = self._filter(name, code, args)
+        return code
+
+    def _filter(self, name: str, code: _Code, args: List[_Code]) -> _Code:
+        if name not in FILTERS:
+            raise YATLSyntaxError(f"Unknown filter {name} in expression: {self.source}")
+        f = FILTERS[name]
+        # Unlike other filters, default also applies to missing parameters.
+        value_fn = _missing_as_none(code.fn) if name == "default" else code.fn
+        arg_fns = [a.fn for a in args]
+        return _fold(
+            lambda params: f(value_fn(params), *(a(params) for a in arg_fns)),
+            code,
+            *args,
+            bounded=True,
+            size=_FILTER_SIZES.get(name),
+        )
+
+    def _or(self) -> _Code:
+        left = self._and()
+        while self._accept("keyword", "or"):
+            right = self._and()
+            left = _fold(
+                _either(left.fn, right.fn),
+                left,
+                right,
+            )
+        return left
+
+    def _and(self) -> _Code:
+        left = self._not()
+        while self._accept("keyword", "and"):
+            right = self._not()
+            left = _fold(
+                _both(left.fn, right.fn),
+                left,
+                right,
+            )
+        return left
+
+    def _not(self) -> _Code:
+        if self._accept("keyword", "not"):
+            operand = self._not()
+            return _fold(_apply(operator.not_, operand.fn), operand)
+        return self._comparison()
+
+    def _comparison(self) -> _Code:
+        first = self._arith()
+        chain = []
+        while True:
+            kind, value = self._peek()
+            if kind == "op" and value in _COMPARISONS:
+                self._next()
+                op = value
+            elif (kind, value) == ("keyword", "in"):
+                self._next()
+                op = "in"
+            elif (kind, value) == ("keyword", "not") and self._peek(1) == (
+                "keyword",
+                "in",
+            ):
+                self.pos += 2
+                op = "not in"
+            else:
+                break
+            chain.append((_COMPARISONS[op], self._arith()))
+
+        if not chain:
+            return first
+        if len(chain) == 1:
+            cmp, right = chain[0]
+            return _fold(_apply2(cmp, first.fn, right.fn), first, right)
+
+        ops = [(cmp, right.fn) for cmp, right in chain]
+
+        def compare_chain(params: Dict[str, Any]) -> bool:
+            # Like Python, a < b < c means a < b and b < c, with b evaluated once.
+            left = first.fn(params)
+            for cmp, right_fn in ops:
+                right = right_fn(params)
+                if not cmp(left, right):
+                    return False
+                left = right
+            return True
+
+        return _fold(compare_chain, first, *(right for _, right in chain))
+
+    def _arith(self) -> _Code:
+        return self._binary(self._term, ("+", "-"))
+
+    def _term(self) -> _Code:
+        return self._binary(self._unary, ("*", "/", "//", "%"))
+
+    def _binary(self, operand: Callable[[], _Code], ops: Tuple[str, ...]) -> _Code:
+        left = operand()
+        while self._peek()[0] == "op" and self._peek()[1] in ops:
+            symbol = self._next()[1]
+            right = operand()
+            left = _fold(
+                _apply2(_ARITH[symbol], left.fn, right.fn),
+                left,
+                right,
+                # Repeating a string or list could take any amount of time and memory.
+                size=_repeat_size if symbol == "*" else None,
+            )
+        return left
+
+    def _unary(self) -> _Code:
+        if self._accept("op", "-"):
+            operand = self._unary()
+            return _fold(_apply(operator.neg, operand.fn), operand)
+        if self._accept("op", "+"):
+            return self._unary()
+        return self._postfix()
+
+    def _postfix(self) -> _Code:
+        code = self._primary()
+        while True:
+            if self._accept("op", "."):
+                name = self._expect("name")
+                code = _fold(_attribute(code.fn, name), code)
+            elif self._accept("op", "["):
+                index = self._pipe()
+                self._expect("op", "]")
+                code = _fold(_apply2(_get_item, code.fn, index.fn), code, index)
+            else:
+                return code
+
+    def _primary(self) -> _Code:  # noqa: C901
+        kind, value = self._next()
+        if kind == "number":
+            if value.isdigit():
+                return _const(int(value))
+            return _const(float(value))
+        elif kind == "string":
+            return _const(_unescape(value[1:-1]))
+        elif kind == "keyword" and value in _LITERALS:
+            return _const(_LITERALS[value])
+        elif kind == "name":
+            if self._peek() == ("op", "("):
+                return self._call(value)
+            self.names.add(value)
+            return _Code(_lookup(value))
+        elif (kind, value) == ("op", "("):
+            code = self._pipe()
+            self._expect("op", ")")
+            return code
+        elif (kind, value) == ("op", "["):
+            items = self._items("]")
+            fns = [i.fn for i in items]
+            return _fold(lambda params: [f(params) for f in fns], *items)
+
+        self._error()
+        raise AssertionError("unreachable")
+
+    def _call(self, name: str) -> _Code:
+        if name not in FUNCTIONS:
+            raise YATLSyntaxError(
+                f"Unknown function {name} in expression: {self.source}"
+            )
+        f = FUNCTIONS[name]
+        args = self._call_args()
+        arg_fns = [a.fn for a in args]
+        return _fold(
+            lambda params: f(*(a(params) for a in arg_fns)), *args, bounded=True
+        )
+
+    def _call_args(self) -> List[_Code]:
+        self._expect("op", "(")
+        return self._items(")")
+
+    def _items(self, close: str) -> List[_Code]:
+        items: List[_Code] = []
+        if self._accept("op", close):
+            return items
+        while True:
+            items.append(self._pipe())
+            if self._accept("op", close):
+                return items
+            self._expect("op", ",")
+
+
+def _parse_path(s: str) -> Optional[Tuple[str, Tuple[Tuple[Any, bool], ...]]]:
+    """Parse s if it is a plain path like a.b[0]["c"].
+
+    Returns the root name and a tuple of (key, is_attribute) pairs, or None if s is some other expression.
+    """
+    match = _PATH_RE.match(s)
+    if not match or match[1] in _KEYWORDS:
+        return None
+
+    keys = []
+    for part in _PATH_PART_RE.finditer(match[2]):
+        if part[1]:
+            keys.append((part[1], True))
+        elif part[2][0] in "'\"":
+            keys.append((part[2][1:-1], False))
+        else:
+            keys.append((int(part[2]), False))
+    return match[1], tuple(keys)
+
+
+def _path_accessor(root: str, keys: Tuple[Tuple[Any, bool], ...]) -> Evaluator:
+    """Build an accessor for a plain path, which skips the general expression machinery."""
+    lookup = _lookup(root)
+    if not keys:
+        return lookup
+
+    def access(params: Dict[str, Any]) -> Any:
+        obj = lookup(params)
+        for key, is_attribute in keys:
+            try:
+                obj = obj[key]
+            except (KeyError, IndexError, TypeError):
+                if is_attribute and not isinstance(obj, Mapping):
+                    obj = _get_attr(obj, key)
+                else:
+                    raise YATLEnvironmentError(f"Invalid key {key!r} in path {root}")
+        return obj
+
+    return access
+
+
+def _lookup(name: str) -> Evaluator:
+    def lookup(params: Dict[str, Any]) -> Any:
+        try:
+            return params[name]
+        except KeyError:
+            raise YATLEnvironmentError(f"Missing parameter {name}")
+
+    return lookup
+
+
+def _missing_as_none(fn: Evaluator) -> Evaluator:
+    def evaluate_or_none(params: Dict[str, Any]) -> Any:
+        try:
+            return fn(params)
+        except YATLEnvironmentError:
+            return None
+
+    return evaluate_or_none
+
+
+def _get_attr(obj: Any, name: str) -> Any:
+    if isinstance(obj, Mapping):
+        try:
+            return obj[name]
+        except KeyError:
+            raise YATLEnvironmentError(f"Missing key {name}")
+    if name.startswith("_"):
+        raise YATLEnvironmentError(f"Cannot access private attribute {name}")
+    try:
+        value = getattr(obj, name)
+    except AttributeError:
+        raise YATLEnvironmentError(f"Missing attribute {name}")
+    if callable(value):
+        # Methods can't be called from expressions, so they'd only leak into the output.
+        raise YATLEnvironmentError(f"Cannot access method {name}")
+    return value
+
+
+def _get_item(obj: Any, index: Any) -> Any:
+    try:
+        return obj[index]
+    except (KeyError, IndexError, TypeError):
+        raise YATLEnvironmentError(f"Invalid index {index!r}")
+
+
+def _unescape(s: str) -> str:
+    return re.sub(r"\\(.)", lambda m: _ESCAPES.get(m[1], m[1]), s)
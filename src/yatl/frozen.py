@@ -0,0 +1,80 @@
+from typing import Any, Dict, NoReturn, Optional
+
+from yatl.types import JsonType
+
+
+def _immutable(self: Any, *args: Any, **kwargs: Any) -> NoReturn:
+    raise TypeError(f"{type(self).__name__} is immutable")
+
+
+class FrozenDict(dict):
+    """An object in frozen output (see freeze), which can't be modified.
+
+    It's still a dict, so it can be read, compared and serialized like any other output. It's hashable, and the hash
+    is only computed once.
+    """
+
+    __slots__ = ("_hash",)
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self._hash: Optional[int] = None
+
+    def __hash__(self) -> int:  # type: ignore
+        if self._hash is None:
+            self._hash = hash(frozenset(self.items()))
+        return self._hash
+
+    def __copy__(self) -> "FrozenDict":
+        return self
+
+    def __deepcopy__(self, memo: Dict[int, Any]) -> "FrozenDict":
+        return self
+
+    def __reduce__(self) -> Any:
+        return FrozenDict, (dict(self),)
+
+    __setitem__ = __delitem__ = __ior__ = _immutable
+    clear = pop = popitem = setdefault = update = _immutable
+
+
+class FrozenList(list):
+    """A list in frozen output (see freeze), which can't be modified. Like FrozenDict, it's hashable."""
+
+    __slots__ = ("_hash",)
+
+    def __init__(self, *args: Any):
+        super().__init__(*args)
+        self._hash: Optional[int] = None
+
+    def __hash__(self) -> int:  # type: ignore
+        if self._hash is None:
+            self._hash = hash(tuple(self))
+        return self._hash
+
+    def __copy__(self) -> "FrozenList":
+        return self
+
+    def __deepcopy__(self, memo: Dict[int, Any]) -> "FrozenList":
+        return self
+
+    def __reduce__(self) -> Any:
+        return FrozenList, (list(self),)
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _immutable
+    append = clear = extend = insert = pop = remove = reverse = sort = _immutable
+
+
+def freeze(value: JsonType) -> JsonType:
+    """Return value with every object and list in it made a FrozenDict or FrozenList.
+
+    Parts that are already frozen are shared rather than copied, so freezing output built from frozen parts only
+    copies the rest.
+    """
+    if isinstance(value, (FrozenDict, FrozenList)):
+        return value
+    elif isinstance(value, dict):
+        return FrozenDict((k, freeze(v)) for k, v in value.items())
+    elif isinstance(value, list):
+        return FrozenList(freeze(v) for v in value)
+    return value
@@ -1,20 +1,32 @@
-from typing import Any, Dict, Iterable, Tuple
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Tuple, Union
 
-from yatl.types import JsonType, YATLEnvironmentError, YATLSyntaxError
+from yatl.expression import compile_interpolated, Expression, materialize
+from yatl.types import JsonType, YATLSyntaxError
 
 
 def render_interpolation(s: str, params: Dict[str, Any]) -> JsonType:
-    input_parts = parse_expressions(s)
-    evaled_parts = [
-        (evaluate(p, params) if is_expr else p) for p, is_expr in input_parts
-    ]
+    if ".(" not in s:
+        return s
+
+    input_parts = compile_interpolation(s)
+    evaled_parts = [(p if isinstance(p, str) else p(params)) for p in input_parts]
     if len(evaled_parts) == 1:
-        # Preserve whatever type it is
-        return evaled_parts[0]
+        # Preserve whatever type it is (except for lazy sequences, which can't be output)
+        return materialize(evaled_parts[0])
     else:
         return "".join(str(part) for part in evaled_parts)
 
 
+@lru_cache(maxsize=8192)
+def compile_interpolation(s: str) -> Tuple[Union[str, Expression], ...]:
+    """Split s into literal strings and compiled expressions. Results are cached per string."""
+    return tuple(
+        (compile_interpolated(p) if is_expr else p)
+        for p, is_expr in parse_expressions(s)
+    )
+
+
 def parse_expressions(s: str) -> Iterable[Tuple[str, bool]]:
     parts = []
     i = 0
@@ -24,6 +36,7 @@ def parse_expressions(s: str) -> Iterable[Tuple[str, bool]]:
                 parts.append((s[:i], False))
             expr, s = parse_expression(s[i + 2 :])
             parts.append((expr, True))
+            i = 0
         elif s[i : i + 2] == r"\.":
             i += 2
         else:
@@ -36,25 +49,24 @@ def parse_expressions(s: str) -> Iterable[Tuple[str, bool]]:
 
 def parse_expression(s: str) -> Tuple[str, str]:
     paren_nesting = 0
+    quote = None
     i = 0
     while i < len(s):
-        if s[i] == "(":
+        if quote:
+            if s[i] == "\\":
+                i += 1
+            elif s[i] == quote:
+                quote = None
+        elif s[i] in "'\"":
+            quote = s[i]
+        elif s[i] == "(":
             paren_nesting += 1
         elif s[i] == ")":
             paren_nesting -= 1
 
-        # TODO: Handle embedded strings
         if paren_nesting < 0:
             return s[:i], s[i + 1 :]
 
         i += 1
 
     raise YATLSyntaxError("Could not find end of expression")
-
-
-def evaluate(s: str, params: Dict[str, Any]) -> Any:
-    # TODO: Actual evaluation
-    try:
-        return params[s]
-    except KeyError:
-        raise YATLEnvironmentError(f"Missing parameter {s}")
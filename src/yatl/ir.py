@@ -0,0 +1,200 @@
+import datetime
+import json
+import math
+from typing import Any, Callable, Dict, List, Tuple
+
+from yatl.directives import (
+    is_def,
+    is_elif,
+    is_for,
+    is_if,
+    is_use,
+    needs_raw_value,
+    parse_def_parts,
+    parse_for_header,
+    parse_if_condition,
+    parse_use_name,
+)
+from yatl.interpolation import parse_expressions
+from yatl.types import JsonType
+
+# The serialized form of a compiled template. It's JSON, so it can be read by any language without a YAML parser:
+#
+#   {"format": "yatl-ir", "version": 1, "json": <json mode>, "known_params": <value>, "root": <value>}
+#
+# Values:
+#   null, true, false, numbers, and strings without .( are themselves.
+#   ["i", [part, ...]]        A string with interpolations. Each part is a literal string, or [source] for an
+#                             expression.
+#   ["l", [value, ...]]       A list.
+#   ["o", [[key, value], ...]] An object, with its fields in order.
+#   ["date", [year, month, day]]
+#   ["datetime", [year, month, day, hour, minute, second, microsecond, utc_offset]]  The offset is in seconds, or null.
+#   ["float", "nan"], ["float", "inf"], ["float", "-inf"]  Floats JSON can't represent.
+#
+# Keys are scalar values as above (including ["i", ...] for interpolated keys), or directives, which may repeat (e.g.
+# two ifs with the same condition):
+#   ["if", condition], ["elif", condition], ["else"], ["for", [variable, ...], iterable], ["load"],
+#   ["load_defaults_from"], ["def", name, [arg, ...]], ["use", name]
+# where condition and iterable are expression sources. Keys of known_params are never directives, and its strings are
+# never interpolated, so they're always plain strings.
+#
+# Readers must reject versions they don't know. New versions are only needed for changes old readers would
+# misinterpret.
+FORMAT = "yatl-ir"
+VERSION = 1
+
+
+def dumps(obj: JsonType, known_params: Dict[str, Any], json_mode: str) -> str:
+    return json.dumps(
+        {
+            "format": FORMAT,
+            "version": VERSION,
+            "json": json_mode,
+            "known_params": _encode(known_params, False),
+            "root": _encode(obj, True),
+        },
+        separators=(",", ":"),
+        ensure_ascii=False,
+        allow_nan=False,
+    )
+
+
+def loads(s: str) -> Tuple[JsonType, Dict[str, Any], str]:
+    """Return the template, known params and json mode."""
+    ir = json.loads(s)
+    if not isinstance(ir, dict) or ir.get("format") != FORMAT:
+        raise ValueError("Not a YATL IR document")
+    if ir.get("version") != VERSION:
+        raise ValueError(f"Unsupported YATL IR version: {ir.get('version')}")
+    return _decode(ir["root"]), _decode(ir["known_params"]), ir["json"]
+
+
+def _encode(value: Any, template: bool) -> Any:
+    """Encode value, as part of a template or as plain data."""
+    if isinstance(value, float) and not math.isfinite(value):
+        # JSON has no NaN or infinity.
+        return ["float", repr(value)]
+    elif value is None or isinstance(value, (bool, int, float)):
+        return value
+    elif isinstance(value, str):
+        return _encode_str(value) if template else value
+    elif isinstance(value, dict):
+        encode_key = _encode_key if template else _encode
+        return [
+            "o",
+            [[encode_key(k, template), _encode(v, template)] for k, v in value.items()],
+        ]
+    elif isinstance(value, list):
+        return ["l", [_encode(e, template) for e in value]]
+    elif isinstance(value, datetime.datetime):
+        offset = value.utcoffset()
+        return [
+            "datetime",
+            [
+                *value.timetuple()[:6],
+                value.microsecond,
+                None if offset is None else offset.total_seconds(),
+            ],
+        ]
+    elif isinstance(value, datetime.date):
+        return ["date", [value.year, value.month, value.day]]
+    raise ValueError(f"Cannot serialize {type(value).__name__}: {value!r}")
+
+
+def _encode_str(s: str) -> Any:
+    if ".(" not in s:
+        return s
+    return ["i", [[p] if is_expr else p for p, is_expr in parse_expressions(s)]]
+
+
+def _encode_key(key: Any, template: bool) -> Any:  # noqa: C901
+    if not isinstance(key, str) or not key.startswith("."):
+        return _encode(key, template)
+    elif is_if(key):
+        return ["if", parse_if_condition(key).source]
+    elif is_elif(key):
+        return ["elif", parse_if_condition(key).source]
+    elif key == ".else":
+        return ["else"]
+    elif is_for(key):
+        names, iterable = parse_for_header(key)
+        return ["for", list(names), iterable.source]
+    elif key in (".load", ".load_defaults_from"):
+        return [key[1:]]
+    elif is_def(key):
+        name, args = parse_def_parts(key)
+        return ["def", name, args]
+    elif is_use(key):
+        return ["use", parse_use_name(key)]
+    return _encode_str(key)
+
+
+def _decode(value: Any) -> Any:
+    if not isinstance(value, list):
+        return value
+    tag = value[0]
+    if tag == "o":
+        obj: Dict[Any, Any] = {}
+        for k, v in value[1]:
+            obj[_unique_key(_decode_key(k), obj)] = _decode(v)
+        return obj
+    elif tag == "l":
+        return [_decode(e) for e in value[1]]
+    elif tag == "i":
+        return "".join(p if isinstance(p, str) else f".({p[0]})" for p in value[1])
+    elif tag == "date":
+        return datetime.date(*value[1])
+    elif tag == "datetime":
+        year, month, day, hour, minute, second, microsecond, offset = value[1]
+        tz = (
+            None
+            if offset is None
+            else datetime.timezone(datetime.timedelta(seconds=offset))
+        )
+        return datetime.datetime(
+            year, month, day, hour, minute, second, microsecond, tzinfo=tz
+        )
+    elif tag == "float":
+        return _NON_FINITE[value[1]]
+    raise ValueError(f"Unknown YATL IR value: {value!r}")
+
+
+_NON_FINITE = {"nan": math.nan, "inf": math.inf, "-inf": -math.inf}
+
+
+def _decode_key(key: Any) -> Any:
+    if not isinstance(key, list) or key[0] not in _KEY_DECODERS:
+        return _decode(key)
+    return _KEY_DECODERS[key[0]](*key[1:])
+
+
+def _unique_key(key: Any, obj: Dict[Any, Any]) -> Any:
+    """Make a directive key unique in obj, by adding spaces after the directive's name.
+
+    Directive keys are encoded without their original spacing, so keys which differ only in spacing (like ".if(a)"
+    and ".if (a)") decode the same. Both have to be kept, as each is rendered.
+    """
+    if not needs_raw_value(key):
+        return key
+    name, sep, rest = key.partition(" ")
+    while sep and key in obj:
+        name += " "
+        key = f"{name} {rest}"
+    return key
+
+
+def _def_key(name: str, args: List[str]) -> str:
+    return f".def {name}({', '.join(args)})" if args else f".def {name}"
+
+
+_KEY_DECODERS: Dict[str, Callable[..., str]] = {
+    "if": lambda condition: f".if ({condition})",
+    "elif": lambda condition: f".elif ({condition})",
+    "else": lambda: ".else",
+    "for": lambda names, iterable: f".for ({', '.join(names)} in {iterable})",
+    "load": lambda: ".load",
+    "load_defaults_from": lambda: ".load_defaults_from",
+    "def": _def_key,
+    "use": lambda name: f".use {name}",
+}
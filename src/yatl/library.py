@@ -0,0 +1,59 @@
+from typing import Any, Dict, Iterable, Iterator, Mapping, Optional, Union
+
+from yatl.cache import FileCache
+from yatl.directives import precompile
+from yatl.loaders import Loader
+from yatl.paths import SearchPath
+from yatl.render import Def, render_from_obj, RenderContext
+
+
+class DefLibrary(Mapping[str, Def]):
+    """An immutable set of defs, built once and shared by any number of renders.
+
+    Pass it as the defs argument of load. Defs made by the template itself are layered on top of the library, and
+    never modify it, so a library can be shared by renders in any number of threads.
+    """
+
+    def __init__(self, defs: Mapping[str, Def]):
+        self._defs: Dict[str, Def] = dict(defs)
+
+    def __getitem__(self, name: str) -> Def:
+        return self._defs[name]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._defs)
+
+    def __len__(self) -> int:
+        return len(self._defs)
+
+    def __repr__(self) -> str:
+        return f"DefLibrary({', '.join(self._defs)})"
+
+
+def load_defs(
+    *paths: str,
+    params: Optional[Dict[str, Any]] = None,
+    json: str = "never",
+    file_cache: Optional[FileCache] = None,
+    search_path: Union[SearchPath, Iterable[str], None] = None,
+    loader: Optional[Loader] = None,
+) -> DefLibrary:
+    """Build a DefLibrary from the defs in one or more files.
+
+    The files are rendered in order with params (so defs can be conditional, or loaded from other files), and the
+    rest of their output is discarded. Every expression in the def bodies is compiled up front. Files they load are
+    looked for in their own directories first, then the working directory, then search_path. The paths are found
+    the same way, unless loader is given, in which case they're looked up, and files are loaded, with it.
+    """
+    defs: Dict[str, Def] = {}
+    ctx = RenderContext(
+        defs, json=json, file_cache=file_cache, search_path=search_path, loader=loader
+    )
+    for path in paths:
+        path = ctx.resolve(path)
+        with ctx.in_file(path):
+            render_from_obj(ctx.parse_file(path), params or {}, defs, ctx)
+
+    for df in defs.values():
+        precompile(df.body)
+    return DefLibrary(defs)
@@ -0,0 +1,149 @@
+from contextlib import contextmanager
+import threading
+import time
+from typing import Any, Iterable, Iterator, NamedTuple, Optional, TypeVar
+
+from yatl.types import YATLLimitError
+
+T = TypeVar("T")
+
+# The budget of the render running in each thread, for the parts of a render that aren't given its context.
+_active = threading.local()
+
+# How many items functions like sum read between checks of the deadline.
+_DEADLINE_CHECK_INTERVAL = 1024
+
+
+class RenderLimits(NamedTuple):
+    """Limits on the resources a single render may use. None means unlimited."""
+
+    # Total nodes (objects, lists and scalars) rendered.
+    max_nodes: Optional[int] = None
+    # Total iterations of all for loops. No range in an expression may be longer either.
+    max_iterations: Optional[int] = None
+    # How deeply .load and .load_defaults_from may be nested.
+    max_load_depth: Optional[int] = None
+    # Length of any interpolated string, or string built by an expression.
+    max_string_length: Optional[int] = None
+    # Wall time in seconds.
+    timeout: Optional[float] = None
+
+
+class Budget:
+    """Tracks the resources used by one render, and raises YATLLimitError as soon as a limit is exceeded."""
+
+    def __init__(self, limits: RenderLimits):
+        self.limits = limits
+        self.nodes = 0
+        self.iterations = 0
+        self.load_depth = 0
+        self.deadline = (
+            None if limits.timeout is None else time.monotonic() + limits.timeout
+        )
+
+    @contextmanager
+    def active(self) -> Iterator[None]:
+        """Make this the budget of expressions evaluated in this thread, see active_budget."""
+        outer = active_budget()
+        _active.budget = self
+        try:
+            yield
+        finally:
+            _active.budget = outer
+
+    def add_node(self) -> None:
+        self.nodes += 1
+        max_nodes = self.limits.max_nodes
+        if max_nodes is not None and self.nodes > max_nodes:
+            raise YATLLimitError(f"Rendered more than {max_nodes} nodes")
+        self._check_deadline()
+
+    def add_nodes(self, n: int) -> None:
+        """Add n nodes at once, for parts of the output that are copied rather than rendered."""
+        self.nodes += n - 1
+        self.add_node()
+
+    def add_iteration(self) -> None:
+        self.iterations += 1
+        max_iterations = self.limits.max_iterations
+        if max_iterations is not None and self.iterations > max_iterations:
+            raise YATLLimitError(f"Ran more than {max_iterations} loop iterations")
+        self._check_deadline()
+
+    def add_iterations(self, n: int) -> None:
+        """Add n iterations at once, for loops whose output is copied rather than rendered."""
+        self.iterations += n - 1
+        self.add_iteration()
+
+    def enter_load(self, filename: str) -> None:
+        self.load_depth += 1
+        max_load_depth = self.limits.max_load_depth
+        if max_load_depth is not None and self.load_depth > max_load_depth:
+            raise YATLLimitError(
+                f"Loads nested more than {max_load_depth} deep at {filename}"
+            )
+
+    def exit_load(self) -> None:
+        self.load_depth -= 1
+
+    def check_string(self, s: object) -> None:
+        max_string_length = self.limits.max_string_length
+        if (
+            max_string_length is not None
+            and isinstance(s, str)
+            and len(s) > max_string_length
+        ):
+            raise YATLLimitError(
+                f"Rendered a string longer than {max_string_length} characters"
+            )
+
+    def check_string_length(self, length: int) -> None:
+        max_string_length = self.limits.max_string_length
+        if max_string_length is not None and length > max_string_length:
+            raise YATLLimitError(
+                f"Rendered a string longer than {max_string_length} characters"
+            )
+
+    def check_repeat(self, value: Any, times: Any) -> None:
+        """Check that value * times would be within limits, before it's built."""
+        if not isinstance(times, int) or not isinstance(value, (str, list, tuple)):
+            return
+        length = len(value) * times
+        if isinstance(value, str):
+            self.check_string_length(length)
+        else:
+            max_nodes = self.limits.max_nodes
+            if max_nodes is not None and length > max_nodes:
+                raise YATLLimitError(f"Built a list longer than {max_nodes} elements")
+
+    def check_range(self, r: range) -> None:
+        """Check that r is no longer than the loop iterations allowed, before it's iterated."""
+        max_iterations = self.limits.max_iterations
+        if max_iterations is not None and _length(r) > max_iterations:
+            raise YATLLimitError(f"Range longer than {max_iterations} iterations")
+
+    def iterate(self, iterable: Iterable[T]) -> Iterator[T]:
+        """Iterate, checking the deadline as it goes. This is for loops within an expression, like sum."""
+        for i, item in enumerate(iterable):
+            if i % _DEADLINE_CHECK_INTERVAL == 0:
+                self._check_deadline()
+            yield item
+
+    def _check_deadline(self) -> None:
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            raise YATLLimitError(
+                f"Rendering took longer than {self.limits.timeout} seconds"
+            )
+
+
+def active_budget() -> Optional[Budget]:
+    """The budget of the render running in this thread, if it has one."""
+    return getattr(_active, "budget", None)
+
+
+def _length(r: range) -> int:
+    try:
+        return len(r)
+    except OverflowError:
+        # Longer than sys.maxsize.
+        return abs(r.stop - r.start) // abs(r.step)
@@ -0,0 +1,179 @@
+from abc import ABC, abstractmethod
+import os
+import threading
+from typing import Hashable, Iterable, Mapping, Optional, Union
+import zipfile
+
+from yatl.parsing import parse, parse_file
+from yatl.paths import SearchPath
+from yatl.types import JsonType
+
+
+class Loader(ABC):
+    """Where the files loaded by .load and .load_defaults_from come from. Pass one as the loader argument of load.
+
+    Paths are absolute, with os.sep separators, but don't have to exist on disk: loaders that aren't backed by the
+    filesystem use paths under a directory of their own. Loaders may be used by many threads at once.
+    """
+
+    @abstractmethod
+    def resolve(self, name: str, current_dir: str, base_dir: str) -> str:
+        """Return the path of the file called name, loaded from a file in current_dir. See SearchPath.resolve."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def validator(self, path: str) -> Hashable:
+        """Return a value which changes when the file does. Parsed files are cached (see FileCache) until it changes.
+
+        Raises FileNotFoundError if there's no such file.
+        """
+        raise NotImplementedError
+
+    def read(self, path: str) -> str:
+        """Return the text of the file.
+
+        Loaders must override either this or fetch. Ones that only override fetch, to give files already parsed, have
+        no text to give, so this raises NotImplementedError.
+        """
+        raise NotImplementedError(f"{type(self).__name__} only gives parsed files")
+
+    def fetch(self, path: str, json_mode: str) -> JsonType:
+        """Return the parsed file. By default, this parses the result of read."""
+        return parse(self.read(path), json_mode, name=path)
+
+
+class FileSystemLoader(Loader):
+    """Loads files from disk, looking for them as described in SearchPath."""
+
+    def __init__(self, search_path: Union[SearchPath, Iterable[str]] = ()):
+        if not isinstance(search_path, SearchPath):
+            search_path = SearchPath(search_path)
+        self.search_path = search_path
+
+    def resolve(self, name: str, current_dir: str, base_dir: str) -> str:
+        return self.search_path.resolve(name, current_dir, base_dir)
+
+    def validator(self, path: str) -> Hashable:
+        st = os.stat(path)
+        return st.st_mtime_ns, st.st_size
+
+    def read(self, path: str) -> str:
+        with open(path) as f:
+            return f.read()
+
+    def fetch(self, path: str, json_mode: str) -> JsonType:
+        return parse_file(path, json_mode)
+
+
+class VirtualLoader(Loader):
+    """A base for loaders of files that aren't on disk, which appear to be under root.
+
+    Names are looked for relative to the loading file, then root, then each of search_dirs (relative to root). The
+    base directory is ignored, as it's on disk.
+    """
+
+    def __init__(self, root: str, search_dirs: Iterable[str] = ()):
+        self.root = os.path.abspath(root)
+        self.search_dirs = tuple(os.path.join(self.root, d) for d in search_dirs)
+
+    def resolve(self, name: str, current_dir: str, base_dir: str) -> str:
+        candidates = [
+            os.path.normpath(os.path.join(d, name))
+            for d in (current_dir, self.root, *self.search_dirs)
+        ]
+        return next((p for p in candidates if self.contains(p)), candidates[0])
+
+    def contains(self, path: str) -> bool:
+        key = self.key(path)
+        return key is not None and self.contains_key(key)
+
+    def key(self, path: str) -> Optional[str]:
+        """Return the path relative to root, with "/" separators, or None if it's not under root."""
+        rel = os.path.relpath(path, self.root)
+        if rel == os.pardir or rel.startswith(os.pardir + os.sep):
+            return None
+        return rel.replace(os.sep, "/")
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, *key.split("/"))
+
+    @abstractmethod
+    def contains_key(self, key: str) -> bool:
+        """Whether there's a file with the key (see key)."""
+        raise NotImplementedError
+
+    def _checked_key(self, path: str) -> str:
+        key = self.key(path)
+        if key is None or not self.contains_key(key):
+            raise FileNotFoundError(f"No such file: {path}")
+        return key
+
+
+class MemoryLoader(VirtualLoader):
+    """Loads files from a mapping of names (relative paths, with "/" separators) to their text.
+
+    The mapping is copied, so later changes to it aren't seen. Files are cached by their text, so a FileCache shared
+    by many MemoryLoaders only parses each distinct file once.
+    """
+
+    def __init__(
+        self,
+        files: Mapping[str, str],
+        search_dirs: Iterable[str] = (),
+        root: Optional[str] = None,
+    ):
+        super().__init__(
+            os.path.join(os.sep, "yatl-memory") if root is None else root, search_dirs
+        )
+        self.files = {
+            os.path.normpath(k).replace(os.sep, "/"): v for k, v in files.items()
+        }
+
+    def contains_key(self, key: str) -> bool:
+        return key in self.files
+
+    def validator(self, path: str) -> Hashable:
+        return self.files[self._checked_key(path)]
+
+    def read(self, path: str) -> str:
+        return self.files[self._checked_key(path)]
+
+
+class ZipLoader(VirtualLoader):
+    """Loads files from a zip archive, whose contents are assumed not to change while it's in use."""
+
+    def __init__(
+        self,
+        path: str,
+        search_dirs: Iterable[str] = (),
+        root: Optional[str] = None,
+    ):
+        super().__init__(
+            os.path.join(os.sep, "yatl-zip") if root is None else root, search_dirs
+        )
+        self._zip = zipfile.ZipFile(path)
+        self._infos = {info.filename: info for info in self._zip.infolist()}
+        # Reads share the archive's file, so they're done one at a time.
+        self._lock = threading.Lock()
+
+    def contains_key(self, key: str) -> bool:
+        return key in self._infos
+
+    def validator(self, path: str) -> Hashable:
+        info = self._infos[self._checked_key(path)]
+        # The loader is included, as different archives may have files with the same names.
+        return self, info.CRC, info.file_size
+
+    def read(self, path: str) -> str:
+        key = self._checked_key(path)
+        with self._lock:
+            return self._zip.read(key).decode()
+
+    def close(self) -> None:
+        self._zip.close()
+
+    def __enter__(self) -> "ZipLoader":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
@@ -0,0 +1,110 @@
+import hashlib
+import os
+from typing import Any, Optional, Tuple
+
+from yatl.parsing import is_json, parse
+from yatl.render import JsonType, layer_defs, render_from_obj, RenderContext
+from yatl.streaming import render_stream
+
+
+def load(
+    str_or_file,
+    params,
+    streaming=False,
+    json="never",
+    file_cache=None,
+    defs=None,
+    limits=None,
+    profiler=None,
+    base_dir=None,
+    search_path=None,
+    loader=None,
+    select=None,
+    result_cache=None,
+    frozen=False,
+) -> JsonType:
+    """Load and render a YATL template.
+
+    If streaming is true, the template is rendered while it is being parsed, so the full input tree is never held in
+    memory. This is slower for small inputs, but bounds peak memory for very large ones.
+
+    json controls when the much faster JSON parser is used instead of the YAML parser, both for the template and
+    for files it loads. See parsing.JSON_MODES for the options.
+
+    Pass a cache.FileCache as file_cache to share parsed files between calls, and a library.DefLibrary (see
+    load_defs) as defs to make its defs available to the template.
+
+    Pass a limits.RenderLimits as limits to abort with YATLLimitError as soon as the render exceeds any of them.
+
+    Relative file names in .load and .load_defaults_from are looked for in the directory of the file doing the
+    loading, then base_dir (by default the working directory), then each directory in search_path (a list, or a
+    paths.SearchPath to share between calls). If str_or_file is a file, loads in it are looked for in its directory
+    first.
+
+    To load files from somewhere other than the filesystem, pass a loaders.Loader as loader, such as a MemoryLoader
+    or ZipLoader.
+
+    Pass a profiling.Profiler as profiler to record where in the template the render's time is spent. This can't be
+    combined with streaming.
+
+    To render only part of the output, pass select, a list of paths like "spec.template.containers" (or lists of
+    keys). Only fields on a selected path are rendered, along with the directives that could add to them, so files
+    loaded by other fields are never read. Lists are always rendered in full. This can't be combined with streaming.
+
+    Pass a results.ResultCache as result_cache to return a remembered result when the same template is rendered
+    with the same values of the params it reads, without parsing or rendering it. This can't be combined with
+    streaming or profiling.
+
+    If frozen is true, every object and list in the result is a frozen.FrozenDict or FrozenList, which can't be
+    modified and is hashable, so results can be shared without copying them. Unchanged parts are shared rather than
+    copied: data files are shared with every render that loads them, and the parts of a loop's body that don't
+    depend on the loop variable with every iteration.
+    """
+    if select is not None and streaming:
+        raise ValueError("select is not supported when streaming")
+    if result_cache is not None and (streaming or profiler is not None):
+        raise ValueError("A result cache can't be used when streaming or profiling")
+    ctx = RenderContext(
+        layer_defs(defs),
+        json=json,
+        file_cache=file_cache,
+        limits=limits,
+        profiler=profiler,
+        base_dir=base_dir,
+        search_path=search_path,
+        loader=loader,
+        select=select,
+        frozen=frozen,
+    )
+    template_dir = _template_dir(str_or_file)
+    if template_dir is not None:
+        ctx.current_dir = template_dir
+    if profiler is not None:
+        if streaming:
+            raise ValueError("Profiling is not supported when streaming")
+        return render_from_obj(profiler.parse(str_or_file, json), params, ctx.defs, ctx)
+    if result_cache is not None:
+        text, name = _read_template(str_or_file)
+        template = (hashlib.sha256(text.encode()).digest(), name)
+        return result_cache.render(
+            template, params, ctx, defs, lambda: parse(text, json, name)
+        )
+    if streaming and not is_json(str_or_file, json):
+        return render_stream(str_or_file, params, ctx)
+    obj = parse(str_or_file, json)
+    return render_from_obj(obj, params, ctx.defs, ctx)
+
+
+def _read_template(str_or_file: Any) -> Tuple[str, Optional[str]]:
+    """Return the text of the template, and its file name (which says whether it's JSON)."""
+    if isinstance(str_or_file, str):
+        return str_or_file, None
+    name = getattr(str_or_file, "name", None)
+    return str_or_file.read(), name if isinstance(name, str) else None
+
+
+def _template_dir(str_or_file: Any) -> Optional[str]:
+    name = getattr(str_or_file, "name", None)
+    if not isinstance(name, str) or name.startswith("<"):
+        return None
+    return os.path.dirname(os.path.abspath(name))
@@ -0,0 +1,77 @@
+import json
+from typing import IO, Optional, Union
+
+import yaml
+
+from yatl.types import JsonType
+
+# How JSON input is detected:
+#   never: Always parse with the YAML parser. The default.
+#   extension: Parse files whose name ends with .json with the JSON parser.
+#   sniff: Like extension, but also try the JSON parser on anything that starts with { or [.
+# JSON is mostly a subset of YAML, so the other modes mostly only change the speed of parsing. But YAML 1.1
+# disagrees with JSON in a few corner cases (e.g. 1e3 is a string in YAML but a number in JSON), and .json files
+# with YAML in them fail to load, so they're opt-in.
+JSON_MODES = ("never", "extension", "sniff")
+
+
+def parse(
+    str_or_file: Union[str, IO],
+    json_mode: str = "never",
+    name: Optional[str] = None,
+) -> JsonType:
+    """Parse YAML or JSON from a string or file object. name is the file name of a string, if it has one."""
+    _check_json_mode(json_mode)
+    if json_mode == "never":
+        return yaml.safe_load(str_or_file)
+
+    if isinstance(str_or_file, str) and _has_json_extension(name):
+        return json.loads(str_or_file)
+    if isinstance(str_or_file, str):
+        text = str_or_file
+    else:
+        if _has_json_extension(getattr(str_or_file, "name", None)):
+            return json.load(str_or_file)
+        if json_mode == "extension":
+            return yaml.safe_load(str_or_file)
+        text = str_or_file.read()
+
+    if json_mode == "sniff" and _looks_like_json(text):
+        try:
+            return json.loads(text)
+        except ValueError:
+            # It's probably a YAML flow collection.
+            pass
+    return yaml.safe_load(text)
+
+
+def parse_file(path: str, json_mode: str = "never") -> JsonType:
+    with open(path) as f:
+        return parse(f, json_mode)
+
+
+def is_json(
+    str_or_file: Union[str, IO], json_mode: str, name: Optional[str] = None
+) -> bool:
+    """Whether str_or_file will be parsed as JSON, without consuming it."""
+    _check_json_mode(json_mode)
+    if json_mode == "never":
+        return False
+    if not isinstance(str_or_file, str):
+        return _has_json_extension(getattr(str_or_file, "name", None))
+    if _has_json_extension(name):
+        return True
+    return json_mode == "sniff" and _looks_like_json(str_or_file)
+
+
+def _check_json_mode(json_mode: str) -> None:
+    if json_mode not in JSON_MODES:
+        raise ValueError(f"json must be one of {', '.join(JSON_MODES)}: {json_mode}")
+
+
+def _has_json_extension(name: object) -> bool:
+    return isinstance(name, str) and name.lower().endswith(".json")
+
+
+def _looks_like_json(s: str) -> bool:
+    return s.lstrip()[:1] in ("{", "[")
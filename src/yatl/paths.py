@@ -0,0 +1,43 @@
+import os
+from typing import Dict, Iterable, Tuple
+
+
+class SearchPath:
+    """Resolves the file names given to .load and .load_defaults_from.
+
+    A relative name is looked for in the directory of the file doing the loading, then the render's base directory,
+    then each of dirs in order. Where each name was found is remembered, so share a SearchPath between renders to
+    only look once. Call clear after adding files that would change where a name is found.
+    """
+
+    def __init__(self, dirs: Iterable[str] = ()):
+        self.dirs = tuple(os.path.abspath(d) for d in dirs)
+        self._found: Dict[Tuple[str, str, str], str] = {}
+
+    def resolve(self, name: str, current_dir: str, base_dir: str) -> str:
+        """Return the path of name, loaded from a file in current_dir.
+
+        If it's not found anywhere, this returns the path in current_dir, so the error opening it names that.
+        """
+        if os.path.isabs(name):
+            return name
+
+        key = (name, current_dir, base_dir)
+        path = self._found.get(key)
+        if path is None:
+            candidates = [
+                os.path.normpath(os.path.join(d, name))
+                for d in (current_dir, base_dir, *self.dirs)
+            ]
+            path = next((p for p in candidates if os.path.isfile(p)), None)
+            if path is None:
+                # Not remembered, as it may be created later.
+                return candidates[0]
+            self._found[key] = path
+        return path
+
+    def clear(self) -> None:
+        self._found.clear()
+
+    def __repr__(self) -> str:
+        return f"SearchPath({list(self.dirs)!r})"
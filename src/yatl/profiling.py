@@ -0,0 +1,184 @@
+from collections import defaultdict
+import os
+from time import perf_counter
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import yaml
+
+from yatl.cache import CachedFile, data_info
+from yatl.loaders import Loader
+from yatl.parsing import is_json, parse
+from yatl.types import JsonType
+
+# The location of a template node, like "app.yaml:12".
+Location = str
+
+
+class ProfileEntry(NamedTuple):
+    location: Location
+    # Times a node at the location was rendered.
+    calls: int
+    # Seconds spent rendering nodes at the location, excluding nodes nested in them.
+    self_time: float
+    # Seconds spent rendering nodes at the location, including nodes nested in them.
+    total_time: float
+    # Nodes (objects, lists and scalars) output by nodes at the location.
+    output_nodes: int
+
+
+class _Stats:
+    __slots__ = ("calls", "self_time", "total_time", "output_nodes")
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.self_time = 0.0
+        self.total_time = 0.0
+        self.output_nodes = 0
+
+
+class Profiler:
+    """Attributes render time to the lines of the template (and loaded files) it's spent on.
+
+    Pass one as the profiler argument of load. Every object and list in the template is timed, and scalars count
+    towards the object or list they're in. Templates are parsed more slowly while profiling, to keep the location of
+    each node. JSON files are parsed as usual, so all of their nodes are attributed to the first line.
+
+    Unlike the other shared objects, a profiler can only be used by one render at a time.
+    """
+
+    def __init__(self) -> None:
+        # Locations of parsed nodes, by id. The trees are kept so the ids stay unique.
+        self._locations: Dict[int, Location] = {}
+        self._trees: List[JsonType] = []
+        self._files: Dict[Tuple[str, str], CachedFile] = {}
+        self._stats: Dict[Location, _Stats] = defaultdict(_Stats)
+        self._collapsed: Dict[Tuple[Location, ...], float] = defaultdict(float)
+        self._stack: List[Location] = []
+        self._child_times: List[float] = []
+        self._sizes: Dict[int, Tuple[JsonType, int]] = {}
+
+    def parse(
+        self, str_or_file: Any, json_mode: str, name: Optional[str] = None
+    ) -> JsonType:
+        """Parse a template, remembering where each node came from. name is the file name to show."""
+        if name is None:
+            name = getattr(str_or_file, "name", "<template>")
+            if name.startswith("<"):
+                name = "<template>"
+        if is_json(str_or_file, json_mode, name):
+            obj = parse(str_or_file, json_mode, name)
+            self._locations[id(obj)] = f"{name}:1"
+        else:
+            loader = _LocatingLoader(str_or_file, name, self._locations)
+            try:
+                obj = loader.get_single_data()
+            finally:
+                loader.dispose()
+        self._trees.append(obj)
+        return obj
+
+    def parse_file(self, path: str, json_mode: str, loader: Loader) -> CachedFile:
+        key = (path, json_mode)
+        if key not in self._files:
+            # Loaded files are resolved to absolute paths, which are shortened if they're in the working directory.
+            name = os.path.relpath(path)
+            try:
+                text = loader.read(path)
+            except NotImplementedError:
+                # The loader only gives parsed files, so their nodes can't be located.
+                obj = loader.fetch(path, json_mode)
+            else:
+                obj = self.parse(
+                    text, json_mode, path if name.startswith("..") else name
+                )
+            self._files[key] = CachedFile(obj, data_info(obj))
+        return self._files[key]
+
+    def render(
+        self,
+        obj: JsonType,
+        params: Dict[str, Any],
+        ctx: Any,
+        render: Callable[[JsonType, Dict[str, Any], Any], JsonType],
+    ) -> JsonType:
+        """Render obj with render, timing it if it's a located node."""
+        location = (
+            self._locations.get(id(obj)) if isinstance(obj, (dict, list)) else None
+        )
+        if location is None:
+            return render(obj, params, ctx)
+
+        outermost = location not in self._stack
+        self._stack.append(location)
+        self._child_times.append(0.0)
+        start = perf_counter()
+        try:
+            value = render(obj, params, ctx)
+        finally:
+            elapsed = perf_counter() - start
+            self_time = elapsed - self._child_times.pop()
+            self._collapsed[tuple(self._stack)] += self_time
+            self._stack.pop()
+            if self._child_times:
+                self._child_times[-1] += elapsed
+
+            stats = self._stats[location]
+            stats.calls += 1
+            stats.self_time += self_time
+            if outermost:
+                # Don't count time twice when a node is rendered inside itself (by a recursive def).
+                stats.total_time += elapsed
+
+        stats.output_nodes += self._size(value)
+        return value
+
+    def entries(self) -> List[ProfileEntry]:
+        """Return the stats for every location, most expensive (by self time) first."""
+        entries = [
+            ProfileEntry(loc, s.calls, s.self_time, s.total_time, s.output_nodes)
+            for loc, s in self._stats.items()
+        ]
+        return sorted(entries, key=lambda e: e.self_time, reverse=True)
+
+    def report(self, limit: int = 20) -> str:
+        """Return a table of the most expensive locations."""
+        lines = [
+            f"{'self (s)':>10} {'total (s)':>10} {'calls':>8} {'nodes':>10}  location"
+        ]
+        for e in self.entries()[:limit]:
+            lines.append(
+                f"{e.self_time:10.6f} {e.total_time:10.6f} {e.calls:8} {e.output_nodes:10}  {e.location}"
+            )
+        return "\n".join(lines)
+
+    def collapsed(self) -> str:
+        """Return self times in the collapsed stack format read by flame graph tools, in microseconds."""
+        return "".join(
+            f"{';'.join(stack)} {round(t * 1e6)}\n"
+            for stack, t in sorted(self._collapsed.items())
+        )
+
+    def _size(self, value: JsonType) -> int:
+        # Rendered subtrees are usually part of the output of the nodes they're in, so sizes are remembered.
+        if not isinstance(value, (dict, list)):
+            return 1
+        cached = self._sizes.get(id(value))
+        if cached is not None and cached[0] is value:
+            return cached[1]
+        children = value.values() if isinstance(value, dict) else value
+        size = 1 + sum(self._size(child) for child in children)
+        self._sizes[id(value)] = (value, size)
+        return size
+
+
+class _LocatingLoader(yaml.SafeLoader):
+    def __init__(self, stream: Any, name: str, locations: Dict[int, Location]):
+        super().__init__(stream)
+        self.name = name
+        self.locations = locations
+
+    def construct_object(self, node: yaml.Node, deep: bool = False) -> Any:
+        data = super().construct_object(node, deep)
+        if isinstance(data, (dict, list)) and id(data) not in self.locations:
+            self.locations[id(data)] = f"{self.name}:{node.start_mark.line + 1}"
+        return data
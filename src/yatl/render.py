@@ -1,11 +1,50 @@
-import re
-from typing import Any, Dict, List, NamedTuple, Tuple
-
-import yaml
-
+from collections import ChainMap
+from contextlib import contextmanager
+import marshal
+import os
+from typing import (
+    Any,
+    Callable,
+    cast,
+    Dict,
+    Hashable,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    MutableMapping,
+    NamedTuple,
+    Optional,
+    Sized,
+    Tuple,
+    TYPE_CHECKING,
+    Union,
+)
+
+from yatl.analysis import find_invariants
+from yatl.cache import CachedFile, FileCache
+from yatl.directives import (
+    is_def,
+    is_directive_obj,
+    is_elif,
+    is_for,
+    is_if,
+    is_use,
+    parse_def_parts,
+    parse_for_header,
+    parse_if_condition,
+    parse_use_name,
+)
+from yatl.frozen import freeze
 from yatl.interpolation import render_interpolation
+from yatl.limits import Budget, RenderLimits
+from yatl.loaders import FileSystemLoader, Loader
+from yatl.paths import SearchPath
 from yatl.types import JsonType, YATLEnvironmentError, YATLSyntaxError
 
+if TYPE_CHECKING:
+    from yatl.profiling import Profiler
+
 
 class Def(NamedTuple):
     name: str
@@ -13,81 +52,319 @@ class Def(NamedTuple):
     body: JsonType
 
 
-def render_from_obj(  # noqa: C901
-    obj: JsonType, params: Dict[str, Any], defs: Dict[str, Def]
+def layer_defs(defs: Optional[Mapping[str, Def]]) -> MutableMapping[str, Def]:
+    """Return a map for the defs made by a render, on top of defs (e.g. a DefLibrary), which is never modified."""
+    # Only the first map of a ChainMap is ever modified.
+    return ChainMap({}, cast(MutableMapping[str, Def], defs or {}))
+
+
+# The parts of the output to render: each key maps to the selection within its value, or None for all of it.
+Selection = Dict[str, Any]
+
+
+def parse_select(paths: Iterable[Union[str, Iterable[str]]]) -> Selection:
+    """Build a selection from output paths, either dotted strings like "spec.containers" or sequences of keys."""
+    selection: Selection = {}
+    for path in paths:
+        keys = path.split(".") if isinstance(path, str) else [str(k) for k in path]
+        if not keys or "" in keys:
+            raise ValueError(f"Invalid select path: {path!r}")
+        node = selection
+        for key in keys[:-1]:
+            node = node.setdefault(key, {})
+            if node is None:
+                # An enclosing path is already selected in full.
+                break
+        else:
+            node[keys[-1]] = None
+    return selection
+
+
+class RenderContext:
+    """Options and state shared by everything rendered by one call to load."""
+
+    def __init__(
+        self,
+        defs: MutableMapping[str, Def],
+        json: str = "never",
+        file_cache: Optional[FileCache] = None,
+        limits: Optional[RenderLimits] = None,
+        profiler: Optional["Profiler"] = None,
+        base_dir: Optional[str] = None,
+        search_path: Union[SearchPath, Iterable[str], None] = None,
+        loader: Optional[Loader] = None,
+        select: Optional[Iterable[Union[str, Iterable[str]]]] = None,
+        frozen: bool = False,
+    ):
+        self.defs = defs
+        # How to detect JSON files, see parsing.JSON_MODES.
+        self.json = json
+        # Parsed files, possibly shared with other renders. Even when not shared, files are cached for the render so
+        # that a file loaded repeatedly (e.g. in a loop) is the same object each time, which hoisting relies on.
+        self.file_cache = FileCache() if file_cache is None else file_cache
+        self.budget = None if limits is None else Budget(limits)
+        # The nodes of enclosing for loops' bodies which render the same in every iteration, keyed by id.
+        self.hoisted: Dict[int, Hoisted] = {}
+        # The invariant nodes of loop bodies already analyzed, keyed by the body's id (see find_invariants).
+        self.invariants: Dict[int, Tuple[JsonType, Dict[int, JsonType]]] = {}
+        self.profiler = profiler
+        # Where loaded files come from. search_path is only used by the default loader.
+        self.loader = FileSystemLoader(search_path or ()) if loader is None else loader
+        # Relative file names are looked for in the directory of the file being rendered, then base_dir, then the
+        # search path. The working directory is only read here, so it can't change during a render.
+        self.base_dir = os.path.abspath(os.curdir if base_dir is None else base_dir)
+        self.current_dir = self.base_dir
+        # What's rendered of the object being rendered, see parse_select. None renders everything.
+        self.selection: Optional[Selection] = (
+            None if select is None else parse_select(select)
+        )
+        # Whether the output is frozen (see frozen.freeze), so parts of it can be shared rather than copied.
+        self.frozen = frozen
+        # If set, the validator of every file loaded is added to it, by path (see results.ResultCache).
+        self.loaded: Optional[Dict[str, Hashable]] = None
+        # If set, every def used is added to it, by name and then by the id of its body (see results.ResultCache).
+        self.used_defs: Optional[Dict[str, Dict[int, Def]]] = None
+
+    def resolve(self, filename: str) -> str:
+        return self.loader.resolve(filename, self.current_dir, self.base_dir)
+
+    @contextmanager
+    def in_file(self, path: str) -> Iterator[None]:
+        """Resolve relative file names against the directory of path."""
+        outer_dir = self.current_dir
+        self.current_dir = os.path.dirname(path)
+        try:
+            yield
+        finally:
+            self.current_dir = outer_dir
+
+    @contextmanager
+    def loading(self, filename: str) -> Iterator[str]:
+        """Resolve filename, and track the nesting of loaded files. Yields the path of the file."""
+        path = self.resolve(filename)
+        with self.in_file(path):
+            if self.budget is None:
+                yield path
+                return
+
+            self.budget.enter_load(filename)
+            try:
+                yield path
+            finally:
+                self.budget.exit_load()
+
+    @contextmanager
+    def limited(self) -> Iterator[None]:
+        """Apply the budget, if there is one, to the expressions evaluated within (see limits.active_budget)."""
+        if self.budget is None:
+            yield
+            return
+        with self.budget.active():
+            yield
+
+    @contextmanager
+    def selecting(self, selection: Optional[Selection]) -> Iterator[None]:
+        outer_selection = self.selection
+        self.selection = selection
+        try:
+            yield
+        finally:
+            self.selection = outer_selection
+
+    def parse_file(self, path: str) -> JsonType:
+        return self.load_file(path).obj
+
+    def load_file(self, path: str) -> CachedFile:
+        if self.loaded is not None:
+            # Taken first, so if the file changes while it's read, the result is seen to be out of date.
+            self.loaded[path] = self.loader.validator(path)
+        if self.profiler is not None:
+            return self.profiler.parse_file(path, self.json, self.loader)
+        return self.file_cache.get_file(path, self.json, self.loader)
+
+
+class Hoisted:
+    """A loop-invariant node, and its rendered value once the first iteration has rendered it."""
+
+    __slots__ = ("obj", "rendered", "value", "nodes", "iterations")
+
+    def __init__(self, obj: JsonType):
+        # Kept so the id stays unique while the loop runs.
+        self.obj = obj
+        self.rendered = False
+        self.value: JsonType = None
+        # What rendering it used of the budget, if there is one, which is charged again whenever the value is reused.
+        self.nodes = 0
+        self.iterations = 0
+
+
+def render_from_obj(
+    obj: JsonType,
+    params: Dict[str, Any],
+    defs: MutableMapping[str, Def],
+    ctx: Optional[RenderContext] = None,
 ) -> JsonType:
-    if isinstance(obj, dict):
-        defaults_obj: JsonType = None
-        rendered_obj: JsonType = {}
-        last_if = None
+    if ctx is None:
+        ctx = RenderContext(defs)
+    with ctx.limited():
+        rendered = _render(obj, params, ctx)
+    return freeze(rendered) if ctx.frozen else rendered
 
-        for key, value in obj.items():
-            if isinstance(key, str) and key.startswith("."):
-                # Note, elif and else require Python 3.7+ or a custom YAML loader to preserve key order.
-                if _is_if(key):
-                    rendered_obj, last_if = _render_if(
-                        key, value, params, defs, rendered_obj
-                    )
-                elif _is_elif(key):
-                    if last_if is None:
-                        raise YATLSyntaxError(f"elif does not follow if: {key}")
-                    if last_if is False:
-                        rendered_obj, last_if = _render_if(
-                            key, value, params, defs, rendered_obj
-                        )
-                elif key == ".else":
-                    if last_if is None:
-                        raise YATLSyntaxError(f"else does not follow if: {key}")
-                    if last_if is False:
-                        rendered_obj = _render_else(
-                            key, value, params, defs, rendered_obj
-                        )
-                else:
-                    last_if = None
-                    if key == ".load":
-                        rendered_obj = _render_load(value, params, defs, rendered_obj)
-                    elif key == ".load_defaults_from":
-                        defaults_obj = _load_defaults(value, params, defs)
-                    elif _is_for(key):
-                        rendered_obj = _render_for(
-                            key, value, params, defs, rendered_obj
-                        )
-                    elif _is_def(key):
-                        _store_def(key, value, defs)
-                    elif _is_use(key):
-                        rendered_obj = _render_use(
-                            key, value, params, defs, rendered_obj
-                        )
-                    else:
-                        _update_obj(rendered_obj, key, value, params, defs)
-            else:
-                last_if = None
-                _update_obj(rendered_obj, key, value, params, defs)
 
-        if defaults_obj:
-            rendered_obj = _deep_merge_dicts(defaults_obj, rendered_obj)  # type: ignore
+def _render(obj: JsonType, params: Dict[str, Any], ctx: RenderContext) -> JsonType:
+    if ctx.profiler is not None:
+        return ctx.profiler.render(obj, params, ctx, _render_hoisted)
+    return _render_hoisted(obj, params, ctx)
+
+
+def _render_hoisted(
+    obj: JsonType, params: Dict[str, Any], ctx: RenderContext
+) -> JsonType:
+    hoisted = ctx.hoisted.get(id(obj)) if ctx.hoisted else None
+    if hoisted is None or hoisted.obj is not obj:
+        return _render_node(obj, params, ctx)
+
+    budget = ctx.budget
+    if hoisted.rendered:
+        if budget is not None:
+            # Charged for exactly what rendering it again would use, so hoisting doesn't change when limits are hit.
+            budget.add_nodes(hoisted.nodes)
+            budget.add_iterations(hoisted.iterations)
+        if ctx.frozen:
+            # Frozen, so every iteration can share it.
+            return hoisted.value
+        # Each iteration gets its own copy, so no two parts of the output are the same object.
+        return _copy_rendered(hoisted.value)
+
+    if budget is not None:
+        nodes, iterations = budget.nodes, budget.iterations
+    hoisted.value = _render_node(obj, params, ctx)
+    if budget is not None:
+        hoisted.nodes = budget.nodes - nodes
+        hoisted.iterations = budget.iterations - iterations
+    if ctx.frozen:
+        hoisted.value = freeze(hoisted.value)
+    hoisted.rendered = True
+    return hoisted.value
+
+
+def _copy_rendered(value: JsonType) -> JsonType:
+    if isinstance(value, dict):
+        return {k: _copy_rendered(v) for k, v in value.items()}
+    elif isinstance(value, list):
+        return [_copy_rendered(v) for v in value]
+    return value
+
 
-        return rendered_obj
+def _render_node(obj: JsonType, params: Dict[str, Any], ctx: RenderContext) -> JsonType:
+    if ctx.budget is not None:
+        ctx.budget.add_node()
+    if isinstance(obj, dict):
+        renderer = ObjectRenderer(params, ctx)
+        for key, value in obj.items():
+            renderer.add(key, value)
+        return renderer.finish()
     elif isinstance(obj, list):
-        rendered_obj = []
-        for elem in obj:
-            rendered_elem = render_from_obj(elem, params, defs)
-            if _can_extend_list(elem, rendered_elem):
-                # Convert rendered_elem to [] if it's {}
-                rendered_obj.extend(rendered_elem or [])  # type: ignore
-            else:
-                rendered_obj.append(rendered_elem)
-        return rendered_obj
+        if ctx.selection is not None:
+            # Paths select object fields, so every element is rendered in full.
+            with ctx.selecting(None):
+                return _render_list(obj, params, ctx)
+        return _render_list(obj, params, ctx)
     elif isinstance(obj, str):
-        return render_interpolation(obj, params)
+        rendered = render_interpolation(obj, params)
+        if ctx.budget is not None:
+            ctx.budget.check_string(rendered)
+        return rendered
     else:
         return obj
 
 
+def _render_list(obj: list, params: Dict[str, Any], ctx: RenderContext) -> list:
+    rendered_obj: list = []
+    for elem in obj:
+        rendered_elem = _render(elem, params, ctx)
+        add_list_elem(rendered_obj, rendered_elem, is_directive_obj(elem))
+    return rendered_obj
+
+
+class ObjectRenderer:
+    """Renders the fields of an object one at a time, in order.
+
+    Besides render_from_obj, this is used by the streaming renderer, which renders plain fields as they are parsed
+    and only passes directives here unrendered.
+    """
+
+    def __init__(self, params: Dict[str, Any], ctx: RenderContext):
+        self.params = params
+        self.ctx = ctx
+        self.defaults_obj: JsonType = None
+        self.rendered_obj: JsonType = {}
+        self.last_if: Optional[bool] = None
+
+    def add(self, key: Any, value: JsonType) -> None:  # noqa: C901
+        params, ctx, rendered_obj = self.params, self.ctx, self.rendered_obj
+        if isinstance(key, str) and key.startswith("."):
+            # Note, elif and else require Python 3.7+ or a custom YAML loader to preserve key order.
+            if is_if(key):
+                rendered_obj, self.last_if = _render_if(
+                    key, value, params, ctx, rendered_obj
+                )
+            elif is_elif(key):
+                if self.last_if is None:
+                    raise YATLSyntaxError(f"elif does not follow if: {key}")
+                if self.last_if is False:
+                    rendered_obj, self.last_if = _render_if(
+                        key, value, params, ctx, rendered_obj
+                    )
+            elif key == ".else":
+                if self.last_if is None:
+                    raise YATLSyntaxError(f"else does not follow if: {key}")
+                if self.last_if is False:
+                    rendered_obj = _render_else(key, value, params, ctx, rendered_obj)
+            else:
+                self.last_if = None
+                if key == ".load":
+                    rendered_obj = _render_load(value, params, ctx, rendered_obj)
+                elif key == ".load_defaults_from":
+                    self.defaults_obj = _load_defaults(value, params, ctx)
+                elif is_for(key):
+                    rendered_obj = _render_for(key, value, params, ctx, rendered_obj)
+                elif is_def(key):
+                    _store_def(key, value, ctx)
+                elif is_use(key):
+                    rendered_obj = _render_use(key, value, params, ctx, rendered_obj)
+                else:
+                    _update_obj(rendered_obj, key, value, params, ctx)
+        else:
+            self.last_if = None
+            _update_obj(rendered_obj, key, value, params, ctx)
+        self.rendered_obj = rendered_obj
+
+    def add_rendered(self, key: Any, rendered_value: JsonType) -> None:
+        """Add a plain (non-directive) field whose value has already been rendered."""
+        self.last_if = None
+        _set_field(self.rendered_obj, key, rendered_value, self.params, self.ctx)
+
+    def finish(self) -> JsonType:
+        if self.defaults_obj:
+            return _deep_merge_dicts(self.defaults_obj, self.rendered_obj)  # type: ignore
+        return self.rendered_obj
+
+
+def add_list_elem(
+    rendered_list: list, rendered_elem: JsonType, elem_is_directive_obj: bool
+) -> None:
+    if _can_extend_list(elem_is_directive_obj, rendered_elem):
+        # Convert rendered_elem to [] if it's {}
+        rendered_list.extend(rendered_elem or [])  # type: ignore
+    else:
+        rendered_list.append(rendered_elem)
+
+
 def _render_load(
     value: JsonType,
     params: Dict[str, Any],
-    defs: Dict[str, Def],
+    ctx: RenderContext,
     rendered_obj: JsonType,
 ) -> JsonType:
     if not isinstance(value, list):
@@ -95,15 +372,67 @@ def _render_load(
 
     for filename in value:
         filename = _parse_filename(filename, params, "load")
-        elem = _load_yaml(filename)
-        rendered_elem = render_from_obj(elem, params, defs)
-        rendered_obj = _shallow_merge(
-            f"load: {filename}", rendered_elem, params, defs, rendered_obj
-        )
+        with ctx.loading(filename) as path:
+            rendered_elem = _render_file(ctx.load_file(path), params, ctx)
+        rendered_obj = _merge_rendered(f"load: {filename}", rendered_elem, rendered_obj)
 
     return rendered_obj
 
 
+def _render_file(
+    file: CachedFile, params: Dict[str, Any], ctx: RenderContext
+) -> JsonType:
+    if file.data is None:
+        return _render(file.obj, params, ctx)
+
+    # Rendering a file of plain data would just copy it, so copy it without the render walk. It's still copied
+    # rather than shared with the output, so changes to the output can't reach the cache.
+    if ctx.budget is not None:
+        ctx.budget.add_nodes(file.data.nodes)
+        ctx.budget.check_string_length(file.data.max_string_length)
+    if ctx.frozen:
+        # The file can be shared, without copying it at all.
+        if ctx.selection is not None:
+            return _select_data(file.frozen(), ctx.selection, _share)
+        return file.frozen()
+    if ctx.selection is not None:
+        return _select_data(file.obj, ctx.selection, _copy_data)
+    if file.data.snapshot is not None:
+        return marshal.loads(file.data.snapshot)
+    return _copy_data(file.obj)
+
+
+def _select_data(
+    value: JsonType,
+    selection: Optional[Selection],
+    copy: Callable[[JsonType], JsonType],
+) -> JsonType:
+    """Copy the selected parts of a data file, using copy for the parts selected in full."""
+    if selection is None or not isinstance(value, dict):
+        return copy(value)
+    return {
+        k: _select_data(v, selection[str(k)], copy)
+        for k, v in value.items()
+        if str(k) in selection
+    }
+
+
+def _copy_data(value: JsonType) -> JsonType:
+    # Data files are mostly scalars, so only recurse into objects and lists.
+    if isinstance(value, dict):
+        return {
+            k: _copy_data(v) if isinstance(v, (dict, list)) else v
+            for k, v in value.items()
+        }
+    elif isinstance(value, list):
+        return [_copy_data(v) if isinstance(v, (dict, list)) else v for v in value]
+    return value
+
+
+def _share(value: JsonType) -> JsonType:
+    return value
+
+
 def _parse_filename(filename: JsonType, params: Dict[str, Any], load_type: str) -> str:
     if not isinstance(filename, str):
         raise YATLSyntaxError(
@@ -117,20 +446,21 @@ def _parse_filename(filename: JsonType, params: Dict[str, Any], load_type: str)
     return filename
 
 
-def _load_defaults(
-    value: JsonType, params: Dict[str, Any], defs: Dict[str, Def]
-) -> dict:
+def _load_defaults(value: JsonType, params: Dict[str, Any], ctx: RenderContext) -> dict:
     if not isinstance(value, list):
         value = [value]
 
     accumulated_defaults: dict = {}
     for filename in value:
         filename = _parse_filename(filename, params, "load_defaults_from")
-        defaults = _load_yaml(filename)
-        if not isinstance(defaults, dict):
-            raise YATLSyntaxError(f"{filename} must be an object at the top-level")
-
-        rendered_defaults = render_from_obj(defaults, params, defs)
+        with ctx.loading(filename) as path:
+            file = ctx.load_file(path)
+            if not isinstance(file.obj, dict):
+                raise YATLSyntaxError(f"{filename} must be an object at the top-level")
+
+            rendered_defaults = _render_file(file, params, ctx)
+        if not isinstance(rendered_defaults, dict):
+            raise YATLSyntaxError(f"{filename} must render to an object")
         accumulated_defaults = _deep_merge_dicts(
             accumulated_defaults, rendered_defaults
         )
@@ -138,29 +468,15 @@ def _load_defaults(
     return accumulated_defaults
 
 
-def _is_if(key: str) -> bool:
-    return bool(re.match(r"\.if\b", key))
-
-
-def _is_elif(key: str) -> bool:
-    return bool(re.match(r"\.elif\b", key))
-
-
 def _render_if(
     if_key: str,
     if_value: JsonType,
     params: Dict[str, Any],
-    defs: Dict[str, Def],
+    ctx: RenderContext,
     rendered_obj: JsonType,
 ) -> Tuple[JsonType, bool]:
-    # This regular expression captures both if and elif.
-    if_match = re.match(r"\.(?:el)?if\s*\((.*)\)\s*$", if_key)
-    if not if_match:
-        raise YATLSyntaxError(f"Invalid if statement: {if_key}")
-
-    condition = if_match[1].strip()
-    if params[condition]:
-        return _shallow_merge(if_key, if_value, params, defs, rendered_obj), True
+    if parse_if_condition(if_key)(params):
+        return _shallow_merge(if_key, if_value, params, ctx, rendered_obj), True
 
     return rendered_obj, False
 
@@ -169,14 +485,17 @@ def _shallow_merge(
     key: str,
     value: JsonType,
     params: Dict[str, Any],
-    defs: Dict[str, Def],
+    ctx: RenderContext,
     rendered_obj: JsonType,
 ) -> JsonType:
-    rendered_value = render_from_obj(value, params, defs)
-    if not _can_merge_values(rendered_obj, rendered_value):
-        raise YATLSyntaxError(
-            f"Cannot merge {_type_name(rendered_value)} with {_type_name(rendered_obj)} in {key}"
-        )
+    rendered_value = _render(value, params, ctx)
+    return _merge_rendered(key, rendered_value, rendered_obj)
+
+
+def _merge_rendered(
+    key: str, rendered_value: JsonType, rendered_obj: JsonType
+) -> JsonType:
+    _check_can_merge(key, rendered_value, rendered_obj)
 
     if isinstance(rendered_value, dict):
         # Don't deep-merge, just shallow-update
@@ -188,6 +507,15 @@ def _shallow_merge(
         return rendered_value
 
 
+def _check_can_merge(
+    key: str, rendered_value: JsonType, rendered_obj: JsonType
+) -> None:
+    if not _can_merge_values(rendered_obj, rendered_value):
+        raise YATLSyntaxError(
+            f"Cannot merge {_type_name(rendered_value)} with {_type_name(rendered_obj)} in {key}"
+        )
+
+
 def _can_merge_values(parent_obj: JsonType, if_value: JsonType) -> bool:
     """Handle when there are multiple ifs in an object:
 
@@ -211,7 +539,8 @@ def _can_merge_values(parent_obj: JsonType, if_value: JsonType) -> bool:
     if isinstance(parent_obj, dict) and not parent_obj:
         # The parent object is empty, so the if is the first node
         return True
-    return type(parent_obj) == type(if_value)
+    # Either may be frozen, which is a subclass.
+    return isinstance(if_value, dict if isinstance(parent_obj, dict) else list)
 
 
 def _type_name(x: Any) -> str:
@@ -222,48 +551,98 @@ def _render_else(
     key: str,
     value: JsonType,
     params: Dict[str, Any],
-    defs: Dict[str, Def],
+    ctx: RenderContext,
     rendered_obj: JsonType,
 ) -> JsonType:
-    return _shallow_merge(key, value, params, defs, rendered_obj)
-
-
-def _is_for(key: str) -> bool:
-    return bool(re.match(r"\.for\b", key))
+    return _shallow_merge(key, value, params, ctx, rendered_obj)
 
 
 def _render_for(
     key: str,
     value: JsonType,
     params: Dict[str, Any],
-    defs: Dict[str, Def],
+    ctx: RenderContext,
     rendered_obj: JsonType,
 ) -> JsonType:
-    for_match = re.match(
-        r"for\s*\(([a-zA-Z_][a-zA-Z0-9_]*)\s+in\s+([a-zA-Z_][a-zA-Z0-9_]*)\)\s*$",
-        key[1:],
-    )
-    if not for_match:
-        raise YATLSyntaxError(f"Invalid for statement: {key}")
-
-    var = for_match[1].strip()
-    param = for_match[2].strip()
+    if ctx.selection is not None:
+        # Loops render lists, whose elements are rendered in full.
+        with ctx.selecting(None):
+            return _render_for(key, value, params, ctx, rendered_obj)
+
+    names, iterable_expr = parse_for_header(key)
+    iterable = iterable_expr(params)
+
+    # Render straight into the output list. The iterable is consumed lazily, so generators and ranges are never
+    # materialized.
+    _check_can_merge(key, [], rendered_obj)
+    rendered_list = rendered_obj if isinstance(rendered_obj, list) else []
+
+    # Render the parts of the body that don't depend on the loop variable only once.
+    outer_hoisted = ctx.hoisted
+    if _may_hoist(value, iterable):
+        invariants = _loop_invariants(value, names, ctx, params)
+        if invariants:
+            hoisted = {obj_id: Hoisted(obj) for obj_id, obj in invariants.items()}
+            # Enclosing loops' entries take precedence, as they may already be rendered.
+            ctx.hoisted = {**hoisted, **outer_hoisted}
+
     try:
-        iterable = params[param]
-    except KeyError:
-        raise YATLEnvironmentError(f"Missing parameter {param}")
+        for elem in iterable:
+            if ctx.budget is not None:
+                ctx.budget.add_iteration()
+            rendered_list.append(
+                _render(value, bind_loop_vars(params, names, elem), ctx)
+            )
+    finally:
+        ctx.hoisted = outer_hoisted
+    return rendered_list
+
+
+def _loop_invariants(
+    body: JsonType, names: Tuple[str, ...], ctx: RenderContext, params: Dict[str, Any]
+) -> Dict[int, JsonType]:
+    # Loops nested in other loops are rendered many times, so the analysis is kept when it can be.
+    cached = ctx.invariants.get(id(body))
+    if cached is not None and cached[0] is body:
+        return cached[1]
+    invariants = find_invariants(body, names, ctx, params)
+    if invariants.reusable:
+        ctx.invariants[id(body)] = (body, invariants.nodes)
+    return invariants.nodes
+
+
+def bind_loop_vars(
+    params: Dict[str, Any], names: Tuple[str, ...], elem: Any
+) -> Dict[str, Any]:
+    """Return the params for one iteration of a for loop, unpacking elem if there are several loop variables."""
+    if len(names) == 1:
+        return {**params, names[0]: elem}
 
-    rendered_list = []
-    for elem in iterable:
-        rendered_list.append(render_from_obj(value, {**params, var: elem}, defs))
-    return _shallow_merge(key, rendered_list, params, defs, rendered_obj)
+    try:
+        values = tuple(elem)
+    except TypeError:
+        raise YATLEnvironmentError(
+            f"Cannot unpack {_type_name(elem)} into {', '.join(names)}"
+        )
+    if len(values) != len(names):
+        raise YATLEnvironmentError(
+            f"Cannot unpack {len(values)} values into {', '.join(names)}"
+        )
+    loop_params = dict(params)
+    loop_params.update(zip(names, values))
+    return loop_params
+
+
+def _may_hoist(value: JsonType, iterable: Any) -> bool:
+    if not isinstance(value, (dict, list)):
+        return False
+    # Nothing is saved unless there are at least two iterations.
+    return not isinstance(iterable, Sized) or len(iterable) > 1
 
 
-def _can_extend_list(elem: JsonType, rendered_elem: JsonType) -> bool:
-    if isinstance(elem, dict):
-        # All keys must be directives.
-        if any(not _is_directive(key) for key in elem):
-            return False
+def _can_extend_list(elem_is_directive_obj: bool, rendered_elem: JsonType) -> bool:
+    # All keys must be directives.
+    if elem_is_directive_obj:
         # The rendered object must be a list, or an empty object.
         if isinstance(rendered_elem, list):
             return True
@@ -272,102 +651,31 @@ def _can_extend_list(elem: JsonType, rendered_elem: JsonType) -> bool:
     return False
 
 
-def _is_directive(key: str) -> bool:
-    return (
-        _is_if(key)
-        or _is_elif(key)
-        or key == ".else"
-        or _is_for(key)
-        or key == ".load"
-        or _is_def(key)
-        or _is_use(key)
-    )
-
-
-def _is_def(key: str) -> bool:
-    return bool(re.match(r"\.def\b", key))
-
-
-def _store_def(key: str, value: JsonType, defs: Dict[str, Def]) -> None:
-    name, args = _parse_def_parts(key)
+def _store_def(key: str, value: JsonType, ctx: RenderContext) -> None:
+    name, args = parse_def_parts(key)
     if len(args) != len({*args}):
         raise YATLSyntaxError(f"Duplicate name in def arguments: {key}")
-    defs[name] = Def(name, args, value)
-
-
-def _parse_def_parts(key: str) -> Tuple[str, List[str]]:
-    name_match = re.match(
-        r"""
-            \.def \s+
-            ([a-zA-Z_][a-zA-Z0-9_]*) \s*  # Capture the name
-        """,
-        key,
-        re.VERBOSE,
-    )
-    if not name_match:
-        raise YATLSyntaxError(f"Malformed def directive: {key}")
-
-    name = name_match[1]
-    if name_match.end() == len(key):
-        # Handle ".def foo:"
-        return name, []
-
-    args = key[name_match.end() :]
-    args_match = re.match(
-        r"""
-            \( \s* (  # Capture the arg list
-                (?:[a-zA-Z_][a-zA-Z0-9_]*)  # First arg
-                (?: \s* , \s*
-                    [a-zA-Z_][a-zA-Z0-9_]*  # Subsequent args
-                )*
-            )? \s* \) \s* $
-        """,
-        args,
-        re.VERBOSE,
-    )
-    if not args_match:
-        raise YATLSyntaxError(f"Malformed def arguments: {key}")
-    if not args_match[1]:
-        # Handle ".def foo():"
-        return name, []
-
-    return name, [a.strip() for a in args_match[1].split(",")]
-
-
-def _is_use(key: str) -> bool:
-    return bool(re.match(r"\.use\b", key))
+    ctx.defs[name] = Def(name, args, value)
 
 
 def _render_use(
     key: str,
     value: JsonType,
     params: Dict[str, Any],
-    defs: Dict[str, Def],
+    ctx: RenderContext,
     rendered_obj: JsonType,
 ) -> JsonType:
-    name = _parse_use_name(key)
-    if name not in defs:
+    name = parse_use_name(key)
+    if name not in ctx.defs:
         raise YATLEnvironmentError(f"Invalid name for use: {name}")
-    df = defs[name]
-    args = _parse_use_args(value, df)
-    return _shallow_merge(key, df.body, {**params, **args}, defs, rendered_obj)
-
-
-def _parse_use_name(key: str) -> str:
-    name_match = re.match(
-        r"""
-            \.use \s+
-            ([a-zA-Z_][a-zA-Z0-9_]*) \s*  # Capture the name
-        """,
-        key,
-        re.VERBOSE,
-    )
-    if not name_match:
-        raise YATLSyntaxError(f"Malformed use directive: {key}")
-    return name_match[1]
-
-
-def _parse_use_args(value: JsonType, df: Def) -> Dict[str, JsonType]:
+    df = ctx.defs[name]
+    if ctx.used_defs is not None:
+        ctx.used_defs.setdefault(name, {})[id(df.body)] = df
+    args = parse_use_args(value, df)
+    return _shallow_merge(key, df.body, {**params, **args}, ctx, rendered_obj)
+
+
+def parse_use_args(value: JsonType, df: Def) -> Dict[str, JsonType]:
     if not df.args:
         if value:
             raise YATLSyntaxError(
@@ -416,32 +724,56 @@ def _update_obj(
     key: str,
     value: JsonType,
     params: Dict[str, Any],
-    defs: Dict[str, Def],
+    ctx: RenderContext,
+) -> None:
+    selection = ctx.selection
+    if selection is None:
+        _set_field(obj, key, _render(value, params, ctx), params, ctx)
+        return
+
+    # Fields that aren't selected aren't rendered, so nothing they load or use is either.
+    rendered_key = _render_key(key, params, ctx)
+    if str(rendered_key) not in selection:
+        return
+    with ctx.selecting(selection[str(rendered_key)]):
+        rendered_value = _render(value, params, ctx)
+    if not isinstance(obj, dict):
+        raise YATLSyntaxError(f"Cannot add field {key} to non-object")
+    obj[rendered_key] = rendered_value
+
+
+def _set_field(
+    obj: JsonType,
+    key: Any,
+    rendered_value: JsonType,
+    params: Dict[str, Any],
+    ctx: RenderContext,
 ) -> None:
     if not isinstance(obj, dict):
         raise YATLSyntaxError(f"Cannot add field {key} to non-object")
-    interpolated_key = render_interpolation(key, params)
-    obj[interpolated_key] = render_from_obj(value, params, defs)
+    obj[_render_key(key, params, ctx)] = rendered_value
 
 
-def _load_yaml(path: str) -> str:
-    with open(path) as f:
-        return yaml.safe_load(f)
+def _render_key(key: Any, params: Dict[str, Any], ctx: RenderContext) -> Any:
+    if isinstance(key, str):
+        key = render_interpolation(key, params)
+        if ctx.budget is not None:
+            ctx.budget.check_string(key)
+    return key
 
 
 def _deep_merge_dicts(defaults: dict, updates: dict) -> dict:
     """Merges two dicts recursively, with updates taking precendence.
 
-    Note that this modifies defaults in place.
+    Neither argument is modified, since either may be shared (e.g. with the file cache). Subtrees that don't need
+    merging are shared with the result rather than copied.
     """
+    merged = dict(defaults)
     for k, u in updates.items():
-        if k not in defaults:
-            defaults[k] = u
+        v = merged.get(k)
+        if isinstance(u, dict) and isinstance(v, dict):
+            merged[k] = _deep_merge_dicts(v, u)
         else:
-            v = defaults[k]
-            if isinstance(u, dict) and isinstance(v, dict):
-                defaults[k] = _deep_merge_dicts(v, u)
-            else:
-                defaults[k] = u
+            merged[k] = u
 
-    return defaults
+    return merged
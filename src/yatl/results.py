@@ -0,0 +1,245 @@
+from collections import OrderedDict
+from copy import deepcopy
+from datetime import date
+import marshal
+import threading
+from typing import (
+    Any,
+    Callable,
+    FrozenSet,
+    Hashable,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
+
+from yatl.analysis import Analyzer
+from yatl.frozen import FrozenDict, FrozenList
+from yatl.loaders import FileSystemLoader, Loader
+from yatl.render import render_from_obj, RenderContext
+from yatl.types import JsonType
+
+# The params a render read, or None if they couldn't be worked out, in which case all of them are taken to be read.
+Names = Optional[FrozenSet[str]]
+
+# Renders of one template can read different params (e.g. when they load different files), but rarely many sets.
+_MAX_NAME_SETS = 16
+
+_SCALARS = (str, int, float, bytes, date, type(None))
+
+
+class _Result(NamedTuple):
+    # The validator of every file the render loaded, by path.
+    files: Tuple[Tuple[str, Hashable], ...]
+    # The rendered value marshalled, which is the fastest way to copy it, or None if it's shared or can't be.
+    snapshot: Optional[bytes]
+    value: JsonType
+
+
+class _Unsupported(Exception):
+    """A value can't be fingerprinted, so the render can't be cached."""
+
+
+class _ByIdentity:
+    """Compares as equal only to a wrapper of the same object, which it keeps alive so the id isn't reused."""
+
+    __slots__ = ("obj",)
+
+    def __init__(self, obj: Any):
+        self.obj = obj
+
+    def __hash__(self) -> int:
+        return id(self.obj)
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, _ByIdentity) and other.obj is self.obj
+
+
+class ResultCache:
+    """Remembers rendered results, to return them again when a template is rendered with the same params.
+
+    Pass one as the result_cache argument of load or Template.render. Results are keyed by the template (its text, or
+    the compiled Template), the other arguments, and the values of just the params the template (and the files and
+    defs it uses) read, so params it ignores don't cause misses. Every file the render loaded is checked to be
+    unchanged before a result is returned, the same way FileCache checks them. Params of types other than JSON-like
+    values, tuples and dates can't be compared, so renders that read them aren't cached.
+
+    At most max_entries results are kept, dropping the least recently used. With copy true, each render gets its own
+    copy of the result. Otherwise renders are frozen (as with load's frozen argument), and every render gets the same
+    result.
+
+    A cache can be shared by renders in any number of threads. Threads that miss on the same key at once each
+    render it.
+    """
+
+    def __init__(self, max_entries: int = 1024, copy: bool = True):
+        if max_entries < 1:
+            raise ValueError(f"max_entries must be at least 1: {max_entries}")
+        self.max_entries = max_entries
+        self.copy = copy
+        self._entries: "OrderedDict[Hashable, _Result]" = OrderedDict()
+        # The sets of params read by renders of each template (with the same options), most recent last.
+        self._names: "OrderedDict[Hashable, List[Names]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def render(
+        self,
+        template: Hashable,
+        params: Mapping[str, Any],
+        ctx: RenderContext,
+        defs: Optional[Mapping[str, Any]],
+        parse: Callable[[], JsonType],
+    ) -> JsonType:
+        """Return the result of rendering the template parsed by parse, rendering it only if it isn't cached.
+
+        template identifies the template, and defs are the defs passed to load.
+        """
+        if not self.copy:
+            ctx.frozen = True
+        try:
+            key = _options_key(template, ctx, defs)
+        except _Unsupported:
+            return render_from_obj(parse(), params, ctx.defs, ctx)  # type: ignore
+
+        entry = self._lookup(key, params, ctx.loader)
+        if entry is not None:
+            return self._value(entry)
+
+        with self._lock:
+            self.misses += 1
+        ctx.loaded, ctx.used_defs = {}, {}
+        obj = parse()
+        value = render_from_obj(obj, params, ctx.defs, ctx)  # type: ignore
+        files, ctx.loaded = tuple(ctx.loaded.items()), None
+        used_defs, ctx.used_defs = ctx.used_defs, None
+
+        # The files and defs the render used are now cached, so working out what it read is cheap.
+        usage = Analyzer(ctx, params, used_defs).visit(obj)
+        names = None if usage is None else usage.names
+        try:
+            fingerprint = _params_fingerprint(params, names)
+        except _Unsupported:
+            return value
+        self._add(key, names, fingerprint, _Result(files, *self._store(value)))
+        return value
+
+    def _lookup(
+        self, key: Hashable, params: Mapping[str, Any], loader: Loader
+    ) -> Optional[_Result]:
+        with self._lock:
+            name_sets = list(self._names.get(key, ()))
+        for names in reversed(name_sets):
+            try:
+                entry_key = (key, names, _params_fingerprint(params, names))
+            except _Unsupported:
+                continue
+            entry = self._entries.get(entry_key)
+            if entry is None:
+                continue
+            if not _unchanged(entry.files, loader):
+                with self._lock:
+                    self._entries.pop(entry_key, None)
+                continue
+            with self._lock:
+                if entry_key in self._entries:
+                    self._entries.move_to_end(entry_key)
+                self.hits += 1
+            return entry
+        return None
+
+    def _add(
+        self, key: Hashable, names: Names, fingerprint: Hashable, entry: _Result
+    ) -> None:
+        with self._lock:
+            name_sets = self._names.setdefault(key, [])
+            if names in name_sets:
+                name_sets.remove(names)
+            name_sets.append(names)
+            del name_sets[:-_MAX_NAME_SETS]
+            self._names.move_to_end(key)
+            while len(self._names) > self.max_entries:
+                self._names.popitem(last=False)
+
+            self._entries[(key, names, fingerprint)] = entry
+            self._entries.move_to_end((key, names, fingerprint))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _store(self, value: JsonType) -> Tuple[Optional[bytes], JsonType]:
+        if isinstance(value, (FrozenDict, FrozenList)):
+            # It can be shared rather than copied.
+            return None, value
+        try:
+            return marshal.dumps(value), None
+        except ValueError:
+            # E.g. it has dates.
+            return None, deepcopy(value)
+
+    def _value(self, entry: _Result) -> JsonType:
+        if entry.snapshot is not None:
+            return marshal.loads(entry.snapshot)
+        # Frozen values are returned as they are, even by deepcopy.
+        return deepcopy(entry.value)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._names.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def _options_key(
+    template: Hashable, ctx: RenderContext, defs: Optional[Mapping[str, Any]]
+) -> Hashable:
+    loader = ctx.loader
+    return (
+        template,
+        ctx.json,
+        ctx.frozen,
+        ctx.base_dir,
+        ctx.current_dir,
+        # The default loader is made for each render, so it's identified by its search path.
+        (
+            loader.search_path.dirs
+            if type(loader) is FileSystemLoader
+            else _ByIdentity(loader)
+        ),
+        _ByIdentity(defs) if defs else None,
+        None if ctx.budget is None else ctx.budget.limits,
+        _fingerprint(ctx.selection),
+    )
+
+
+def _params_fingerprint(params: Mapping[str, Any], names: Names) -> Hashable:
+    if names is None:
+        return frozenset((name, _fingerprint(v)) for name, v in params.items())
+    # Params that aren't passed are included too, as their absence can change the result.
+    return frozenset(
+        (name, _fingerprint(params[name]) if name in params else None) for name in names
+    )
+
+
+def _fingerprint(value: Any) -> Hashable:
+    """Return a hashable value that's equal for (and only for) equal values of the same types."""
+    if isinstance(value, _SCALARS):
+        # Typed, so 1, 1.0 and True differ.
+        return type(value), value
+    elif isinstance(value, Mapping):
+        # In order, since the order of keys can change the result (e.g. of a loop over them).
+        return dict, tuple((_fingerprint(k), _fingerprint(v)) for k, v in value.items())
+    elif isinstance(value, (list, tuple)):
+        return type(value), tuple(_fingerprint(v) for v in value)
+    raise _Unsupported(type(value).__name__)
+
+
+def _unchanged(files: Tuple[Tuple[str, Hashable], ...], loader: Loader) -> bool:
+    try:
+        return all(loader.validator(path) == validator for path, validator in files)
+    except OSError:
+        return False
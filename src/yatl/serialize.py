@@ -0,0 +1,58 @@
+import json
+from typing import Any, IO, Optional
+
+import yaml
+
+from yatl.frozen import FrozenDict, FrozenList
+from yatl.types import JsonType
+
+try:
+    from yaml import CSafeDumper as _BaseDumper
+except ImportError:  # PyYAML was built without libyaml
+    from yaml import SafeDumper as _BaseDumper  # type: ignore
+
+FORMATS = ("yaml", "json")
+
+
+class _Dumper(_BaseDumper):  # type: ignore
+    # Rendered output can share objects (e.g. a list parameter interpolated twice). Write them out in full rather
+    # than as anchors and aliases, so the output doesn't depend on how it was rendered.
+    def ignore_aliases(self, data: Any) -> bool:
+        return True
+
+
+_Dumper.add_representer(FrozenDict, _BaseDumper.represent_dict)
+_Dumper.add_representer(FrozenList, _BaseDumper.represent_list)
+
+
+def dump(
+    obj: JsonType,
+    stream: Optional[IO] = None,
+    format: str = "yaml",
+    indent: Optional[int] = None,
+) -> Optional[str]:
+    """Serialize a rendered object using the fastest available backend.
+
+    YAML is written by libyaml when PyYAML was built with it. JSON is written compactly unless indent is given. If
+    stream is given, the output is written to it and None is returned, otherwise the output is returned as a string.
+    """
+    if format == "yaml":
+        return yaml.dump(
+            obj,
+            stream,
+            Dumper=_Dumper,
+            default_flow_style=False,
+            sort_keys=False,
+            allow_unicode=True,
+            indent=indent,
+        )
+    elif format == "json":
+        separators = (",", ":") if indent is None else (",", ": ")
+        # json.dump would use the slower pure Python encoder to write in chunks, so encode in one shot.
+        s = json.dumps(obj, separators=separators, indent=indent, ensure_ascii=False)
+        if stream is None:
+            return s
+        stream.write(s)
+        return None
+    else:
+        raise ValueError(f"format must be one of {', '.join(FORMATS)}: {format}")
@@ -0,0 +1,465 @@
+import os
+from typing import Any, Dict, List, Set, Tuple, Union
+
+from yaml import YAMLError
+
+from yatl.analysis import Analyzer
+from yatl.directives import (
+    is_def,
+    is_directive_obj,
+    is_elif,
+    is_for,
+    is_if,
+    is_use,
+    needs_raw_value,
+    parse_def_parts,
+    parse_for_header,
+    parse_if_condition,
+    parse_use_name,
+)
+from yatl.expression import Expression
+from yatl.interpolation import compile_interpolation, parse_expressions
+from yatl.render import (
+    add_list_elem,
+    bind_loop_vars,
+    Def,
+    parse_use_args,
+    render_from_obj,
+    RenderContext,
+)
+from yatl.types import JsonType, YATLError
+
+# Errors which mean a part of the template can't be evaluated yet. It's left for the render to report them, since it
+# may never be reached.
+_DEFERRED_ERRORS = (YATLError, OSError, ValueError, YAMLError)
+
+# States of an .if/.elif/.else chain:
+_NO_CHAIN = 0
+# Every condition so far is known to be false, and nothing has been output.
+_ALL_FALSE = 1
+# A branch has been taken, so the rest of the chain is dropped.
+_TAKEN = 2
+# A condition is only known at render time, so the rest of the chain is kept.
+_DYNAMIC = 3
+
+
+def specialize(obj: JsonType, known: Dict[str, Any], ctx: RenderContext) -> JsonType:
+    """Evaluate everything in obj which only depends on the known params, and return the residual template.
+
+    Rendering the residual with any other params (plus the known ones, which parts that can't be evaluated ahead of
+    time may still read) gives the same result as rendering obj with all of them. Files loaded with known names are
+    inlined, and defs in ctx.defs are expanded, so both must be the same at render time.
+    """
+    return Specializer(ctx).spec(obj, known, True)
+
+
+class Specializer:
+    def __init__(self, ctx: RenderContext):
+        self.ctx = ctx
+        # Defs made where it isn't known whether (or how) they're made, e.g. in the body of a dynamic if.
+        self.unknown_defs: Set[str] = set()
+        self._expanding: Set[str] = set()
+
+    def spec(
+        self,
+        obj: JsonType,
+        known: Dict[str, Any],
+        definite: bool,
+        in_list: bool = False,
+    ) -> JsonType:
+        """Return the residual of obj.
+
+        definite is whether obj is certain to be rendered exactly once (e.g. it isn't in the body of a dynamic if).
+        """
+        value = self._evaluate(obj, known)
+        if value is not _UNKNOWN:
+            return value
+        if isinstance(obj, dict):
+            return self._spec_obj(obj, known, definite, in_list)
+        elif isinstance(obj, list):
+            return self._spec_list(obj, known, definite)
+        elif isinstance(obj, str):
+            return _spec_str(obj, known)
+        return obj
+
+    def _evaluate(self, obj: JsonType, known: Dict[str, Any]) -> Any:
+        """Render obj if it only reads known params, and the result is also a valid template for itself."""
+        if not isinstance(obj, (dict, list, str)):
+            return obj
+
+        analyzer = Analyzer(self.ctx, known)
+        usage = analyzer.visit(obj)
+        if (
+            usage is None
+            or not usage.names <= known.keys()
+            or usage.defs & self.unknown_defs
+            # Defs must stay in the template, as parts which can't be evaluated may use them.
+            or analyzer.may_define_defs
+        ):
+            return _UNKNOWN
+
+        try:
+            value = render_from_obj(obj, known, self.ctx.defs, self.ctx)
+        except _DEFERRED_ERRORS:
+            return _UNKNOWN
+        return value if _is_literal(value) else _UNKNOWN
+
+    def _spec_list(self, obj: list, known: Dict[str, Any], definite: bool) -> list:
+        residual: list = []
+        for elem in obj:
+            elem_is_directive_obj = is_directive_obj(elem)
+            r = self.spec(elem, known, definite, in_list=True)
+            if _is_literal(r) and (elem_is_directive_obj or r != {}):
+                add_list_elem(residual, r, elem_is_directive_obj)
+            elif is_directive_obj(r) == elem_is_directive_obj:
+                residual.append(r)
+            elif elem_is_directive_obj:
+                # Taken branches may have been inlined. Keep it an object of directives, so it still extends the list.
+                residual.append({".if (true)": r})
+            else:
+                # It rendered to {}, which would be dropped from the list.
+                residual.append(elem)
+        return residual
+
+    def _spec_obj(  # noqa: C901
+        self, obj: dict, known: Dict[str, Any], definite: bool, in_list: bool
+    ) -> JsonType:
+        residual = _Residual()
+        chain = _NO_CHAIN
+        for key, value in obj.items():
+            if not needs_raw_value(key):
+                chain = _NO_CHAIN
+                residual.set(_spec_key(key, known), self.spec(value, known, definite))
+            elif is_if(key) or is_elif(key) or key == ".else":
+                chain = self._spec_branch(residual, chain, key, value, known, definite)
+            else:
+                chain = _NO_CHAIN
+                if is_for(key):
+                    self._spec_for(residual, key, value, known, definite)
+                elif key == ".load":
+                    self._spec_load(residual, key, value, known, definite)
+                elif is_def(key):
+                    self._spec_def(key, value, definite)
+                    residual.set(key, value)
+                elif is_use(key):
+                    self._spec_use(residual, key, value, known, definite)
+                else:
+                    residual.set(key, value)
+
+        if not in_list and residual.is_single_merge():
+            # {.if (true): x} renders the same as x.
+            return next(iter(residual.obj.values()))
+        return residual.obj
+
+    def _spec_branch(  # noqa: C901
+        self,
+        residual: "_Residual",
+        chain: int,
+        key: str,
+        value: JsonType,
+        known: Dict[str, Any],
+        definite: bool,
+    ) -> int:
+        if is_if(key):
+            chain = _ALL_FALSE
+        elif chain == _NO_CHAIN:
+            # An elif or else without an if. Leave the render to report it.
+            residual.set(key, value)
+            return _NO_CHAIN
+        if chain == _TAKEN:
+            return _TAKEN
+
+        if key == ".else":
+            if chain == _ALL_FALSE:
+                residual.merge(self.spec(value, known, definite))
+            else:
+                residual.set(key, self.spec(value, known, False))
+            return _NO_CHAIN
+
+        try:
+            condition = parse_if_condition(key)
+        except YATLError:
+            residual.set(key, value)
+            return _DYNAMIC
+        taken = _UNKNOWN
+        if condition.names <= known.keys():
+            try:
+                taken = bool(condition(known))
+            except YATLError:
+                pass
+
+        if taken is _UNKNOWN:
+            kind = ".if" if chain == _ALL_FALSE else ".elif"
+            residual.set(
+                residual.unique_key(f"{kind} ({condition.source})"),
+                self.spec(value, known, False),
+            )
+            return _DYNAMIC
+        elif not taken:
+            return chain
+        elif chain == _ALL_FALSE:
+            residual.merge(self.spec(value, known, definite))
+        else:
+            residual.set(
+                residual.unique_key(".elif (true)"), self.spec(value, known, False)
+            )
+        return _TAKEN
+
+    def _spec_for(
+        self,
+        residual: "_Residual",
+        key: str,
+        value: JsonType,
+        known: Dict[str, Any],
+        definite: bool,
+    ) -> None:
+        try:
+            names, iterable_expr = parse_for_header(key)
+        except YATLError:
+            residual.set(key, value)
+            return
+        if iterable_expr.names <= known.keys():
+            try:
+                unrolled = [
+                    self.spec(value, bind_loop_vars(known, names, elem), definite)
+                    for elem in iterable_expr(known)
+                ]
+            except (YATLError, TypeError):
+                pass
+            else:
+                # Each iteration is appended to the list, so it mustn't be extended by the residual instead. The loop
+                # variables aren't bound outside the loop, so the residuals can't read them either.
+                if not any(is_directive_obj(r) for r in unrolled) and not any(
+                    self._reads(r, names) for r in unrolled
+                ):
+                    residual.merge(unrolled)
+                    return
+
+        inner = {k: v for k, v in known.items() if k not in names}
+        residual.set(key, self.spec(value, inner, False))
+
+    def _reads(self, residual: JsonType, names: Tuple[str, ...]) -> bool:
+        usage = Analyzer(self.ctx, {}).visit(residual)
+        return usage is None or not usage.names.isdisjoint(names)
+
+    def _spec_load(
+        self,
+        residual: "_Residual",
+        key: str,
+        value: JsonType,
+        known: Dict[str, Any],
+        definite: bool,
+    ) -> None:
+        filenames = self._evaluate(value, known)
+        if isinstance(filenames, str):
+            filenames = [filenames]
+        if not isinstance(filenames, list) or not all(
+            isinstance(f, str) for f in filenames
+        ):
+            residual.set(key, value)
+            return
+
+        try:
+            paths = [self.ctx.resolve(f) for f in filenames]
+            files = [self.ctx.parse_file(path) for path in paths]
+        except _DEFERRED_ERRORS:
+            residual.set(key, value)
+            return
+
+        file_residuals = []
+        for path, file_obj in zip(paths, files):
+            with self.ctx.in_file(path):
+                file_residual = self.spec(file_obj, known, definite)
+            if os.path.dirname(path) != self.ctx.current_dir and _may_load(
+                file_residual
+            ):
+                # Once inlined, the files it loads would be looked for in the wrong directory.
+                residual.set(key, value)
+                return
+            file_residuals.append(file_residual)
+
+        for file_residual in file_residuals:
+            residual.merge(file_residual)
+
+    def _spec_def(self, key: str, value: JsonType, definite: bool) -> None:
+        try:
+            name, args = parse_def_parts(key)
+        except YATLError:
+            return
+        if definite and len(args) == len({*args}):
+            self.ctx.defs[name] = Def(name, args, value)
+            self.unknown_defs.discard(name)
+        else:
+            self.unknown_defs.add(name)
+
+    def _spec_use(
+        self,
+        residual: "_Residual",
+        key: str,
+        value: JsonType,
+        known: Dict[str, Any],
+        definite: bool,
+    ) -> None:
+        expansion = self._expand_use(key, value, known, definite)
+        if expansion is _UNKNOWN:
+            residual.set(key, value)
+        else:
+            residual.merge(expansion)
+
+    def _expand_use(
+        self, key: str, value: JsonType, known: Dict[str, Any], definite: bool
+    ) -> Any:
+        try:
+            name = parse_use_name(key)
+            df = self.ctx.defs.get(name)
+            if df is None or name in self.unknown_defs or name in self._expanding:
+                return _UNKNOWN
+            args = parse_use_args(value, df)
+        except YATLError:
+            return _UNKNOWN
+
+        self._expanding.add(name)
+        try:
+            expansion = self.spec(df.body, {**known, **args}, definite)
+        finally:
+            self._expanding.remove(name)
+
+        # The args only exist inside the def, so the expansion can't read them.
+        if self._reads(expansion, tuple(df.args)):
+            return _UNKNOWN
+        return expansion
+
+
+class _Unknown:
+    def __repr__(self) -> str:
+        return "UNKNOWN"
+
+
+_UNKNOWN: Any = _Unknown()
+
+
+class _Residual:
+    """An object being built from the fields of a template object."""
+
+    def __init__(self) -> None:
+        self.obj: dict = {}
+        # The keys added to merge a value in.
+        self._merge_keys: List[str] = []
+
+    def set(self, key: Any, value: JsonType) -> None:
+        self.obj[key] = value
+
+    def merge(self, value: JsonType) -> None:
+        """Add fields that merge value into the object, like a taken if."""
+        if (
+            isinstance(value, dict)
+            and not any(needs_raw_value(k) for k in value)
+            and not any(needs_raw_value(k) for k in self.obj)
+        ):
+            # Plain fields can simply be added, as long as nothing before them could turn the object into a list.
+            self.obj.update(value)
+        else:
+            key = self.unique_key(".if (true)")
+            self._merge_keys.append(key)
+            self.obj[key] = value
+
+    def unique_key(self, key: str) -> str:
+        """Return key, with extra spaces added after the directive's name if needed to make it unique."""
+        name, rest = key.split(" ", 1)
+        while key in self.obj:
+            name += " "
+            key = f"{name} {rest}"
+        return key
+
+    def is_single_merge(self) -> bool:
+        return len(self.obj) == 1 and self._merge_keys == list(self.obj)
+
+
+def _spec_key(key: Any, known: Dict[str, Any]) -> Any:
+    if not isinstance(key, str):
+        return key
+    residual = _spec_str(key, known)
+    if isinstance(residual, (dict, list)) or (
+        # It would be taken for a directive.
+        isinstance(residual, str)
+        and residual.startswith(".")
+        and residual != key
+    ):
+        return key
+    return residual
+
+
+def _spec_str(s: str, known: Dict[str, Any]) -> JsonType:
+    """Interpolate the known expressions in s."""
+    if ".(" not in s:
+        return s
+    try:
+        parts = compile_interpolation(s)
+    except YATLError:
+        return s
+
+    if len(parts) == 1:
+        # The value keeps its type.
+        value = _evaluate_part(parts[0], known)
+        return value if value is not _UNKNOWN and _is_literal(value) else s
+
+    evaluated: List[Tuple[str, bool]] = []
+    for part in parts:
+        value = _evaluate_part(part, known)
+        if value is _UNKNOWN:
+            evaluated.append((f".({part.source})", True))  # type: ignore
+        else:
+            evaluated.append((str(value), False))
+
+    residual = "".join(p for p, _ in evaluated)
+    # The values mustn't be mistaken for (or change) any expression.
+    remaining = [p[2:-1] for p, is_expr in evaluated if is_expr]
+    try:
+        if [p for p, is_expr in parse_expressions(residual) if is_expr] != remaining:
+            return s
+    except YATLError:
+        return s
+    return residual
+
+
+def _evaluate_part(part: Union[str, Expression], known: Dict[str, Any]) -> Any:
+    if isinstance(part, str):
+        return part
+    if part.names <= known.keys():
+        try:
+            return part(known)
+        except YATLError:
+            pass
+    return _UNKNOWN
+
+
+def _is_literal(value: Any) -> bool:
+    """Whether value renders as itself."""
+    if isinstance(value, dict):
+        return all(_is_literal_key(k) and _is_literal(v) for k, v in value.items())
+    elif isinstance(value, list):
+        # Empty objects in lists are treated as empty directives, and dropped.
+        return all(_is_literal(e) and e != {} for e in value)
+    elif isinstance(value, str):
+        return ".(" not in value
+    return True
+
+
+def _may_load(obj: JsonType) -> bool:
+    """Whether rendering obj may load files (including from a def)."""
+    if isinstance(obj, dict):
+        return any(
+            (
+                isinstance(k, str)
+                and (k in (".load", ".load_defaults_from") or is_use(k))
+            )
+            or _may_load(v)
+            for k, v in obj.items()
+        )
+    elif isinstance(obj, list):
+        return any(_may_load(e) for e in obj)
+    return False
+
+
+def _is_literal_key(key: Any) -> bool:
+    return not isinstance(key, str) or not (key.startswith(".") or ".(" in key)
@@ -0,0 +1,149 @@
+from typing import Any, Dict, Hashable, Tuple
+
+import yaml
+from yaml.events import (
+    MappingEndEvent,
+    MappingStartEvent,
+    SequenceEndEvent,
+    SequenceStartEvent,
+    StreamEndEvent,
+)
+from yaml.resolver import BaseResolver
+
+from yatl.directives import is_directive, is_directive_obj, needs_raw_value
+from yatl.frozen import freeze
+from yatl.render import add_list_elem, ObjectRenderer, render_from_obj, RenderContext
+from yatl.types import JsonType, YATLSyntaxError
+
+
+def render_stream(str_or_file, params: Dict[str, Any], ctx: RenderContext) -> JsonType:
+    """Render a YAML document while it is being parsed.
+
+    Unlike yaml.safe_load followed by render_from_obj, the input tree is never built in full. Objects and lists
+    are rendered field by field and element by element from the parser's events, so only the values of directives
+    (which may be rendered more than once, or not at all) are built before being rendered.
+    """
+    loader = yaml.SafeLoader(str_or_file)
+    try:
+        loader.get_event()  # Stream start
+        if loader.check_event(StreamEndEvent):
+            return None
+        loader.get_event()  # Document start
+        with ctx.limited():
+            rendered, _ = _render_node(loader, params, ctx)
+        loader.get_event()  # Document end
+        if not loader.check_event(StreamEndEvent):
+            event = loader.get_event()
+            raise yaml.composer.ComposerError(
+                "expected a single document in the stream",
+                None,
+                "but found another document",
+                event.start_mark,
+            )
+        return freeze(rendered) if ctx.frozen else rendered
+    finally:
+        loader.dispose()
+
+
+def _render_node(
+    loader: yaml.SafeLoader, params: Dict[str, Any], ctx: RenderContext
+) -> Tuple[JsonType, bool]:
+    """Render the next node in the stream.
+
+    Returns the rendered value and whether the node was an object containing only directives (see add_list_elem).
+    """
+    event = loader.peek_event()
+    if ctx.budget is not None and isinstance(
+        event, (MappingStartEvent, SequenceStartEvent)
+    ):
+        ctx.budget.add_node()
+    if isinstance(event, MappingStartEvent) and _is_streamable(
+        event, BaseResolver.DEFAULT_MAPPING_TAG
+    ):
+        return _render_mapping(loader, params, ctx)
+    elif isinstance(event, SequenceStartEvent) and _is_streamable(
+        event, BaseResolver.DEFAULT_SEQUENCE_TAG
+    ):
+        return _render_sequence(loader, params, ctx), False
+    else:
+        obj = _construct_next(loader)
+        return render_from_obj(obj, params, ctx.defs, ctx), is_directive_obj(obj)
+
+
+def _is_streamable(event: Any, default_tag: str) -> bool:
+    # Anchored nodes may be referenced by aliases later, so they need to be composed like any other YAML node.
+    # Likewise, tagged nodes are left to the YAML constructor.
+    return event.anchor is None and event.tag in (None, "!", default_tag)
+
+
+def _render_mapping(
+    loader: yaml.SafeLoader, params: Dict[str, Any], ctx: RenderContext
+) -> Tuple[JsonType, bool]:
+    loader.get_event()
+    renderer = ObjectRenderer(params, ctx)
+    # The fields so far, as (whether the value is rendered, value), in case they need to be added again.
+    fields: Dict[Any, Tuple[bool, JsonType]] = {}
+    while not loader.check_event(MappingEndEvent):
+        key_node = _compose_next(loader)
+        if key_node.tag == "tag:yaml.org,2002:merge":
+            raise YATLSyntaxError(
+                f"Merge keys are not supported when streaming{key_node.start_mark}"
+            )
+        key = loader.construct_document(key_node)
+        if not isinstance(key, Hashable):
+            raise yaml.constructor.ConstructorError(
+                "while constructing a mapping",
+                None,
+                "found unhashable key",
+                key_node.start_mark,
+            )
+        duplicate = key in fields
+        if duplicate or needs_raw_value(key):
+            fields[key] = (False, _construct_next(loader))
+        else:
+            fields[key] = (True, _render_node(loader, params, ctx)[0])
+        if duplicate:
+            # Like yaml.safe_load, the last value of a duplicate key replaces the first one, in its place, so the
+            # fields are added again from the start.
+            renderer = ObjectRenderer(params, ctx)
+            for field in fields.items():
+                _add_field(renderer, *field)
+        else:
+            _add_field(renderer, key, fields[key])
+    loader.get_event()
+    return renderer.finish(), all(is_directive(key) for key in fields)
+
+
+def _add_field(
+    renderer: ObjectRenderer, key: Any, field: Tuple[bool, JsonType]
+) -> None:
+    rendered, value = field
+    if rendered:
+        renderer.add_rendered(key, value)
+    else:
+        renderer.add(key, value)
+
+
+def _render_sequence(
+    loader: yaml.SafeLoader, params: Dict[str, Any], ctx: RenderContext
+) -> list:
+    loader.get_event()
+    rendered_list: list = []
+    while not loader.check_event(SequenceEndEvent):
+        rendered_elem, elem_is_directive_obj = _render_node(loader, params, ctx)
+        add_list_elem(rendered_list, rendered_elem, elem_is_directive_obj)
+    loader.get_event()
+    return rendered_list
+
+
+def _construct_next(loader: yaml.SafeLoader) -> JsonType:
+    """Build the next node in the stream as a regular Python object."""
+    return loader.construct_document(_compose_next(loader))
+
+
+def _compose_next(loader: yaml.SafeLoader) -> yaml.Node:
+    # There's no parent node, so the index (which is only matched against the parent's path) is never used.
+    node = loader.compose_node(None, 0)
+    if node is None:
+        raise YATLSyntaxError("Expected a YAML node")
+    return node
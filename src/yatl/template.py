@@ -0,0 +1,128 @@
+from typing import Any, Dict, Iterable, Mapping, Optional, Union
+
+from yatl import ir
+from yatl.cache import FileCache
+from yatl.cost import Cost, estimate_cost
+from yatl.directives import precompile
+from yatl.limits import RenderLimits
+from yatl.loaders import Loader
+from yatl.parsing import parse
+from yatl.paths import SearchPath
+from yatl.render import Def, layer_defs, render_from_obj, RenderContext
+from yatl.results import ResultCache
+from yatl.serialize import dump
+from yatl.specialize import specialize
+from yatl.types import JsonType
+
+
+class Template:
+    """A parsed template with every expression compiled, to be rendered any number of times.
+
+    known_params are params the template has been specialized on. They're passed to every render along with its own
+    params, which can't override them.
+
+    Rendering never modifies a template, so one can be rendered by any number of threads at once.
+    """
+
+    def __init__(
+        self,
+        obj: JsonType,
+        known_params: Optional[Dict[str, Any]] = None,
+        json: str = "never",
+    ):
+        self.obj = obj
+        self.known_params = dict(known_params or {})
+        self.json = json
+
+    def render(
+        self,
+        params: Dict[str, Any],
+        file_cache: Optional[FileCache] = None,
+        defs: Optional[Mapping[str, Def]] = None,
+        limits: Optional[RenderLimits] = None,
+        base_dir: Optional[str] = None,
+        search_path: Union[SearchPath, Iterable[str], None] = None,
+        loader: Optional[Loader] = None,
+        select: Optional[Iterable[Union[str, Iterable[str]]]] = None,
+        result_cache: Optional[ResultCache] = None,
+        frozen: bool = False,
+    ) -> JsonType:
+        """Render the template. The arguments are the same as for load."""
+        ctx = RenderContext(
+            layer_defs(defs),
+            json=self.json,
+            file_cache=file_cache,
+            limits=limits,
+            base_dir=base_dir,
+            search_path=search_path,
+            loader=loader,
+            select=select,
+            frozen=frozen,
+        )
+        params = {**params, **self.known_params}
+        if result_cache is not None:
+            return result_cache.render(self, params, ctx, defs, lambda: self.obj)
+        return render_from_obj(self.obj, params, ctx.defs, ctx)
+
+    def specialize(
+        self,
+        known_params: Dict[str, Any],
+        file_cache: Optional[FileCache] = None,
+        defs: Optional[Mapping[str, Def]] = None,
+        base_dir: Optional[str] = None,
+        search_path: Union[SearchPath, Iterable[str], None] = None,
+        loader: Optional[Loader] = None,
+    ) -> "Template":
+        """Return a template with everything that only depends on known_params already rendered.
+
+        Conditions and loops over known params are evaluated, interpolations of them filled in, files they name
+        inlined and defs expanded. What's left only depends on the params passed to render. The files, defs, base_dir
+        and search_path (or loader) must be the same when the result is rendered.
+        """
+        known = {**self.known_params, **known_params}
+        ctx = RenderContext(
+            layer_defs(defs),
+            json=self.json,
+            file_cache=file_cache,
+            base_dir=base_dir,
+            search_path=search_path,
+            loader=loader,
+        )
+        residual = specialize(self.obj, known, ctx)
+        precompile(residual)
+        return Template(residual, known, self.json)
+
+    def estimate_cost(
+        self,
+        sizes: Optional[Mapping[str, int]] = None,
+        params: Optional[Dict[str, Any]] = None,
+        **options: Any,
+    ) -> Cost:
+        """Estimate the cost of a render without rendering. See cost.estimate_cost for the arguments."""
+        params = {**(params or {}), **self.known_params}
+        return estimate_cost(self.obj, sizes, params, json=self.json, **options)
+
+    def to_ir(self) -> str:
+        """Serialize the compiled template, see ir.py for the format."""
+        return ir.dumps(self.obj, self.known_params, self.json)
+
+    @classmethod
+    def from_ir(cls, s: str) -> "Template":
+        """Load a template serialized by to_ir. No YAML is parsed."""
+        obj, known_params, json = ir.loads(s)
+        precompile(obj)
+        return cls(obj, known_params, json)
+
+    def to_yaml(self) -> str:
+        """Return the template as YAML text."""
+        return dump(self.obj)  # type: ignore
+
+    def __repr__(self) -> str:
+        return f"Template({self.obj!r})"
+
+
+def compile(str_or_file, json="never") -> Template:
+    """Parse a template and compile its expressions, raising any syntax errors up front."""
+    obj = parse(str_or_file, json)
+    precompile(obj)
+    return Template(obj, json=json)
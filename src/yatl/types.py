@@ -15,3 +15,9 @@ class YATLEnvironmentError(YATLError):
 
 class YATLSyntaxError(YATLError):
     pass
+
+
+class YATLLimitError(YATLError):
+    """Raised when a render exceeds one of its RenderLimits."""
+
+    pass
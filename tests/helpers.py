@@ -11,15 +11,24 @@ from yatl import load
 
 
 def check(
-    test_yaml: str, expected_yaml: str, params: Dict[str, Any], files: Dict[str, str]
+    test_yaml: str,
+    expected_yaml: str,
+    params: Dict[str, Any],
+    files: Dict[str, str],
+    **load_kwargs: Any,
 ) -> None:
+    test_obj = render(test_yaml, params, files, **load_kwargs)
+    expected_obj = yaml.safe_load(dedent(expected_yaml))
+    assert expected_obj == test_obj
+
+
+def render(
+    test_yaml: str, params: Dict[str, Any], files: Dict[str, str], **load_kwargs: Any
+) -> Any:
     with _temp_dir():
         for filename, contents in files.items():
             _write_yaml(filename, contents)
-        test_obj = load(test_yaml, params)
-
-    expected_obj = yaml.safe_load(dedent(expected_yaml))
-    assert expected_obj == test_obj
+        return load(test_yaml, params, **load_kwargs)
 
 
 @contextmanager
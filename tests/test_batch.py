@@ -0,0 +1,123 @@
+import os
+
+import pytest
+
+from yatl import render_batch, render_tree
+from yatl.batch import read_manifest, tree_hash
+from yatl.cache import FileCache
+
+
+def _write(path, contents):
+    path.write_text(contents)
+    return str(path)
+
+
+@pytest.fixture
+def jobs(tmp_path):
+    a = _write(tmp_path / "a.yaml", "name: .(name)\n")
+    b = _write(tmp_path / "b.yaml", "static: true\n")
+    return [(a, str(tmp_path / "a.out")), (b, str(tmp_path / "b.out"))]
+
+
+def test_render_batch_skips_unchanged_outputs(tmp_path, jobs):
+    manifest = str(tmp_path / "manifest.json")
+    first = render_batch(jobs, {"name": "x"}, manifest)
+    assert first.written == [out for _, out in jobs]
+    assert first.unchanged == []
+    assert (tmp_path / "a.out").read_text() == "name: x\n"
+
+    second = render_batch(jobs, {"name": "y"}, manifest)
+    assert second.written == [jobs[0][1]]
+    assert second.unchanged == [jobs[1][1]]
+    assert (tmp_path / "a.out").read_text() == "name: y\n"
+    assert set(read_manifest(manifest)) == {out for _, out in jobs}
+
+
+def test_render_batch_rewrites_missing_outputs(tmp_path, jobs):
+    manifest = str(tmp_path / "manifest.json")
+    render_batch(jobs, {"name": "x"}, manifest)
+    os.remove(jobs[1][1])
+    assert render_batch(jobs, {"name": "x"}, manifest).written == [jobs[1][1]]
+
+
+def test_render_batch_without_manifest(jobs):
+    assert len(render_batch(jobs, {"name": "x"}).written) == 2
+    assert len(render_batch(jobs, {"name": "x"}).written) == 2
+
+
+def test_render_batch_format_change_rewrites(tmp_path, jobs):
+    manifest = str(tmp_path / "manifest.json")
+    render_batch(jobs, {"name": "x"}, manifest)
+    result = render_batch(jobs, {"name": "x"}, manifest, format="json")
+    assert len(result.written) == 2
+    assert (tmp_path / "a.out").read_text() == '{"name":"x"}'
+
+
+@pytest.mark.parametrize(
+    "a,b",
+    [
+        ({"a": 1, "b": 2}, {"b": 2, "a": 1}),
+        ([1, 2], [2, 1]),
+        (["ab"], ["a", "b"]),
+        ({"a": [1]}, {"a": 1}),
+        (1, "1"),
+        (1, 1.0),
+        (True, 1),
+        (None, "null"),
+        ([[]], [[], []]),
+    ],
+)
+def test_tree_hash_distinguishes(a, b):
+    assert tree_hash(a) != tree_hash(b)
+
+
+def test_tree_hash_is_stable():
+    assert tree_hash({"a": [1, "x", None]}) == tree_hash({"a": [1, "x", None]})
+    assert tree_hash({"a": 1}, "yaml") != tree_hash({"a": 1}, "json")
+
+
+@pytest.fixture
+def tree(tmp_path, monkeypatch):
+    # Loaded files are relative to the working directory.
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "lib.yaml").write_text(".def port(n):\n    port: .(n)\n")
+    src = tmp_path / "src"
+    (src / "nested").mkdir(parents=True)
+    for name in ["a.yaml", "b.yml", "nested/c.yaml"]:
+        (src / name).write_text(".load: lib.yaml\nname: .(name)\n.use port: 80\n")
+    (src / "ignored.txt").write_text("")
+    return src
+
+
+def test_render_tree(tmp_path, tree):
+    cache = FileCache()
+    result = render_tree(
+        str(tree), str(tmp_path / "out"), {"name": "x"}, file_cache=cache
+    )
+    assert sorted(result.written) == [
+        str(tmp_path / "out" / name) for name in ["a.yaml", "b.yml", "nested/c.yaml"]
+    ]
+    assert set(result.timings) == {
+        str(tree / name) for name in ["a.yaml", "b.yml", "nested/c.yaml"]
+    }
+    assert (tmp_path / "out" / "nested" / "c.yaml").read_text() == "name: x\nport: 80\n"
+    # The shared library is only parsed once.
+    assert (cache.misses, cache.hits) == (1, 2)
+
+
+def test_render_tree_with_workers(tmp_path, tree):
+    manifest = str(tmp_path / "manifest.json")
+    out = str(tmp_path / "out")
+    result = render_tree(str(tree), out, {"name": "x"}, manifest, "json", workers=2)
+    assert len(result.written) == 3
+    assert (tmp_path / "out" / "a.json").read_text() == '{"name":"x","port":80}'
+    result = render_tree(str(tree), out, {"name": "x"}, manifest, "json", workers=2)
+    assert len(result.unchanged) == 3
+
+
+def test_render_tree_output_collision(tmp_path, tree):
+    (tree / "a.yml").write_text("name: other\n")
+    with pytest.raises(ValueError, match="a.json"):
+        render_tree(str(tree), str(tmp_path / "out"), {"name": "x"}, format="json")
+    # Nothing was rendered.
+    assert not (tmp_path / "out").exists()
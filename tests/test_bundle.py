@@ -0,0 +1,114 @@
+import os
+from pathlib import Path
+import shutil
+
+import pytest
+
+from yatl import load
+from yatl.bundle import Bundle, write_bundle
+from yatl.cli import main
+
+FILES = {
+    "app/main.yaml": """
+.load_defaults_from: defaults.yaml
+name: .(name)
+.load: [parts/part.yaml, lib.yaml]
+env:
+    .load: envs/.(env).yaml
+""",
+    "app/defaults.yaml": "name: none\nregion: us",
+    "app/parts/part.yaml": ".load: sibling.yaml\npart: 1",
+    "app/parts/sibling.yaml": "sibling: [1, 2]",
+    "app/envs/prod.yaml": "replicas: .(3 * 2)",
+    "app/envs/dev.yaml": "replicas: 1",
+    "lib/lib.yaml": "lib: 1",
+}
+
+
+@pytest.fixture
+def tree(tmp_path, monkeypatch):
+    for filename, contents in FILES.items():
+        path = tmp_path / filename
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(contents)
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def expected(params):
+    with open("app/main.yaml") as f:
+        return load(f, params, search_path=["lib"])
+
+
+def test_bundle(tree):
+    params = {"name": "web", "env": "prod"}
+    keys = write_bundle(
+        "app/main.yaml", "app.bundle", search_path=["lib"], include=["envs/*.yaml"]
+    )
+    assert sorted(keys) == [
+        ".search/0/lib.yaml",
+        "defaults.yaml",
+        "envs/dev.yaml",
+        "envs/prod.yaml",
+        "main.yaml",
+        "parts/part.yaml",
+        "parts/sibling.yaml",
+    ]
+    results = [expected(params), expected({**params, "env": "dev"})]
+
+    # Nothing is read but the bundle.
+    shutil.rmtree("app")
+    shutil.rmtree("lib")
+    with Bundle("app.bundle") as bundle:
+        assert bundle.render(params) == results[0]
+        assert bundle.render({**params, "env": "dev"}) == results[1]
+        with pytest.raises(FileNotFoundError):
+            bundle.render({**params, "env": "staging"})
+
+
+def test_search_path_under_base_dir(tree):
+    os.rename("lib", "app/lib")
+    Path("app/other.yaml").write_text(
+        ".load: lib/lib.yaml\nsearch:\n    .load: lib.yaml"
+    )
+    keys = write_bundle("app/other.yaml", "other.bundle", search_path=["app/lib"])
+    assert sorted(keys) == [".search/0/lib.yaml", "lib/lib.yaml", "other.yaml"]
+    with Bundle("other.bundle") as bundle:
+        assert bundle.render({}) == {"lib": 1, "search": {"lib": 1}}
+
+
+def test_cli(tree):
+    assert (
+        main(
+            [
+                "bundle",
+                "app/main.yaml",
+                "-o",
+                "app.bundle",
+                "-I",
+                "lib",
+                "--include",
+                "envs/dev.yaml",
+            ]
+        )
+        == 0
+    )
+    params = {"name": "web", "env": "dev"}
+    with Bundle("app.bundle") as bundle:
+        assert bundle.render(params) == expected(params)
+
+
+def test_files_outside_the_base_dir(tree):
+    Path("app/main.yaml").write_text(".load: ../lib/lib.yaml")
+    with pytest.raises(ValueError):
+        write_bundle("app/main.yaml", "app.bundle")
+
+
+@pytest.mark.parametrize(
+    "contents", [b"", b"{}\n", b'{"format": "yatl-bundle", "version": 99}\n']
+)
+def test_invalid(tmp_path, contents):
+    path = tmp_path / "invalid.bundle"
+    path.write_bytes(contents + b" ")
+    with pytest.raises(ValueError):
+        Bundle(str(path))
@@ -0,0 +1,183 @@
+import datetime
+import os
+
+import pytest
+
+from yatl import cache as cache_module
+from yatl import load, render, RenderLimits
+from yatl.cache import CachedFile, CacheStats, FileCache, measure
+from yatl.types import YATLLimitError
+
+
+def test_file_cache(tmp_path):
+    path = tmp_path / "file.yaml"
+    path.write_text("a: 1\n")
+    cache = FileCache()
+    first = cache.get(str(path))
+    assert first == {"a": 1}
+    assert cache.get(str(path)) is first
+    assert (cache.misses, cache.hits) == (1, 1)
+
+
+def test_file_cache_rereads_changed_files(tmp_path):
+    path = tmp_path / "file.yaml"
+    path.write_text("a: 1\n")
+    cache = FileCache()
+    cache.get(str(path))
+    path.write_text("a: 22\n")
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1))
+    assert cache.get(str(path)) == {"a": 22}
+    assert cache.misses == 2
+
+
+def test_cached_defaults_are_not_modified(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "defaults.yaml").write_text("outer:\n    a: 1\n    b: 1\n")
+    cache = FileCache()
+    template = """
+        .load_defaults_from: defaults.yaml
+        outer:
+            .(key): 2
+    """
+    assert load(template, {"key": "a"}, file_cache=cache) == {"outer": {"a": 2, "b": 1}}
+    assert load(template, {"key": "b"}, file_cache=cache) == {"outer": {"a": 1, "b": 2}}
+
+
+def test_data_info(tmp_path):
+    data = tmp_path / "data.yaml"
+    data.write_text("hosts:\n    - {name: web, tags: [a, bb]}\n'\\.x': y\n")
+    template = tmp_path / "template.yaml"
+    template.write_text("name: .(name)\n")
+    cache = FileCache()
+    info = cache.get_file(str(data)).data
+    assert (info.nodes, info.max_string_length) == (8, 5)
+    assert cache.get_file(str(template)).data is None
+
+
+def test_data_files_are_not_rendered(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "data.yaml").write_text("a: {b: [1, 2]}\n")
+    cache = FileCache()
+    rendered = []
+    real_render = render._render
+
+    def spy(obj, params, ctx):
+        rendered.append(obj)
+        return real_render(obj, params, ctx)
+
+    monkeypatch.setattr(render, "_render", spy)
+    first = load(".load: data.yaml", {}, file_cache=cache)
+    assert first == {"a": {"b": [1, 2]}}
+    assert rendered == [{".load": "data.yaml"}]
+
+    # The output is a copy, so changing it doesn't change the cached file.
+    first["a"]["b"].append(3)
+    assert load(".load: data.yaml", {}, file_cache=cache) == {"a": {"b": [1, 2]}}
+
+
+@pytest.mark.parametrize(
+    "content",
+    ["items: [{}, 1, []]", "items: [[{}], {a: [{}, {}]}]", "items: [{a: 1}, {}]"],
+)
+def test_data_files_render_like_templates(tmp_path, monkeypatch, content):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "data.yaml").write_text(content)
+    rendered = load(content, {})
+    assert load(".load: data.yaml", {}) == rendered
+    assert load(".load_defaults_from: data.yaml", {}) == rendered
+    assert load(".load: data.yaml", {}, frozen=True) == rendered
+
+
+def test_data_files_count_towards_limits(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "data.yaml").write_text("a: [1, 2, 3]\nb: long string\n")
+    assert load(".load: data.yaml", {}, limits=RenderLimits(max_nodes=7))
+    with pytest.raises(YATLLimitError):
+        load(".load: data.yaml", {}, limits=RenderLimits(max_nodes=6))
+    with pytest.raises(YATLLimitError):
+        load(".load: data.yaml", {}, limits=RenderLimits(max_string_length=10))
+
+
+def test_data_files_with_dates(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "data.yaml").write_text("a: [2020-01-31]\n")
+    assert FileCache().get_file("data.yaml").data.snapshot is None
+    assert load(".load: data.yaml", {}) == {"a": [datetime.date(2020, 1, 31)]}
+
+
+@pytest.fixture
+def same_size_files(tmp_path):
+    paths = []
+    for name in "abcd":
+        path = tmp_path / f"{name}.yaml"
+        path.write_text(f"name: {name}\nvalues: [1, 2, 3]\n")
+        paths.append(str(path))
+    return paths, measure(FileCache().get_file(paths[0]))
+
+
+def test_file_cache_evicts_least_recently_used(same_size_files):
+    (a, b, c, d), size = same_size_files
+    cache = FileCache(max_bytes=size * 2)
+    for path in [a, b, a, c]:
+        cache.get(path)
+    assert cache.stats() == CacheStats(
+        hits=1, misses=3, evictions=1, entries=2, bytes=size * 2, pinned_bytes=0
+    )
+    cache.get(a)
+    cache.get(b)
+    assert (cache.hits, cache.misses) == (2, 4)
+
+
+def test_file_cache_skips_files_bigger_than_the_limit(same_size_files):
+    (a, *_), size = same_size_files
+    cache = FileCache(max_bytes=size - 1)
+    assert cache.get(a) == cache.get(a) == {"name": "a", "values": [1, 2, 3]}
+    assert (cache.misses, len(cache), cache.bytes) == (2, 0, 0)
+
+
+def test_file_cache_pins_frequently_used_files(same_size_files):
+    (a, b, c, d), size = same_size_files
+    cache = FileCache(max_bytes=size * 2, pin_hits=2)
+    for _ in range(3):
+        cache.get(a)
+    assert cache.pinned_bytes == size
+    for path in [b, c, d]:
+        cache.get(path)
+    cache.get(a)
+    assert (cache.hits, cache.evictions) == (3, 2)
+
+    # No more than half the cache is pinned.
+    for _ in range(3):
+        cache.get(d)
+    assert cache.pinned_bytes == size
+
+    cache.clear()
+    assert (len(cache), cache.bytes, cache.pinned_bytes) == (0, 0, 0)
+
+
+def test_measure(tmp_path):
+    small = tmp_path / "small.yaml"
+    small.write_text("a: 1\n")
+    big = tmp_path / "big.yaml"
+    big.write_text("".join(f"k{i}: value {i}\n" for i in range(1000)))
+    cache = FileCache(max_bytes=10**9)
+    small_size = measure(cache.get_file(str(small)))
+    big_size = measure(cache.get_file(str(big)))
+    assert 0 < small_size < big_size
+    assert cache.bytes == small_size + big_size
+
+    # The snapshot kept to copy data files is counted too.
+    file = cache.get_file(str(big))
+    assert measure(file) - measure(CachedFile(file.obj, None)) == len(
+        file.data.snapshot
+    )
+
+
+def test_unbounded_file_cache_does_not_measure(tmp_path, monkeypatch):
+    path = tmp_path / "file.yaml"
+    path.write_text("a: 1\n")
+    monkeypatch.setattr(cache_module, "measure", None)
+    cache = FileCache()
+    assert cache.get(str(path)) == cache.get(str(path)) == {"a": 1}
+    assert (cache.hits, cache.bytes) == (1, 0)
@@ -0,0 +1,123 @@
+from pathlib import Path
+
+import yaml
+
+from yatl import compile, RenderLimits
+from yatl.cost import Cost, DEFAULT_SIZE, estimate_cost
+from yatl.render import render_from_obj, RenderContext
+
+TEMPLATE = """
+.def host(name):
+    name: .(name)
+    tags: [a, b]
+hosts:
+    .for (h in hosts):
+        id: .(h)
+        .use host: x
+.if (env == "prod"):
+    replicas: 3
+.elif (env == "staging"):
+    replicas: 2
+    extra: [1, 2, 3]
+.else:
+    replicas: 1
+"""
+
+
+def rendered_nodes(template, params):
+    obj = yaml.safe_load(template)
+    ctx = RenderContext({}, limits=RenderLimits())
+    render_from_obj(obj, params, ctx.defs, ctx)
+    return ctx.budget.nodes
+
+
+def test_estimate_with_sizes():
+    cost = compile(TEMPLATE).estimate_cost({"hosts": 4})
+    assert cost.iterations == 4
+    assert cost.uses == 4
+    assert cost.loads == 0
+    # The staging branch is the most expensive.
+    params = {"hosts": ["w", "x", "y", "z"], "env": "staging"}
+    assert cost.nodes == rendered_nodes(TEMPLATE, params)
+
+
+def test_estimate_with_params():
+    params = {"hosts": list(range(3)), "env": "prod"}
+    cost = compile(TEMPLATE).estimate_cost(params=params)
+    assert cost.iterations == 3
+    # Conditions aren't evaluated, so this is an upper bound.
+    assert cost.nodes >= rendered_nodes(TEMPLATE, params)
+
+
+def test_default_size():
+    cost = estimate_cost(yaml.safe_load(".for (x in range(n)): .(x)"))
+    assert cost.iterations == DEFAULT_SIZE
+    cost = estimate_cost(
+        yaml.safe_load(".for (x in service.ports): .(x)"), {"service.ports": 2}
+    )
+    assert cost.iterations == 2
+
+
+def test_unsized_params_are_not_consumed():
+    params = {"hosts": (h for h in "wxyz"), "ports": iter([80, 443])}
+    template = """
+        .for (h in hosts): .(h)
+        .for (p in sorted(ports)): .(p)
+    """
+    cost = estimate_cost(yaml.safe_load(template), params=params)
+    assert cost.iterations == 2 * DEFAULT_SIZE
+    assert list(params["hosts"]) == list("wxyz")
+    assert list(params["ports"]) == [80, 443]
+
+
+def test_nested_loops():
+    template = """
+        .for (x in xs):
+            .for (y in ys): .(x)-.(y)
+    """
+    cost = estimate_cost(yaml.safe_load(template), {"xs": 10, "ys": 20})
+    assert cost.iterations == 10 + 10 * 20
+    assert cost.nodes == 1 + 10 * (1 + 20)
+
+
+def test_loads(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    Path("a.yaml").write_text(".load: b.yaml\nx: 1")
+    Path("b.yaml").write_text("y: [1, 2]")
+    template = """
+        .load: a.yaml
+        dynamic:
+            .load: .(name).yaml
+    """
+    cost = estimate_cost(yaml.safe_load(template), file_sizes={".(name).yaml": 7})
+    assert cost.loads == 3
+    assert cost.load_depth == 2
+    assert cost.nodes == 1 + (2 + 4) + 1 + 7
+
+    cost = estimate_cost(yaml.safe_load(template), params={"name": "b"})
+    assert cost.nodes == 1 + (2 + 4) + 1 + 4
+
+    # Files that can't be read are looked up by the name in the template, too.
+    cost = estimate_cost(
+        yaml.safe_load(template),
+        params={"name": "missing"},
+        file_sizes={".(name).yaml": 7},
+    )
+    assert cost.nodes == 1 + (2 + 4) + 1 + 7
+
+
+def test_recursive_use():
+    template = """
+        .def f:
+            .use f: {}
+        .use f: {}
+    """
+    assert estimate_cost(yaml.safe_load(template)).uses == 2
+
+
+def test_within():
+    cost = Cost(nodes=100, iterations=10, load_depth=2)
+    assert cost.within(RenderLimits())
+    assert cost.within(RenderLimits(max_nodes=100, max_iterations=10))
+    assert not cost.within(RenderLimits(max_nodes=99))
+    assert not cost.within(RenderLimits(max_load_depth=1))
@@ -0,0 +1,217 @@
+import pytest
+
+from tests.helpers import check
+from yatl.expression import compile_expression, evaluate, FUNCTIONS
+from yatl.types import YATLEnvironmentError, YATLSyntaxError
+
+
+@pytest.mark.parametrize(
+    "expr,expected",
+    [
+        ("1 + 2 * 3", 7),
+        ("(1 + 2) * 3", 9),
+        ("7 // 2", 3),
+        ("7 % 2", 1),
+        ("-x", -2),
+        ("x / 4", 0.5),
+        ("1.5e1", 15.0),
+        ("'a' + \"b\"", "ab"),
+        ("'it\\'s'", "it's"),
+        ("x == 2", True),
+        ("x != 2", False),
+        ("1 < x < 3", True),
+        ("1 < x > 3", False),
+        ("x in [1, 2]", True),
+        ("x not in [1, 2]", False),
+        ("true and not false", True),
+        ("null or 'fallback'", "fallback"),
+        ("len(names)", 2),
+        ("max(1, x)", 2),
+    ],
+)
+def test_evaluate(expr, expected):
+    assert evaluate(expr, {"x": 2, "names": ["a", "b"]}) == expected
+
+
+def test_attribute_and_index_access():
+    params = {"host": {"name": "web-1", "ports": [80, 443]}}
+    assert evaluate("host.name", params) == "web-1"
+    assert evaluate("host['name']", params) == "web-1"
+    assert evaluate("host.ports[1]", params) == 443
+    assert evaluate("host.ports[-1]", params) == 443
+
+
+def test_filters():
+    params = {"name": "web", "names": ["a", "b"]}
+    assert evaluate("name | upper", params) == "WEB"
+    assert evaluate("names | join(', ')", params) == "a, b"
+    assert evaluate("name | replace('w', 'W') | length", params) == 3
+    assert evaluate("missing | default('x')", params) == "x"
+    assert evaluate("name | default('x')", params) == "web"
+
+
+def test_short_circuit():
+    assert evaluate("false and missing", {}) is False
+    assert evaluate("true or missing", {}) is True
+
+
+def test_compiled_expressions_are_cached():
+    assert compile_expression("a.b + 1") is compile_expression("a.b + 1")
+    assert compile_expression("a.b + c").names == {"a", "c"}
+
+
+def test_missing_parameter():
+    with pytest.raises(YATLEnvironmentError):
+        evaluate("missing + 1", {})
+
+
+def test_missing_key():
+    with pytest.raises(YATLEnvironmentError):
+        evaluate("x.y", {"x": {}})
+
+
+def test_private_attribute():
+    with pytest.raises(YATLEnvironmentError):
+        evaluate("x.__class__", {"x": 1})
+
+
+def test_type_error():
+    with pytest.raises(YATLEnvironmentError):
+        evaluate("x + 1", {"x": "a"})
+
+
+@pytest.mark.parametrize(
+    "expr, params",
+    [
+        ("xs | first", {"xs": []}),
+        ("xs | last", {"xs": []}),
+        ("x | upper", {"x": 5}),
+        ("xs.count", {"xs": [1]}),
+        ("(xs).count", {"xs": [1]}),
+    ],
+)
+def test_invalid_values(expr, params):
+    with pytest.raises(YATLEnvironmentError):
+        evaluate(expr, params)
+
+
+@pytest.mark.parametrize(
+    "expr", ["", "1 +", "(1", "x y", "a ! b", "unknown_fn(1)", "x | no_filter"]
+)
+def test_syntax_error(expr):
+    with pytest.raises(YATLSyntaxError):
+        compile_expression(expr)
+
+
+@pytest.mark.parametrize(
+    "test, params, expected",
+    [
+        ("v: .(my-param)", {"my-param": 1}, "v: 1"),
+        ("v: .(my-param)", {"my": 3, "param": 1}, "v: 2"),
+        ("v: .(a.b)", {"a.b": 1, "a": {"b": 2}}, "v: 1"),
+        ("v: .(a.b)", {"a": {"b": 2}}, "v: 2"),
+        ("v: .(x y)", {"x y": 1}, "v: 1"),
+    ],
+)
+def test_interpolation_of_exact_param_name(test, params, expected):
+    check(test, expected, params, {})
+
+
+def test_interpolation_of_invalid_expression_without_param():
+    with pytest.raises(YATLSyntaxError):
+        check("v: .(x y)", "", {"x": 1, "y": 2}, {})
+
+
+@pytest.mark.parametrize(
+    "expr, folded",
+    [
+        ("spy(3)", True),
+        ("spy(range(3))", True),
+        ("spy(range(100000000))", False),
+        ("spy('x' * 100000000)", False),
+        ("spy([1] * 100000000)", False),
+        ("spy(100000000 * 'x')", False),
+        ("spy(('x' * 10000) * 2)", False),
+        ("spy(2 * ([1] * 10000))", False),
+        ("spy(('x' * 10000) + ('x' * 10000))", False),
+        ("spy('xx' | replace('x', 'yy'))", True),
+        ("spy(('x' * 10000) | replace('x', 'yy'))", False),
+    ],
+)
+def test_unbounded_constants_are_not_folded(monkeypatch, expr, folded):
+    calls = []
+    monkeypatch.setitem(FUNCTIONS, "spy", calls.append)
+    expression = compile_expression(expr)
+    assert bool(calls) == folded
+    expression({})
+    assert calls
+
+
+def test_expression_in_interpolation():
+    test = """
+        replicas: .(replicas * 2)
+        name: .(service | upper)-.(env)
+        paren: .(suffix | default(")"))
+    """
+    expected = """
+        replicas: 6
+        name: FOO-prod
+        paren: )
+    """
+    check(test, expected, {"replicas": 3, "service": "foo", "env": "prod"}, {})
+
+
+def test_expression_in_if():
+    test = """
+        .if (env == "prod" and replicas > 1):
+            ha: true
+        .elif (env in ["staging", "dev"]):
+            ha: false
+    """
+    check(test, "ha: true", {"env": "prod", "replicas": 3}, {})
+    check(test, "ha: false", {"env": "dev", "replicas": 3}, {})
+    check(test, "{}", {"env": "prod", "replicas": 1}, {})
+
+
+@pytest.mark.parametrize(
+    "expr, expected",
+    [
+        ("inventory.hosts[0].name", "a"),
+        ("inventory['hosts'][-1]['name']", "c"),
+        ("inventory . hosts [ 1 ] . name", "b"),
+        ('inventory["hosts"][1]', {"name": "b"}),
+    ],
+)
+def test_path_access(expr, expected):
+    params = {"inventory": {"hosts": [{"name": "a"}, {"name": "b"}, {"name": "c"}]}}
+    assert evaluate(expr, params) == expected
+    assert compile_expression(expr).names == {"inventory"}
+
+
+def test_path_attribute_access_on_objects():
+    class Host:
+        name = "a"
+
+    assert evaluate("hosts[0].name", {"hosts": [Host()]}) == "a"
+    with pytest.raises(YATLEnvironmentError):
+        evaluate("hosts[0]._secret", {"hosts": [Host()]})
+
+
+@pytest.mark.parametrize("expr", ["host.missing", "host.ports[5]", "missing.name"])
+def test_path_access_missing(expr):
+    with pytest.raises(YATLEnvironmentError):
+        evaluate(expr, {"host": {"ports": [80]}})
+
+
+def test_nested_params_in_template():
+    test = """
+        .if (host.enabled):
+            name: .(host.name)
+            first_port: .(host.ports[0])
+    """
+    expected = """
+        name: web-1
+        first_port: 80
+    """
+    params = {"host": {"enabled": True, "name": "web-1", "ports": [80]}}
+    check(test, expected, params, {})
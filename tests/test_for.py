@@ -1,6 +1,9 @@
+from array import array
+
 import pytest
 
 from tests.helpers import check
+from yatl import expression
 from yatl.types import YATLEnvironmentError, YATLSyntaxError
 
 
@@ -140,3 +143,147 @@ def test_malformed_for():
     """
     with pytest.raises(YATLSyntaxError):
         check(test, "", {}, {})
+
+
+def test_for_over_nested_param():
+    test = """
+        .for (port in svc.ports): .(svc.name):.(port)
+    """
+    expected = """
+        - web:80
+        - web:443
+    """
+    check(test, expected, {"svc": {"name": "web", "ports": [80, 443]}}, {})
+
+
+def test_for_over_expression():
+    test = """
+        .for (x in xs | sort): .(x)
+    """
+    expected = """
+        - 1
+        - 2
+    """
+    check(test, expected, {"xs": [2, 1]}, {})
+
+
+def test_for_over_range():
+    test = """
+        .for (i in range(3)): shard-.(i)
+    """
+    expected = """
+        - shard-0
+        - shard-1
+        - shard-2
+    """
+    check(test, expected, {}, {})
+
+
+def test_for_over_range_param():
+    test = """
+        - .for (i in range(start, start + n)): .(i * 10)
+    """
+    expected = """
+        [10, 20]
+    """
+    check(test, expected, {"start": 1, "n": 2}, {})
+
+
+def test_for_consumes_generator_lazily(monkeypatch):
+    events = []
+
+    def gen():
+        for i in range(3):
+            events.append(("yield", i))
+            yield i
+
+    def render(x):
+        events.append(("render", x))
+        return x
+
+    monkeypatch.setitem(expression.FUNCTIONS, "render", render)
+    test = """
+        .for (x in xs): .(render(x))
+    """
+    check(test, "[0, 1, 2]", {"xs": gen()}, {})
+    # Each element is rendered before the next is taken, so the generator is never read ahead of the body.
+    assert events == [
+        ("yield", 0),
+        ("render", 0),
+        ("yield", 1),
+        ("render", 1),
+        ("yield", 2),
+        ("render", 2),
+    ]
+
+
+def test_for_output_is_not_interpolated_again():
+    test = """
+        .for (x in xs): .(x)
+    """
+    expected = """
+        - .(not_a_param)
+    """
+    check(test, expected, {"xs": [".(not_a_param)"]}, {})
+
+
+def test_for_multiple_variables():
+    test = """
+        .for (name, port in zip(names, ports)):
+            .(name): .(port)
+    """
+    expected = """
+        - {a: 80}
+        - {b: 443}
+    """
+    check(test, expected, {"names": ["a", "b"], "ports": [80, 443]}, {})
+    check(test, expected, {"names": ["a", "b"], "ports": array("i", [80, 443])}, {})
+
+
+def test_for_over_generator_columns():
+    test = """
+        .for (name, port in zip(names, ports)):
+            host: {name: .(name), port: .(port)}
+    """
+    expected = """
+        - host: {name: a, port: 80}
+        - host: {name: b, port: 443}
+    """
+    params = {"names": iter(["a", "b"]), "ports": (p for p in [80, 443])}
+    check(test, expected, params, {})
+
+
+def test_for_over_columns():
+    test = """
+        .for (name, port in columns(hosts, "name", "port")):
+            host: .(name):.(port)
+    """
+    expected = """
+        - host: a:80
+        - host: b:443
+    """
+    hosts = {"port": array("i", [80, 443]), "name": ["a", "b"], "zone": ["x", "y"]}
+    check(test, expected, {"hosts": hosts}, {})
+
+
+def test_for_over_numpy_columns():
+    np = pytest.importorskip("numpy")
+    test = """
+        .for (name, port in columns(hosts)):
+            .(name): .(port)
+    """
+    hosts = {"name": np.array(["a", "b"]), "port": np.array([80, 443])}
+    check(test, "[{a: 80}, {b: 443}]", {"hosts": hosts}, {})
+
+
+def test_for_unpack_errors():
+    with pytest.raises(YATLEnvironmentError):
+        check(".for (a, b in xs): .(a)", "", {"xs": [[1, 2, 3]]}, {})
+    with pytest.raises(YATLEnvironmentError):
+        check(".for (a, b in xs): .(a)", "", {"xs": [1]}, {})
+    with pytest.raises(YATLEnvironmentError):
+        check(".for (a, b in zip(xs, ys)): .(a)", "", {"xs": [1], "ys": []}, {})
+    with pytest.raises(YATLEnvironmentError):
+        check('.for (a in columns(t, "b")): .(a)', "", {"t": {"a": [1]}}, {})
+    with pytest.raises(YATLSyntaxError):
+        check(".for (a, a in xs): .(a)", "", {"xs": []}, {})
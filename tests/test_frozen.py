@@ -0,0 +1,131 @@
+import copy
+import pickle
+
+import pytest
+
+from yatl import (
+    compile,
+    dump,
+    freeze,
+    FrozenDict,
+    FrozenList,
+    load,
+    MemoryLoader,
+    ResultCache,
+)
+from yatl.cache import FileCache
+from yatl.limits import RenderLimits
+from yatl.types import YATLLimitError
+
+FILES = {
+    "hosts.yaml": "hosts:\n  - {name: a, ip: 10.0.0.1}\n  - {name: b, ip: 10.0.0.2}",
+    "defaults.yaml": "db: {host: localhost, port: 5432}\ncache: {size: 100, ttl: 60}",
+}
+
+
+def test_freeze():
+    value = {"a": [1, {"b": 2}], "c": "d"}
+    frozen = freeze(value)
+    assert isinstance(frozen, FrozenDict)
+    assert isinstance(frozen["a"], FrozenList)
+    assert isinstance(frozen["a"][1], FrozenDict)
+    assert frozen == value
+    assert hash(frozen) == hash(freeze(value))
+    assert freeze(frozen) is frozen
+    assert copy.deepcopy(frozen) is frozen
+    unpickled = pickle.loads(pickle.dumps(frozen))
+    assert unpickled == value and isinstance(unpickled["a"], FrozenList)
+
+    with pytest.raises(TypeError):
+        frozen["e"] = 1
+    with pytest.raises(TypeError):
+        frozen.update(e=1)
+    with pytest.raises(TypeError):
+        frozen["a"].append(3)
+    with pytest.raises(TypeError):
+        frozen["a"][0] = 3
+
+
+def test_frozen_render():
+    test = """
+        name: .(name)
+        .if(debug):
+            log: [debug]
+        ports:
+            - .for(p in ports): {port: .(p)}
+    """
+    params = {"name": "web", "debug": True, "ports": [80, 443]}
+    rendered = load(test, params, frozen=True)
+    assert rendered == load(test, params)
+    assert isinstance(rendered, FrozenDict)
+    assert isinstance(rendered["log"], FrozenList)
+    assert isinstance(rendered["ports"][1], FrozenDict)
+    assert dump(rendered) == dump(load(test, params))
+
+
+def test_frozen_data_files_are_shared():
+    loader = MemoryLoader(FILES)
+    cache = FileCache()
+    first = load(".load: hosts.yaml", {}, loader=loader, file_cache=cache, frozen=True)
+    second = load(".load: hosts.yaml", {}, loader=loader, file_cache=cache, frozen=True)
+    assert first == {
+        "hosts": [{"name": "a", "ip": "10.0.0.1"}, {"name": "b", "ip": "10.0.0.2"}]
+    }
+    assert first["hosts"] is second["hosts"]
+
+
+def test_frozen_defaults_are_shared():
+    test = """
+        .load_defaults_from: defaults.yaml
+        db:
+            host: .(host)
+    """
+    loader = MemoryLoader(FILES)
+    cache = FileCache()
+    renders = [
+        load(test, {"host": h}, loader=loader, file_cache=cache, frozen=True)
+        for h in ["a", "b"]
+    ]
+    assert renders[0]["db"] == {"host": "a", "port": 5432}
+    assert renders[1]["db"] == {"host": "b", "port": 5432}
+    assert renders[0]["cache"] is renders[1]["cache"]
+
+
+def test_frozen_loop_invariants_are_shared():
+    test = """
+        .for(i in range(3)):
+            index: .(i)
+            shared:
+                name: .(name)
+    """
+    rendered = load(test, {"name": "a"}, frozen=True)
+    assert [r["index"] for r in rendered] == [0, 1, 2]
+    assert rendered[0]["shared"] is rendered[2]["shared"]
+
+
+def test_frozen_limits():
+    test = """
+        .for(i in range(10)):
+            shared:
+                a: {b: .(x)}
+    """
+    for frozen in [False, True]:
+        with pytest.raises(YATLLimitError):
+            load(test, {"x": 1}, limits=RenderLimits(max_nodes=25), frozen=frozen)
+
+
+def test_frozen_template():
+    rendered = compile("a: [.(x)]").render({"x": 1}, frozen=True)
+    assert isinstance(rendered["a"], FrozenList)
+
+
+def test_frozen_streaming():
+    rendered = load("a: [.(x)]", {"x": 1}, streaming=True, frozen=True)
+    assert isinstance(rendered, FrozenDict) and isinstance(rendered["a"], FrozenList)
+
+
+def test_shared_result_cache_is_frozen():
+    cache = ResultCache(copy=False)
+    first = load("a: [.(x)]", {"x": 1}, result_cache=cache)
+    assert isinstance(first, FrozenDict)
+    assert load("a: [.(x)]", {"x": 1}, result_cache=cache) is first
@@ -0,0 +1,231 @@
+from typing import Any, List
+
+import pytest
+
+from tests.helpers import check, render
+from yatl import analysis, expression
+from yatl import render as render_module
+from yatl.limits import RenderLimits
+from yatl.types import YATLEnvironmentError, YATLLimitError
+
+calls: List[Any] = []
+
+
+def _tick(x):
+    calls.append(x)
+    return x
+
+
+@pytest.fixture(autouse=True)
+def tick(monkeypatch):
+    calls.clear()
+    monkeypatch.setitem(expression.FUNCTIONS, "tick", _tick)
+
+
+def test_invariant_object_rendered_once():
+    test = """
+        .for (i in range(3)):
+            index: .(i)
+            shared:
+                name: .(tick(name))
+    """
+    expected = """
+        - {index: 0, shared: {name: a}}
+        - {index: 1, shared: {name: a}}
+        - {index: 2, shared: {name: a}}
+    """
+    check(test, expected, {"name": "a"}, {})
+    assert calls == ["a"]
+
+
+def test_hoisted_values_are_copies():
+    rendered = render(
+        """
+        .for (i in range(2)):
+            shared: {name: a}
+        """,
+        {},
+        {},
+    )
+    assert rendered[0] == rendered[1]
+    assert rendered[0]["shared"] is not rendered[1]["shared"]
+
+
+def test_nested_loops():
+    test = """
+        .for (i in range(2)):
+            .for (j in range(2)):
+                outer: {v: .(tick(i))}
+                both: {v: .(tick(i + j))}
+                neither: {v: .(tick(name))}
+    """
+    expected = """
+        - [{outer: {v: 0}, both: {v: 0}, neither: {v: a}}, {outer: {v: 0}, both: {v: 1}, neither: {v: a}}]
+        - [{outer: {v: 1}, both: {v: 1}, neither: {v: a}}, {outer: {v: 1}, both: {v: 2}, neither: {v: a}}]
+    """
+    check(test, expected, {"name": "a"}, {})
+    assert calls.count("a") == 1
+    # Each i once for outer, and every i + j for both.
+    assert sorted(c for c in calls if c != "a") == [0, 0, 1, 1, 1, 2]
+
+
+def test_use_with_defs_defined_in_body():
+    test = """
+        .def f: {v: .(tick(name))}
+        xs:
+            .for (i in range(2)):
+                .if (i == 1):
+                    .def f: {v: other}
+                out:
+                    .use f: {}
+    """
+    expected = """
+        xs: [{out: {v: a}}, {out: {v: other}}]
+    """
+    check(test, expected, {"name": "a"}, {})
+
+
+def test_use_is_hoisted():
+    test = """
+        .def f(x): {v: .(tick(x)), n: .(name)}
+        xs:
+            .for (i in range(3)):
+                out:
+                    .use f: .(name)
+                varying:
+                    .use f: .(i)
+    """
+    rendered = render(test, {"name": "a"}, {})
+    assert [x["varying"]["v"] for x in rendered["xs"]] == [".(i)"] * 3
+    assert calls.count(".(name)") == 1
+
+
+def test_load():
+    test = """
+        .for (i in range(3)):
+            fixed:
+                .load: a.yaml
+            varying:
+                .load: .(file)
+    """
+    files = {"a.yaml": "v: .(tick(name))", "b.yaml": "v: .(tick(i))"}
+    rendered = render(test, {"name": "x", "file": "b.yaml"}, files)
+    assert rendered == [{"fixed": {"v": "x"}, "varying": {"v": i}} for i in range(3)]
+    assert calls.count("x") == 1
+
+
+def test_load_depending_on_loop_var():
+    test = """
+        .for (f in files):
+            .load: .(f)
+    """
+    files = {"a.yaml": "v: .(tick(1))", "b.yaml": "v: .(tick(2))"}
+    check(test, "[{v: 1}, {v: 2}]", {"files": ["a.yaml", "b.yaml"]}, files)
+
+
+def test_load_depending_on_outer_loop_var():
+    # The inner loop is analyzed again for each file, since whether its body is invariant depends on the file.
+    test = """
+        .for (f in files):
+            .for (i in xs):
+                - .load: .(f)
+    """
+    files = {"a.yaml": "static: 1", "b.yaml": "v: .(i)"}
+    params = {"files": ["a.yaml", "b.yaml"], "xs": [1, 2, 3]}
+    expected = [[[{"static": 1}]] * 3, [[{"v": 1}], [{"v": 2}], [{"v": 3}]]]
+    assert render(test, params, files) == expected
+
+
+def test_aliases():
+    test = """
+        shared: &shared {v: .(tick(i))}
+        .for (i in range(2)):
+            - *shared
+    """
+    with pytest.raises(YATLEnvironmentError):
+        # The alias outside the loop reads i, which is not defined there.
+        render(test, {}, {})
+
+    test = """
+        .for (i in range(2)):
+            a: &a {v: .(tick(name))}
+            b: *a
+    """
+    check(test, "[{a: {v: x}, b: {v: x}}, {a: {v: x}, b: {v: x}}]", {"name": "x"}, {})
+    assert calls == ["x"]
+
+
+def test_hoisted_nodes_count_towards_limits():
+    test = """
+        .for (i in range(20)):
+            shared: {a: {b: 1}}
+    """
+    with pytest.raises(YATLLimitError):
+        render(test, {}, {}, limits=RenderLimits(max_nodes=40))
+
+
+@pytest.mark.parametrize("frozen", [False, True])
+def test_hoisting_doesnt_change_budget_use(monkeypatch, frozen):
+    test = """
+        .for (i in range(100)):
+            index: .(i)
+            shared: {a: {b: 1, c: [x, y]}, d: .(name)}
+            loop:
+                .for (j in range(3)): .(j)
+    """
+    budgets = []
+
+    class RecordedBudget(render_module.Budget):
+        def __init__(self, limits):
+            super().__init__(limits)
+            budgets.append(self)
+
+    monkeypatch.setattr(render_module, "Budget", RecordedBudget)
+    params = {"name": "a"}
+    hoisted = render(test, params, {}, limits=RenderLimits(), frozen=frozen)
+    monkeypatch.setattr(render_module, "_may_hoist", lambda *args: False)
+    not_hoisted = render(test, params, {}, limits=RenderLimits(), frozen=frozen)
+
+    assert hoisted == not_hoisted
+    assert budgets[0].nodes == budgets[1].nodes
+    assert budgets[0].iterations == budgets[1].iterations == 100 + 100 * 3
+
+
+def test_defs_are_not_hoisted():
+    test = """
+        .for (x in xs):
+            - .def f: A
+            - .if (x == 2):
+                .def f: B
+            - .use f: ""
+    """
+    assert render(test, {"xs": [1, 2, 3]}, {}) == [["A"], ["B"], ["A"]]
+
+
+def test_loaded_defs_are_not_hoisted():
+    test = """
+        .for (x in xs):
+            - .load: defs.yaml
+            - .if (x == 2):
+                .def f: B
+            - .use f: ""
+    """
+    files = {"defs.yaml": ".def f: A"}
+    assert render(test, {"xs": [1, 2, 3]}, files) == [["A"], ["B"], ["A"]]
+
+
+def test_nested_loops_are_analyzed_once(monkeypatch):
+    analyzed = []
+
+    def find_invariants(body, *args):
+        analyzed.append(body)
+        return analysis.find_invariants(body, *args)
+
+    monkeypatch.setattr(render_module, "find_invariants", find_invariants)
+    test = """
+        .for (i in range(3)):
+            .for (j in range(2)):
+                v: {w: .(i + j)}
+    """
+    render(test, {}, {})
+    assert len(analyzed) == 2
@@ -1,7 +1,8 @@
 import pytest
 
-from tests.helpers import check
+from tests.helpers import check, render
 from yatl.interpolation import render_interpolation
+from yatl.serialize import dump
 from yatl.types import YATLEnvironmentError, YATLSyntaxError
 
 
@@ -91,3 +92,14 @@ def test_interpolation_in_key():
         bar: baz
     """
     check(test, expected, {"foo": "bar"}, {})
+
+
+@pytest.mark.parametrize("format", ["yaml", "json"])
+def test_interpolation_of_lazy_sequence(format):
+    test = """
+        numbers: .(range(3))
+        pairs: .(zip(xs, range(2)))
+    """
+    rendered = render(test, {"xs": ["a", "b"]}, {})
+    assert rendered == {"numbers": [0, 1, 2], "pairs": [["a", 0], ["b", 1]]}
+    assert dump(rendered, format=format)
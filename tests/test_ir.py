@@ -0,0 +1,117 @@
+import datetime
+import json
+import math
+
+import pytest
+import yaml
+
+from yatl import compile, Template
+
+TEMPLATE = """
+.def port(name, number):
+    .(name): .(number)
+.def empty: {}
+name: .(service)-.(env)
+"\\\\.(not_interpolated)": 1
+.if (env == "prod"):
+    replicas: 3
+.elif(env in ["staging"]):
+    replicas: 2
+.else:
+    replicas: 1
+hosts:
+    - .for (name, zone in zip(names, zones)):
+        .(name): .(zone)
+    - static
+ports:
+    .use port: [http, 80]
+nested: [[1, 2.5, true, null], {}]
+when: 2020-01-31
+"""
+
+PARAMS = {"service": "web", "env": "staging", "names": ["a", "b"], "zones": [1, 2]}
+
+
+def test_round_trip():
+    template = compile(TEMPLATE)
+    loaded = Template.from_ir(template.to_ir())
+    assert loaded.render(PARAMS) == template.render(PARAMS)
+    assert loaded.to_ir() == template.to_ir()
+
+
+def test_equivalent_directive_keys():
+    template = compile(".if (a): {x: 1}\nb: 2\n.if(a): {y: 2}")
+    loaded = Template.from_ir(template.to_ir())
+    assert loaded.render({"a": True}) == {"x": 1, "b": 2, "y": 2}
+    assert loaded.to_ir() == template.to_ir()
+
+    # Specializing makes keys unique the same way.
+    test = ".if (a): {.if (b): {x: 1}}\nz: 0\n.if (c): {.if (b): {y: 2}}"
+    specialized = compile(test).specialize({"a": True, "c": True})
+    assert ".if  (true)" in specialized.obj
+    loaded = Template.from_ir(specialized.to_ir())
+    assert loaded.render({"b": True}) == {"x": 1, "z": 0, "y": 2}
+
+
+def test_format():
+    ir = json.loads(compile("a: .(x)-y\n.for (i in xs): .(i)").to_ir())
+    assert ir["format"] == "yatl-ir"
+    assert ir["version"] == 1
+    assert ir["root"] == [
+        "o",
+        [["a", ["i", [["x"], "-y"]]], [["for", ["i"], "xs"], ["i", [["i"]]]]],
+    ]
+
+
+def test_known_params_are_data():
+    specialized = compile(".for (x in xs): .(x)-.(k)").specialize(
+        {"k": ".(k)", "d": {".if (x)": datetime.datetime(2020, 1, 1, 12)}}
+    )
+    loaded = Template.from_ir(specialized.to_ir())
+    assert loaded.known_params == specialized.known_params
+    assert loaded.render({"xs": [1]}) == ["1-.(k)"]
+
+
+def test_no_yaml_parsing(monkeypatch):
+    ir = compile(TEMPLATE).to_ir()
+
+    def fail(*args, **kwargs):
+        raise AssertionError("YAML was parsed")
+
+    monkeypatch.setattr(yaml, "safe_load", fail)
+    monkeypatch.setattr(yaml, "SafeLoader", fail)
+    assert Template.from_ir(ir).render(PARAMS)["replicas"] == 2
+
+
+def test_datetimes():
+    tz = datetime.timezone(datetime.timedelta(hours=-5))
+    obj = {"a": datetime.datetime(2020, 1, 31, 1, 2, 3, 4, tzinfo=tz)}
+    assert Template.from_ir(Template(obj).to_ir()).obj == obj
+
+
+def test_non_finite_floats():
+    obj = {"a": [math.inf, -math.inf, math.nan, 1.5]}
+    ir = Template(obj, {"p": math.nan}).to_ir()
+    assert "NaN" not in ir and "Infinity" not in ir
+    decoded = Template.from_ir(ir)
+    assert decoded.obj["a"][:2] == [math.inf, -math.inf]
+    assert math.isnan(decoded.obj["a"][2]) and decoded.obj["a"][3] == 1.5
+    assert math.isnan(decoded.known_params["p"])
+
+
+@pytest.mark.parametrize(
+    "ir",
+    [
+        "[]",
+        '{"format": "other"}',
+        '{"format": "yatl-ir", "version": 99, "json": "extension", "root": null}',
+    ],
+)
+def test_invalid(ir):
+    with pytest.raises(ValueError):
+        Template.from_ir(ir)
+
+
+def test_unserializable():
+    with pytest.raises(ValueError):
+        Template({"a": object()}).to_ir()
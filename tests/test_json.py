@@ -0,0 +1,95 @@
+import pytest
+
+from tests.helpers import check, render
+import yatl.parsing
+
+
+def _no_yaml(*args, **kwargs):
+    raise AssertionError("YAML parser should not be used")
+
+
+@pytest.fixture
+def parsers_used(monkeypatch):
+    """Record which parser ("json" or "yaml") parses each input."""
+    used = []
+    # json.load calls json.loads.
+    for module, function, parser in [
+        (yatl.parsing.json, "loads", "json"),
+        (yatl.parsing.yaml, "safe_load", "yaml"),
+    ]:
+        real = getattr(module, function)
+
+        def record(*args, real=real, parser=parser, **kwargs):
+            used.append(parser)
+            return real(*args, **kwargs)
+
+        monkeypatch.setattr(module, function, record)
+    return used
+
+
+def test_load_json_file():
+    test = """
+        .load: data.json
+        extra: .(x)
+    """
+    data = """
+        {"hosts": ["a", "b"], "nested": {"port": 80}}
+    """
+    expected = """
+        hosts: [a, b]
+        nested: {port: 80}
+        extra: 1
+    """
+    check(test, expected, {"x": 1}, {"data.json": data}, json="extension")
+
+
+def test_json_files_skip_yaml_parser(monkeypatch):
+    test = '{".load_defaults_from": "data.json", "a": 1}'
+    data = '{"a": 0, "b": 2}'
+    monkeypatch.setattr(yatl.parsing.yaml, "safe_load", _no_yaml)
+    assert render(test, {}, {"data.json": data}, json="sniff") == {"a": 1, "b": 2}
+
+
+def test_json_file_with_directives():
+    test = """
+        .load: data.json
+    """
+    data = """
+        {".for (x in xs)": ".(x)"}
+    """
+    check(test, "[1, 2]", {"xs": [1, 2]}, {"data.json": data}, json="extension")
+
+
+def test_never_parses_json_as_yaml():
+    test = """
+        .load: data.json
+    """
+    # YAML 1.1 reads 1e3 as a string, JSON as a number.
+    data = """
+        {"n": 1e3}
+    """
+    check(test, "n: '1e3'", {}, {"data.json": data})
+    check(test, "n: '1e3'", {}, {"data.json": data}, json="never")
+    check(test, "n: 1000.0", {}, {"data.json": data}, json="extension")
+
+
+def test_json_files_are_parsed_as_yaml_by_default(parsers_used):
+    test = """
+        .load: data.json
+    """
+    check(test, "{a: 1, b: 2}", {}, {"data.json": "a: 1\nb: 2"})
+    assert set(parsers_used) == {"yaml"}
+
+
+def test_sniff_falls_back_to_yaml():
+    check("[a, .(x)]", "[a, b]", {"x": "b"}, {}, json="sniff")
+
+
+def test_extension_does_not_sniff(parsers_used):
+    render('{".load": "data.json"}', {}, {"data.json": '{"a": 1}'}, json="extension")
+    assert parsers_used == ["yaml", "json"]
+
+
+def test_invalid_json_mode():
+    with pytest.raises(ValueError):
+        check("a: 1", "a: 1", {}, {}, json="always")
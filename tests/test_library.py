@@ -0,0 +1,78 @@
+import pytest
+
+from tests.helpers import check, render
+from yatl import DefLibrary, load_defs
+from yatl.types import YATLEnvironmentError, YATLSyntaxError
+
+LIB = """
+    .def port(n):
+        port: .(n)
+    .if (tls):
+        .def scheme: https
+    .else:
+        .def scheme: http
+    ignored: output
+"""
+
+
+@pytest.fixture
+def library(tmp_path):
+    (tmp_path / "lib.yaml").write_text(LIB)
+    (tmp_path / "more.yaml").write_text(".def scheme: ftp\n")
+    return str(tmp_path / "lib.yaml"), str(tmp_path / "more.yaml")
+
+
+def test_load_defs(library):
+    lib = load_defs(library[0], params={"tls": True})
+    assert isinstance(lib, DefLibrary)
+    assert sorted(lib) == ["port", "scheme"]
+    assert lib["scheme"].body == "https"
+
+
+def test_later_files_override(library):
+    assert load_defs(*library, params={"tls": True})["scheme"].body == "ftp"
+
+
+def test_use_library(library):
+    lib = load_defs(library[0], params={"tls": False})
+    test = """
+        .use port: 80
+        url: .(host)
+        scheme:
+            .use scheme: ""
+    """
+    expected = """
+        port: 80
+        url: example.com
+        scheme: http
+    """
+    check(test, expected, {"host": "example.com"}, {}, defs=lib)
+
+
+def test_local_defs_do_not_modify_library(library):
+    lib = load_defs(library[0], params={"tls": False})
+    test = """
+        .def port(n):
+            local: .(n)
+        .def extra: 1
+        .use port: 80
+    """
+    check(test, "local: 80", {}, {}, defs=lib)
+    check(".use port: 80", "port: 80", {}, {}, defs=lib)
+    assert "extra" not in lib
+    with pytest.raises(YATLEnvironmentError):
+        render(".use extra: ''", {}, {}, defs=lib)
+
+
+def test_library_is_immutable(library):
+    lib = load_defs(library[0], params={"tls": False})
+    with pytest.raises(TypeError):
+        lib["port"] = None  # type: ignore
+
+
+def test_library_syntax_errors_are_raised_when_loading(tmp_path):
+    (tmp_path / "bad.yaml").write_text(
+        ".def bad(x):\n    .if (x +):\n        value: 1\n"
+    )
+    with pytest.raises(YATLSyntaxError):
+        load_defs(str(tmp_path / "bad.yaml"))
@@ -0,0 +1,142 @@
+import pytest
+
+from tests.helpers import check, render
+from yatl import RenderLimits
+from yatl.types import YATLError, YATLLimitError
+
+NESTED_FOR = """
+    .for (x in xs):
+        .for (y in xs): .(x)-.(y)
+"""
+
+
+def test_limit_error_is_yatl_error():
+    assert issubclass(YATLLimitError, YATLError)
+
+
+def test_no_limits_exceeded():
+    limits = RenderLimits(
+        max_nodes=100,
+        max_iterations=20,
+        max_load_depth=1,
+        max_string_length=10,
+        timeout=10,
+    )
+    check(NESTED_FOR, "[[a-a, a-b], [b-a, b-b]]", {"xs": ["a", "b"]}, {}, limits=limits)
+
+
+def test_max_nodes():
+    with pytest.raises(YATLLimitError):
+        render(
+            NESTED_FOR, {"xs": list(range(10))}, {}, limits=RenderLimits(max_nodes=50)
+        )
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_max_nodes_counts_plain_nodes(streaming):
+    limits = RenderLimits(max_nodes=3)
+    render("[1, 2]", {}, {}, limits=limits, streaming=streaming)
+    with pytest.raises(YATLLimitError):
+        render("[1, 2, 3]", {}, {}, limits=limits, streaming=streaming)
+
+
+def test_max_iterations():
+    limits = RenderLimits(max_iterations=9 + 3)
+    render(NESTED_FOR, {"xs": [1, 2, 3]}, {}, limits=limits)
+    with pytest.raises(YATLLimitError):
+        render(NESTED_FOR, {"xs": [1, 2, 3, 4]}, {}, limits=limits)
+
+
+def test_max_iterations_with_generator():
+    def forever():
+        while True:
+            yield 1
+
+    with pytest.raises(YATLLimitError):
+        render(
+            NESTED_FOR, {"xs": forever()}, {}, limits=RenderLimits(max_iterations=1000)
+        )
+
+
+def test_max_load_depth():
+    files = {"file1": ".load: file2", "file2": "a: 1"}
+    check(".load: file1", "a: 1", {}, files, limits=RenderLimits(max_load_depth=2))
+    with pytest.raises(YATLLimitError):
+        render(".load: file1", {}, files, limits=RenderLimits(max_load_depth=1))
+
+
+def test_recursive_load():
+    with pytest.raises(YATLLimitError):
+        render(
+            ".load_defaults_from: self",
+            {},
+            {"self": ".load_defaults_from: self"},
+            limits=RenderLimits(max_load_depth=10),
+        )
+
+
+def test_max_string_length():
+    limits = RenderLimits(max_string_length=5)
+    render(".(x * 5): .(x * 5)", {"x": "a"}, {}, limits=limits)
+    with pytest.raises(YATLLimitError):
+        render("value: .(x * 6)", {"x": "a"}, {}, limits=limits)
+    with pytest.raises(YATLLimitError):
+        render(".(x * 6): key", {"x": "a"}, {}, limits=limits)
+
+
+def test_timeout():
+    with pytest.raises(YATLLimitError):
+        render(NESTED_FOR, {"xs": range(10**6)}, {}, limits=RenderLimits(timeout=0.01))
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+@pytest.mark.parametrize(
+    "test, params, limits",
+    [
+        ("value: .(x * n)", {"x": "a", "n": 10**9}, RenderLimits(max_string_length=5)),
+        ("value: .(n * x)", {"x": "a", "n": 10**9}, RenderLimits(max_string_length=5)),
+        ("value: .(xs * n)", {"xs": [1], "n": 10**9}, RenderLimits(max_nodes=100)),
+        ("value: .(sum(range(n)))", {"n": 10**12}, RenderLimits(max_iterations=100)),
+    ],
+)
+def test_sizes_are_checked_before_building(test, params, limits, streaming):
+    with pytest.raises(YATLLimitError):
+        render(test, params, {}, limits=limits, streaming=streaming)
+
+
+@pytest.mark.parametrize(
+    "expr",
+    [
+        "x | replace('a', y) | replace('a', y) | replace('a', y) | length",
+        "(y + y + y) | length",
+        "[y, y, y] | join | length",
+        "str([y, y, y]) | length",
+        "len(y * 2 + y * 2)",
+    ],
+)
+def test_intermediate_strings_are_checked(expr):
+    # Only the length is rendered, so it's the strings built along the way that are too long.
+    with pytest.raises(YATLLimitError):
+        render(
+            f"value: .({expr})",
+            {"x": "a" * 10, "y": "a" * 40},
+            {},
+            limits=RenderLimits(max_string_length=100),
+        )
+
+
+@pytest.mark.parametrize(
+    "expr",
+    ["sum(range(n))", "sorted(range(n))", "max(range(n))", "range(n) | join(',')"],
+)
+def test_timeout_within_expression(expr):
+    with pytest.raises(YATLLimitError):
+        render(
+            f"value: .({expr})", {"n": 10**10}, {}, limits=RenderLimits(timeout=0.01)
+        )
+
+
+def test_limits_only_apply_during_render():
+    params = {"x": "a", "n": 10}
+    render("value: .(x * 2)", params, {}, limits=RenderLimits(max_string_length=5))
+    assert render("value: .(x * n)", params, {}) == {"value": "a" * 10}
@@ -1,6 +1,7 @@
 import pytest
 
 from tests.helpers import check
+from yatl import load, SearchPath
 from yatl.types import YATLSyntaxError
 
 
@@ -330,6 +331,18 @@ def test_non_object_file():
         check(test, "", {}, {"non_object": non_object})
 
 
+def test_defaults_rendering_to_non_object():
+    test = """
+        top:
+            .load_defaults_from: defaults
+    """
+    defaults = """
+        .if (true): [1]
+    """
+    with pytest.raises(YATLSyntaxError):
+        check(test, "", {}, {"defaults": defaults})
+
+
 def test_load_arg_is_int():
     test = """
         top:
@@ -364,3 +377,71 @@ def test_load_interpolated_arg_is_obj():
     """
     with pytest.raises(YATLSyntaxError):
         check(test, "", {"filename": {}}, {"{}": file1})
+
+
+def test_load_output_is_not_interpolated_again():
+    test = """
+        .load: file.yaml
+    """
+    file1 = """
+        value: .(x)
+    """
+    check(test, "value: .(not_a_param)", {"x": ".(not_a_param)"}, {"file.yaml": file1})
+
+
+@pytest.fixture
+def include_tree(tmp_path):
+    """A tree of files, with a working directory that contains none of them."""
+    for filename, contents in {
+        "app/main.yaml": ".load: parts/part.yaml\nmain: 1",
+        "app/parts/part.yaml": ".load: sibling.yaml\npart: 1",
+        "app/parts/sibling.yaml": "sibling: 1",
+        "app/common.yaml": "common: app",
+        "lib/common.yaml": "common: lib",
+        "lib/only_lib.yaml": "only_lib: 1",
+    }.items():
+        path = tmp_path / filename
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(contents)
+    (tmp_path / "cwd").mkdir()
+    return tmp_path
+
+
+def test_loads_are_relative_to_the_loading_file(include_tree, monkeypatch):
+    monkeypatch.chdir(include_tree / "cwd")
+    app = str(include_tree / "app")
+    expected = {"main": 1, "part": 1, "sibling": 1}
+    assert load(".load: main.yaml", {}, base_dir=app) == expected
+    with open(include_tree / "app" / "main.yaml") as f:
+        assert load(f, {}) == expected
+
+
+def test_loads_fall_back_to_base_dir(include_tree, monkeypatch):
+    # Paths relative to the working directory, as before includes were relative, still work.
+    monkeypatch.chdir(include_tree)
+    assert load(".load: app/parts/part.yaml", {}) == {"part": 1, "sibling": 1}
+    (include_tree / "app" / "parts" / "cwd.yaml").write_text(".load: app/common.yaml")
+    assert load(".load: app/parts/cwd.yaml", {}) == {"common": "app"}
+
+
+def test_search_path(include_tree, monkeypatch):
+    monkeypatch.chdir(include_tree / "cwd")
+    app, lib = str(include_tree / "app"), str(include_tree / "lib")
+    template = ".load: [common.yaml, only_lib.yaml]"
+    assert load(template, {}, base_dir=app, search_path=[lib]) == {
+        "common": "app",
+        "only_lib": 1,
+    }
+    assert load(".load: common.yaml", {}, search_path=[lib]) == {"common": "lib"}
+    with pytest.raises(FileNotFoundError):
+        load(".load: only_lib.yaml", {}, base_dir=app)
+
+
+def test_search_path_remembers_resolutions(include_tree, monkeypatch):
+    monkeypatch.chdir(include_tree / "cwd")
+    search_path = SearchPath([str(include_tree / "lib")])
+    assert load(".load: common.yaml", {}, search_path=search_path) == {"common": "lib"}
+    (include_tree / "cwd" / "common.yaml").write_text("common: cwd")
+    assert load(".load: common.yaml", {}, search_path=search_path) == {"common": "lib"}
+    search_path.clear()
+    assert load(".load: common.yaml", {}, search_path=search_path) == {"common": "cwd"}
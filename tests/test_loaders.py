@@ -0,0 +1,141 @@
+import os
+import zipfile
+
+import pytest
+
+from yatl import load, load_defs, Loader, MemoryLoader, Profiler, ZipLoader
+from yatl.bundle import Bundle, write_bundle
+from yatl.cache import FileCache
+from yatl.loaders import VirtualLoader
+
+FILES = {
+    "main.yaml": ".load: parts/part.yaml\nmain: 1",
+    "parts/part.yaml": ".load: sibling.json\npart: .(x)",
+    "parts/sibling.json": '{"sibling": [1, 2]}',
+    "lib/common.yaml": "common: 1",
+}
+EXPECTED = {"main": 1, "part": 2, "sibling": [1, 2]}
+
+
+def test_memory_loader():
+    loader = MemoryLoader(FILES, search_dirs=["lib"])
+    assert load(".load: main.yaml", {"x": 2}, loader=loader) == EXPECTED
+    assert load(".load: common.yaml", {}, loader=loader) == {"common": 1}
+    with pytest.raises(FileNotFoundError):
+        load(".load: missing.yaml", {}, loader=loader)
+
+
+def test_memory_loaders_share_a_cache():
+    cache = FileCache()
+    for _ in range(3):
+        load(".load: main.yaml", {"x": 2}, loader=MemoryLoader(FILES), file_cache=cache)
+    assert cache.misses == 3
+
+    changed = MemoryLoader({**FILES, "main.yaml": "main: 2"})
+    assert load(".load: main.yaml", {}, loader=changed, file_cache=cache) == {"main": 2}
+    assert cache.misses == 4
+
+
+def test_zip_loader(tmp_path):
+    path = str(tmp_path / "templates.zip")
+    with zipfile.ZipFile(path, "w") as f:
+        for name, contents in FILES.items():
+            f.writestr(name, contents)
+    with ZipLoader(path) as loader:
+        assert load(".load: main.yaml", {"x": 2}, loader=loader) == EXPECTED
+
+
+def test_bundle_loader(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    for name, contents in FILES.items():
+        os.makedirs(os.path.dirname(name) or ".", exist_ok=True)
+        with open(name, "w") as f:
+            f.write(contents)
+    write_bundle("main.yaml", "main.bundle")
+    with Bundle("main.bundle") as bundle:
+        assert load(".load: parts/part.yaml", {"x": 2}, loader=bundle) == {
+            "part": 2,
+            "sibling": [1, 2],
+        }
+
+
+def test_defs_from_a_loader():
+    loader = MemoryLoader({"defs.yaml": ".def f(x):\n    f: .(x)"})
+    defs = load_defs("defs.yaml", loader=loader)
+    assert load(".use f: 1", {}, defs=defs) == {"f": 1}
+
+
+class VersionedLoader(Loader):
+    """Files fetched from a (pretend) service, with a version for each."""
+
+    def __init__(self):
+        self.files = {"/svc/a.yaml": (1, "a: 1")}
+        self.reads = 0
+
+    def resolve(self, name, current_dir, base_dir):
+        return "/svc/" + name
+
+    def validator(self, path):
+        if path not in self.files:
+            raise FileNotFoundError(path)
+        return self.files[path][0]
+
+    def read(self, path):
+        self.reads += 1
+        return self.files[path][1]
+
+
+def test_custom_loader():
+    loader = VersionedLoader()
+    cache = FileCache()
+    assert load(".load: a.yaml", {}, loader=loader, file_cache=cache) == {"a": 1}
+    assert load(".load: a.yaml", {}, loader=loader, file_cache=cache) == {"a": 1}
+    assert loader.reads == 1
+
+    loader.files["/svc/a.yaml"] = (2, "a: 2")
+    assert load(".load: a.yaml", {}, loader=loader, file_cache=cache) == {"a": 2}
+    assert loader.reads == 2
+
+
+class ParsedLoader(Loader):
+    """Gives files already parsed, so it has no text to read."""
+
+    def resolve(self, name, current_dir, base_dir):
+        return "/svc/" + name
+
+    def validator(self, path):
+        return 1
+
+    def fetch(self, path, json_mode):
+        return {"a": ".(x)"}
+
+
+def test_loader_implementing_only_fetch():
+    loader = ParsedLoader()
+    assert load(".load: a.yaml", {"x": 1}, loader=loader) == {"a": 1}
+    profiler = Profiler()
+    assert load(".load: a.yaml", {"x": 1}, loader=loader, profiler=profiler) == {"a": 1}
+    with pytest.raises(NotImplementedError):
+        loader.read("/svc/a.yaml")
+
+
+def test_incomplete_loader():
+    class NoValidator(Loader):
+        def resolve(self, name, current_dir, base_dir):
+            return "/svc/" + name
+
+        def read(self, path):
+            return "a: 1"
+
+    with pytest.raises(TypeError):
+        NoValidator()
+
+    class NoContainsKey(VirtualLoader):
+        def validator(self, path):
+            return 1
+
+        def read(self, path):
+            return "a: 1"
+
+    with pytest.raises(TypeError):
+        NoContainsKey("/svc")
@@ -0,0 +1,61 @@
+from pathlib import Path
+
+import pytest
+
+from yatl import load, Profiler
+
+TEMPLATE = """\
+a: 1
+hosts:
+    .for (h in hosts):
+        name: .(h)
+        tags: [x, y]
+"""
+
+
+def test_locations():
+    profiler = Profiler()
+    assert load(TEMPLATE, {"hosts": ["p", "q"]}, profiler=profiler) == {
+        "a": 1,
+        "hosts": [{"name": "p", "tags": ["x", "y"]}, {"name": "q", "tags": ["x", "y"]}],
+    }
+    entries = {e.location: e for e in profiler.entries()}
+    assert set(entries) >= {"<template>:1", "<template>:3", "<template>:5"}
+    assert entries["<template>:1"].calls == 1
+    assert entries["<template>:1"].output_nodes == 1 + 1 + 1 + 2 * 5
+    assert entries["<template>:5"].output_nodes == 2 * 3
+    top = entries["<template>:1"]
+    assert top.total_time >= top.self_time >= 0
+    assert top.total_time >= entries["<template>:3"].total_time
+    assert "<template>:3" in profiler.report()
+
+
+def test_loaded_files(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    Path("inc.yaml").write_text("x: .(1)\ny:\n    z: [1, 2]\n")
+    profiler = Profiler()
+    assert load("inc:\n    .load: inc.yaml\n", {}, profiler=profiler) == {
+        "inc": {"x": 1, "y": {"z": [1, 2]}}
+    }
+    locations = {e.location for e in profiler.entries()}
+    assert {"inc.yaml:1", "inc.yaml:3"} <= locations
+
+
+def test_collapsed():
+    profiler = Profiler()
+    load(TEMPLATE, {"hosts": ["p"]}, profiler=profiler)
+    lines = profiler.collapsed().splitlines()
+    stacks = [line.rsplit(" ", 1)[0] for line in lines]
+    assert "<template>:1;<template>:3;<template>:4" in stacks
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+
+
+def test_json():
+    profiler = Profiler()
+    assert load('{"a": [1]}', {}, json="sniff", profiler=profiler) == {"a": [1]}
+    assert [e.location for e in profiler.entries()] == ["<template>:1"]
+
+
+def test_streaming():
+    with pytest.raises(ValueError):
+        load("a: 1", {}, streaming=True, profiler=Profiler())
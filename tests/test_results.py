@@ -0,0 +1,166 @@
+import datetime
+
+import pytest
+
+from yatl import compile, load, MemoryLoader, ResultCache
+
+TEMPLATE = """
+name: .(name)
+.if(debug):
+  log: debug
+.load: .(env).yaml
+"""
+
+
+@pytest.fixture
+def env_files(tmp_path):
+    (tmp_path / "prod.yaml").write_text("replicas: 3")
+    (tmp_path / "dev.yaml").write_text("replicas: 1")
+    return tmp_path
+
+
+def test_result_cache(env_files):
+    cache = ResultCache()
+
+    def render(**params):
+        return load(TEMPLATE, params, base_dir=str(env_files), result_cache=cache)
+
+    params = {"name": "web", "debug": False, "env": "prod"}
+    assert render(**params) == {"name": "web", "replicas": 3}
+    assert render(**params, unused=1) == {"name": "web", "replicas": 3}
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    assert render(**{**params, "env": "dev"}) == {"name": "web", "replicas": 1}
+    assert render(**{**params, "debug": True}) == {
+        "name": "web",
+        "log": "debug",
+        "replicas": 3,
+    }
+    assert (cache.hits, cache.misses) == (1, 3)
+
+
+def test_result_cache_file_changes(env_files):
+    cache = ResultCache()
+    params = {"name": "web", "debug": False, "env": "prod"}
+    load(TEMPLATE, params, base_dir=str(env_files), result_cache=cache)
+    (env_files / "prod.yaml").write_text("replicas: 30")
+    rendered = load(TEMPLATE, params, base_dir=str(env_files), result_cache=cache)
+    assert rendered == {"name": "web", "replicas": 30}
+    assert cache.hits == 0
+
+
+def test_result_cache_template_changes():
+    cache = ResultCache()
+    assert load("a: .(x)", {"x": 1}, result_cache=cache) == {"a": 1}
+    assert load("b: .(x)", {"x": 1}, result_cache=cache) == {"b": 1}
+    assert load("a: .(x)", {"x": 2}, result_cache=cache) == {"a": 2}
+    assert load("a: .(x)", {"x": 1}, result_cache=cache) == {"a": 1}
+    assert (cache.hits, cache.misses) == (1, 3)
+
+
+def test_result_cache_typed_params():
+    cache = ResultCache()
+    for x in [1, 1.0, True, "1", [1], (1,), {"a": 1}, {"a": True}]:
+        assert load("a: .(x)", {"x": x}, result_cache=cache) == {"a": x}
+    assert cache.hits == 0
+
+
+def test_result_cache_copies():
+    cache = ResultCache()
+    first = load("a: [.(x)]", {"x": 1}, result_cache=cache)
+    first["a"].append(2)
+    second = load("a: [.(x)]", {"x": 1}, result_cache=cache)
+    assert second == {"a": [1]}
+    second["a"].append(3)
+    assert load("a: [.(x)]", {"x": 1}, result_cache=cache) == {"a": [1]}
+
+    # Values marshal can't copy are deep copied.
+    day = datetime.date(2020, 1, 1)
+    assert load("a: [.(x)]", {"x": day}, result_cache=cache) == {"a": [day]}
+    assert load("a: [.(x)]", {"x": day}, result_cache=cache) == {"a": [day]}
+
+
+def test_result_cache_shared():
+    cache = ResultCache(copy=False)
+    first = load("a: [.(x)]", {"x": 1}, result_cache=cache)
+    assert load("a: [.(x)]", {"x": 1}, result_cache=cache) is first
+
+
+def test_result_cache_eviction():
+    cache = ResultCache(max_entries=2)
+    for x in [1, 2, 1, 3, 1, 2]:
+        load("a: .(x)", {"x": x}, result_cache=cache)
+    assert len(cache) == 2
+    # 2 was the least recently used when 3 was added.
+    assert (cache.hits, cache.misses) == (2, 4)
+
+
+def test_result_cache_unsupported_params():
+    cache = ResultCache()
+    for _ in range(2):
+        load("a: .(x)", {"x": 1, "y": object()}, result_cache=cache)
+        load("a: .(y.real)", {"y": complex(1, 2)}, result_cache=cache)
+    assert (cache.hits, cache.misses) == (1, 3)
+
+
+def test_result_cache_options():
+    cache = ResultCache()
+    loader = MemoryLoader({"a.yaml": "a: 1", "b.yaml": "b: 1"})
+    assert load(".load: a.yaml", {}, loader=loader, result_cache=cache) == {"a": 1}
+    assert load(".load: a.yaml", {}, loader=loader, result_cache=cache) == {"a": 1}
+    other = MemoryLoader({"a.yaml": "a: 2"})
+    assert load(".load: a.yaml", {}, loader=other, result_cache=cache) == {"a": 2}
+    selected = load("{a: 1, b: 2}", {}, select=["b"], result_cache=cache)
+    assert selected == {"b": 2}
+    assert (cache.hits, cache.misses) == (1, 3)
+
+
+def test_template_result_cache():
+    cache = ResultCache()
+    template = compile("a: .(x)\nb: .(y)").specialize({"y": 2})
+    assert template.render({"x": 1}, result_cache=cache) == {"a": 1, "b": 2}
+    assert template.render({"x": 1}, result_cache=cache) == {"a": 1, "b": 2}
+    assert cache.hits == 1
+
+
+def test_result_cache_streaming():
+    with pytest.raises(ValueError):
+        load("a: 1", {}, streaming=True, result_cache=ResultCache())
+
+
+def test_result_cache_key_order():
+    cache = ResultCache()
+    template = ".for (k in d): .(k)"
+    assert load(template, {"d": {"a": 1, "b": 2}}, result_cache=cache) == ["a", "b"]
+    assert load(template, {"d": {"b": 2, "a": 1}}, result_cache=cache) == ["b", "a"]
+
+
+def test_result_cache_redefined_defs():
+    cache = ResultCache()
+    template = """
+        .def d:
+            v: .(a)
+        x:
+            .use d: {}
+        .def  d:
+            v: .(b)
+        y:
+            .use d: {}
+    """
+    assert load(template, {"a": 1, "b": 3}, result_cache=cache) == {
+        "x": {"v": 1},
+        "y": {"v": 3},
+    }
+    assert load(template, {"a": 2, "b": 3}, result_cache=cache) == {
+        "x": {"v": 2},
+        "y": {"v": 3},
+    }
+    assert load(template, {"a": 2, "b": 4}, result_cache=cache) == {
+        "x": {"v": 2},
+        "y": {"v": 4},
+    }
+    assert load(template, {"a": 2, "b": 4, "c": 5}, result_cache=cache) == {
+        "x": {"v": 2},
+        "y": {"v": 4},
+    }
+    assert (cache.hits, cache.misses) == (1, 3)
@@ -0,0 +1,114 @@
+import pytest
+
+from yatl import load, MemoryLoader
+from yatl.render import parse_select
+
+TEMPLATE = """
+metadata:
+  name: .(name)
+  labels:
+    .load: labels.yaml
+spec:
+  replicas: .(replicas)
+  template:
+    .load_defaults_from: pod-defaults.yaml
+    .if(sidecar):
+      containers:
+        - name: sidecar
+    .else:
+      containers:
+        - name: .(name)
+          ports:
+            - .for(port in ports): .(port)
+    volumes:
+      .load: volumes.yaml
+"""
+FILES = {
+    "labels.yaml": "app: .(name)",
+    "pod-defaults.yaml": "restartPolicy: Always\ncontainers: []\nnodeSelector:\n  .load: nodes.yaml",
+    "nodes.yaml": "zone: a",
+    "volumes.yaml": "- name: data",
+}
+PARAMS = {"name": "web", "replicas": 2, "sidecar": False, "ports": [80, 443]}
+
+
+class RecordingLoader(MemoryLoader):
+    def __init__(self, files):
+        super().__init__(files)
+        self.read_keys = []
+
+    def read(self, path):
+        self.read_keys.append(self.key(path))
+        return super().read(path)
+
+
+def render(select):
+    loader = RecordingLoader(FILES)
+    return load(TEMPLATE, PARAMS, loader=loader, select=select), loader.read_keys
+
+
+def test_select_path():
+    rendered, read_keys = render(["spec.template.containers"])
+    assert rendered == {
+        "spec": {"template": {"containers": [{"name": "web", "ports": [80, 443]}]}}
+    }
+    # The defaults could add containers, but labels, volumes and the defaults' node selector can't.
+    assert read_keys == ["pod-defaults.yaml"]
+
+
+def test_select_matches_full_render():
+    full = load(TEMPLATE, PARAMS, loader=MemoryLoader(FILES))
+    rendered, _ = render(["metadata", "spec.template.nodeSelector.zone"])
+    assert rendered == {
+        "metadata": full["metadata"],
+        "spec": {"template": {"nodeSelector": {"zone": "a"}}},
+    }
+
+
+def test_select_missing_path():
+    rendered, read_keys = render(["status", "spec.replicas.count"])
+    assert rendered == {"spec": {"replicas": 2}}
+    assert read_keys == []
+
+
+def test_select_data_file():
+    rendered = load(
+        ".load: data.yaml",
+        {},
+        loader=MemoryLoader({"data.yaml": "a: {b: 1, c: 2}\nd: 3"}),
+        select=[("a", "b")],
+    )
+    assert rendered == {"a": {"b": 1}}
+
+
+def test_select_interpolated_keys():
+    test = """
+        .(key):
+            value: 1
+            other: 2
+        fixed: 3
+    """
+    assert load(test, {"key": "k"}, select=["k.value"]) == {"k": {"value": 1}}
+
+
+def test_select_list_root():
+    assert load("- a: 1\n  b: 2", {}, select=["a"]) == [{"a": 1, "b": 2}]
+
+
+def test_parse_select():
+    assert parse_select(["a.b", "a.c.d", "e"]) == {
+        "a": {"b": None, "c": {"d": None}},
+        "e": None,
+    }
+    # A path selects everything under it, whatever else is selected.
+    assert parse_select(["a.b", "a"]) == {"a": None}
+    assert parse_select(["a", "a.b"]) == {"a": None}
+    with pytest.raises(ValueError):
+        parse_select(["a..b"])
+    with pytest.raises(ValueError):
+        parse_select([[]])
+
+
+def test_select_streaming():
+    with pytest.raises(ValueError):
+        load("a: 1", {}, streaming=True, select=["a"])
@@ -0,0 +1,53 @@
+import io
+import json
+
+import pytest
+import yaml
+
+from yatl import dump, load
+import yatl.serialize
+
+RESULT = {"name": "web", "ports": [80, 443], "labels": {"tier": "ß"}, "on": None}
+
+
+def test_dump_yaml_round_trip():
+    s = dump(RESULT)
+    assert yaml.safe_load(s) == RESULT
+    # Key order is preserved
+    assert s.startswith("name: web\n")
+
+
+def test_dump_json_is_compact():
+    s = dump(RESULT, format="json")
+    assert json.loads(s) == RESULT
+    assert " " not in s.replace("ß", "")
+
+
+def test_dump_json_indent():
+    assert dump([1], format="json", indent=2) == "[\n  1\n]"
+
+
+@pytest.mark.parametrize("format", ["yaml", "json"])
+def test_dump_to_stream(format):
+    stream = io.StringIO()
+    assert dump(RESULT, stream, format=format) is None
+    assert yaml.safe_load(stream.getvalue()) == RESULT
+
+
+def test_dump_shared_objects_without_aliases():
+    result = load("{a: .(xs), b: .(xs)}", {"xs": [1, 2]})
+    assert result["a"] is result["b"]
+    assert "&" not in dump(result)
+
+
+def test_dump_without_libyaml(monkeypatch):
+    class PureDumper(yaml.SafeDumper):
+        ignore_aliases = yatl.serialize._Dumper.ignore_aliases
+
+    monkeypatch.setattr(yatl.serialize, "_Dumper", PureDumper)
+    assert yaml.safe_load(dump(RESULT)) == RESULT
+
+
+def test_dump_invalid_format():
+    with pytest.raises(ValueError):
+        dump(RESULT, format="toml")
@@ -0,0 +1,118 @@
+import io
+
+import pytest
+import yaml
+
+from tests.helpers import check, render
+from yatl import load
+from yatl.types import YATLEnvironmentError, YATLSyntaxError
+
+TEMPLATES = [
+    "",
+    "plain",
+    "[1, 2, 3]",
+    """
+    a: .(x)
+    .(x): b
+    nested:
+        - .(x)
+        - {c: .(x)}
+    """,
+    """
+    .if (flag):
+        a: 1
+    .elif (not flag):
+        a: 2
+    .else:
+        a: 3
+    b: 4
+    """,
+    """
+    list:
+        - first
+        - .for (x in xs): .(x)
+        - .if (flag): [yes]
+        - .if (not flag): [no]
+        - {}
+        - last
+    """,
+    """
+    .def pair(k, v):
+        .(k): .(v)
+    .use pair: [a, b]
+    items:
+        .for (x in xs):
+            .use pair: [.(x), .(x)]
+    """,
+    """
+    base: &base
+        a: 1
+    copy: *base
+    """,
+    """
+    outer:
+        .load_defaults_from: file1
+        inner:
+            foo: bar
+    """,
+    """
+    - .load: file2
+    - .load: file1
+    """,
+    """
+    a: 1
+    .if (flag): {a: 2}
+    a: 3
+    """,
+    """
+    .if (flag): {a: 1}
+    .else: {a: 2}
+    .if (flag): {b: 3}
+    nested: {c: .(x), c: [.(x)]}
+    """,
+]
+
+FILES = {
+    "file1": """
+        inner:
+            foo: baz
+            baz: quux
+    """,
+    "file2": """
+        - .for (x in xs): .(x)
+    """,
+}
+
+
+@pytest.mark.parametrize("template", TEMPLATES)
+@pytest.mark.parametrize("flag", [True, False])
+def test_streaming_matches_load(template, flag):
+    params = {"x": "v", "xs": [1, 2], "flag": flag}
+    expected = render(template, params, FILES)
+    assert render(template, params, FILES, streaming=True) == expected
+
+
+def test_streaming_from_file():
+    stream = io.StringIO("- .for (x in xs): .(x)\n")
+    assert load(stream, {"xs": [1, 2]}, streaming=True) == [1, 2]
+
+
+def test_streaming_renders_before_parsing_everything():
+    # The error is raised by rendering before the parser reaches the invalid YAML at the end.
+    with pytest.raises(YATLEnvironmentError):
+        load("a: .(missing)\nb: [unclosed\n", {}, streaming=True)
+
+
+def test_streaming_multiple_documents():
+    with pytest.raises(yaml.composer.ComposerError):
+        load("a: 1\n---\nb: 2\n", {}, streaming=True)
+
+
+def test_streaming_merge_keys():
+    test = """
+        base: &base {a: 1}
+        derived:
+            <<: *base
+    """
+    with pytest.raises(YATLSyntaxError):
+        check(test, "", {}, {}, streaming=True)
@@ -0,0 +1,324 @@
+from pathlib import Path
+from textwrap import dedent
+
+import pytest
+import yaml
+
+from yatl import compile, load
+from yatl.types import YATLEnvironmentError, YATLSyntaxError
+
+
+@pytest.fixture(autouse=True)
+def in_tmp_path(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+
+def check_specialize(test_yaml, known, dynamic, residual_yaml=None, files=None):
+    for filename, contents in (files or {}).items():
+        Path(filename).write_text(dedent(contents))
+    template = compile(dedent(test_yaml))
+    specialized = template.specialize(known)
+    assert specialized.render(dynamic) == load(dedent(test_yaml), {**known, **dynamic})
+    if residual_yaml is not None:
+        assert specialized.obj == yaml.safe_load(dedent(residual_yaml))
+    return specialized
+
+
+def test_render():
+    template = compile("name: .(name)")
+    assert template.render({"name": "a"}) == {"name": "a"}
+    assert template.render({"name": "b"}) == {"name": "b"}
+
+
+def test_compile_raises_syntax_errors():
+    with pytest.raises(YATLSyntaxError):
+        compile(".if (x:\n  a: 1")
+
+
+def test_specialize():
+    test = """
+        name: .(service)-.(env)
+        .if (env == "prod"):
+            replicas: .(replicas)
+        .else:
+            replicas: 1
+        hosts:
+            .for (h in hosts):
+                name: .(h)
+                request: .(request_id)
+    """
+    residual = """
+        name: web-prod
+        replicas: .(replicas)
+        hosts:
+            - {name: a, request: .(request_id)}
+            - {name: b, request: .(request_id)}
+    """
+    known = {"service": "web", "env": "prod", "hosts": ["a", "b"]}
+    specialized = check_specialize(
+        test, known, {"replicas": 3, "request_id": "r"}, residual
+    )
+    assert yaml.safe_load(specialized.to_yaml()) == specialized.obj
+
+
+@pytest.mark.parametrize("env", ["prod", "staging", "dev"])
+@pytest.mark.parametrize("flag", [True, False])
+def test_if_chains(env, flag):
+    test = """
+        a: 1
+        .if (env == "prod"):
+            b: prod
+        .elif (flag):
+            b: flag
+        .elif (env == "staging"):
+            b: staging
+        .else:
+            b: other
+        .if (flag and env == "dev"):
+            - 1
+    """
+    for known, dynamic in [
+        ({"env": env}, {"flag": flag}),
+        ({"flag": flag}, {"env": env}),
+    ]:
+        if env == "dev" and flag:
+            with pytest.raises(YATLSyntaxError):
+                check_specialize(test, known, dynamic)
+        else:
+            check_specialize(test, known, dynamic)
+
+
+def test_known_false_if_makes_next_elif_an_if():
+    test = """
+        .if (env == "prod"):
+            b: prod
+        .elif (flag):
+            b: flag
+        .else:
+            b: other
+    """
+    residual = """
+        .if (flag):
+            b: flag
+        .else:
+            b: other
+    """
+    check_specialize(test, {"env": "dev"}, {"flag": False}, residual)
+
+
+def test_known_true_elif_after_dynamic_if():
+    test = """
+        .if (flag):
+            b: flag
+        .elif (env == "prod"):
+            b: prod
+        .else:
+            b: other
+    """
+    residual = """
+        .if (flag):
+            b: flag
+        .elif (true):
+            b: prod
+    """
+    check_specialize(test, {"env": "prod"}, {"flag": False}, residual)
+
+
+def test_for_over_dynamic_iterable():
+    test = """
+        .for (x in xs):
+            name: .(x)-.(env)
+            static: {region: .(region)}
+    """
+    residual = """
+        .for (x in xs):
+            name: .(x)-prod
+            static: {region: us}
+    """
+    check_specialize(
+        test, {"env": "prod", "region": "us"}, {"xs": ["a", "b"]}, residual
+    )
+
+
+def test_for_with_shadowed_known_param():
+    test = """
+        - .for (x in xs): .(x)
+        - .(x)
+    """
+    check_specialize(
+        test, {"x": "known"}, {"xs": [1, 2]}, "[.for (x in xs): .(x), known]"
+    )
+
+
+def test_for_unrolled_with_directive_bodies():
+    test = """
+        .for (x in xs):
+            .if (flag):
+                - .(x)
+    """
+    # Each iteration appends a list, so the loop is kept rather than unrolled.
+    check_specialize(test, {"xs": [1, 2]}, {"flag": True})
+    check_specialize(test, {"xs": [1, 2]}, {"flag": False})
+
+
+def test_for_body_partly_known():
+    test = """
+        items:
+            .for (x in xs):
+                v: .(x + y)
+                w: .(x)
+    """
+    # The body still reads x once y is known, and x isn't bound outside the loop, so it isn't unrolled.
+    specialized = check_specialize(test, {"xs": [1, 2]}, {"y": 10})
+    assert specialized.render({"y": 10}) == {
+        "items": [{"v": 11, "w": 1}, {"v": 12, "w": 2}]
+    }
+
+
+def test_load_is_inlined():
+    test = """
+        .load: .(env).yaml
+        name: .(name)
+    """
+    files = {"prod.yaml": "replicas: .(replicas)\nzone: .(zone)"}
+    residual = """
+        replicas: .(replicas)
+        zone: a
+        name: .(name)
+    """
+    check_specialize(
+        test,
+        {"env": "prod", "zone": "a"},
+        {"replicas": 3, "name": "n"},
+        residual,
+        files,
+    )
+
+
+def test_load_of_dynamic_file_is_kept():
+    test = """
+        .load: .(env).yaml
+    """
+    files = {"prod.yaml": "zone: .(zone)"}
+    check_specialize(test, {"zone": "a"}, {"env": "prod"}, ".load: .(env).yaml", files)
+
+
+def test_use_is_expanded():
+    test = """
+        .def port(name, number):
+            .(name): .(number)
+            dynamic: .(request_id)
+        ports:
+            .use port: [http, 80]
+    """
+    residual = """
+        .def port(name, number):
+            .(name): .(number)
+            dynamic: .(request_id)
+        ports:
+            http: 80
+            dynamic: .(request_id)
+    """
+    check_specialize(test, {}, {"request_id": "r"}, residual)
+
+
+def test_use_is_kept_when_args_mix_with_dynamic_params():
+    test = """
+        .def f(x):
+            v: .(x + n)
+        out:
+            .use f: 1
+    """
+    specialized = check_specialize(test, {}, {"n": 2})
+    assert specialized.obj["out"] == {".use f": 1}
+
+
+def test_def_in_dynamic_branch():
+    test = """
+        .def f: {v: 1}
+        .if (flag):
+            .def f: {v: 2}
+        out:
+            .use f: {}
+    """
+    check_specialize(test, {}, {"flag": True})
+    check_specialize(test, {}, {"flag": False})
+
+
+def test_partial_interpolation():
+    test = """
+        a: .(known)-.(dynamic)
+        b: .(tricky)-.(dynamic)
+        .(key): .(dynamic)
+    """
+    residual = """
+        a: k-.(dynamic)
+        b: .(tricky)-.(dynamic)
+        kk: .(dynamic)
+    """
+    known = {"known": "k", "tricky": ".(", "key": "kk"}
+    check_specialize(test, known, {"dynamic": "d"}, residual)
+
+
+def test_values_which_look_like_templates_are_not_inlined():
+    test = """
+        a: .(value)
+        .(key): 1
+        b: [.(empty)]
+    """
+    known = {"value": ".(x)", "key": ".load", "empty": {}}
+    specialized = check_specialize(test, known, {})
+    assert specialized.obj == yaml.safe_load(dedent(test))
+
+
+def test_lists():
+    test = """
+        - .(a)
+        - .if (known): [1, 2]
+        - .if (dynamic): [3, .(a)]
+        - .for (x in xs): .(x)
+    """
+    residual = """
+        - 1
+        - 1
+        - 2
+        - .if (dynamic): [3, 1]
+        - 5
+    """
+    check_specialize(
+        test, {"a": 1, "known": True, "xs": [5]}, {"dynamic": True}, residual
+    )
+
+
+def test_errors_are_left_for_render():
+    test = """
+        .if (flag):
+            a: .(missing.key)
+    """
+    specialized = check_specialize(test, {"missing": {}}, {"flag": False})
+    with pytest.raises(YATLEnvironmentError):
+        specialized.render({"flag": True})
+
+
+def test_known_params_are_kept():
+    test = """
+        .for (x in xs):
+            .(x): .(known)
+    """
+    specialized = compile(test).specialize({"known": 1})
+    assert specialized.render({"xs": ["a"]}) == [{"a": 1}]
+    assert specialized.render({"xs": ["a"], "known": 2}) == [{"a": 1}]
+    assert specialized.specialize({"xs": ["b"]}).obj == [{"b": 1}]
+
+
+def test_files_from_other_directories_keep_their_loads(tmp_path):
+    Path("sub").mkdir()
+    Path("sub/a.yaml").write_text("a: 1\n.load: .(name).yaml")
+    Path("sub/b.yaml").write_text("b: 1")
+    Path("b.yaml").write_text("b: top")
+    specialized = check_specialize(".load: sub/a.yaml", {}, {"name": "b"})
+    assert specialized.render({"name": "b"}) == {"a": 1, "b": 1}
+    # When nothing is left to load, the file is inlined.
+    check_specialize(
+        ".load: sub/a.yaml", {"name": "b"}, {}, residual_yaml="{a: 1, b: 1}"
+    )
@@ -0,0 +1,85 @@
+from concurrent.futures import ThreadPoolExecutor
+import sys
+
+import pytest
+
+from yatl import compile, load, load_defs
+from yatl.cache import FileCache
+
+TEMPLATE = """
+.load_defaults_from: defaults.yaml
+name: .(name)
+hosts:
+    .for (i in range(n)):
+        .use host: {}
+inventory:
+    .load: inventory.yaml
+.if (n % 2 == 0):
+    even: true
+.else:
+    .load: odd.yaml
+"""
+
+
+@pytest.fixture
+def files(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "defaults.yaml").write_text("name: none\nregion: us\n")
+    (tmp_path / "inventory.yaml").write_text(
+        "".join(f"h{i}: {{ip: 10.0.0.{i}, tags: [a, b]}}\n" for i in range(50))
+    )
+    (tmp_path / "odd.yaml").write_text("odd: .(n)\n")
+    (tmp_path / "defs.yaml").write_text(
+        ".def host:\n    id: .(name)-.(i)\n    port: .(8000 + i)\n"
+    )
+
+
+@pytest.fixture
+def frequent_switches():
+    # Switch threads as often as possible, to make races more likely.
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-5)
+    yield
+    sys.setswitchinterval(interval)
+
+
+def render_in_threads(render, jobs, threads=16):
+    with ThreadPoolExecutor(threads) as executor:
+        return list(executor.map(render, jobs))
+
+
+@pytest.mark.usefixtures("files", "frequent_switches")
+def test_concurrent_renders():
+    cache = FileCache()
+    defs = load_defs("defs.yaml", file_cache=cache)
+    template = compile(TEMPLATE)
+    jobs = [{"name": f"svc{i % 7}", "n": i % 5} for i in range(200)]
+    expected = [load(TEMPLATE, params, defs=defs) for params in jobs]
+
+    results = render_in_threads(
+        lambda params: load(TEMPLATE, params, defs=defs, file_cache=cache), jobs
+    )
+    assert results == expected
+    results = render_in_threads(
+        lambda params: template.render(params, file_cache=cache, defs=defs), jobs
+    )
+    assert results == expected
+
+    # Each file was only parsed once.
+    assert cache.misses == 4
+
+    # No two results share any objects, so changing one can't change another, or the cache.
+    results[0]["inventory"]["h0"]["tags"].append("c")
+    assert results[5] == expected[5]
+    assert load(TEMPLATE, jobs[0], defs=defs, file_cache=cache) == expected[0]
+
+
+def test_concurrent_base_dirs(tmp_path):
+    for i in range(8):
+        (tmp_path / str(i)).mkdir()
+        (tmp_path / str(i) / "inc.yaml").write_text(f"dir: {i}\n")
+    jobs = [str(i % 8) for i in range(200)]
+    results = render_in_threads(
+        lambda d: load(".load: inc.yaml", {}, base_dir=str(tmp_path / d)), jobs
+    )
+    assert results == [{"dir": int(d)} for d in jobs]